@@ -0,0 +1,6 @@
+"""
+ShopImpact core package.
+Storage and scoring shared by the Streamlit app and the command-line tools.
+Nothing in this package imports Streamlit or Plotly, so batch jobs start
+without the UI stack.
+"""
@@ -0,0 +1,185 @@
+"""
+ShopImpact - Aggregates
+Running ledger totals and time-bucketed rollups maintained at write time.
+"""
+
+from dataclasses import asdict, dataclass, fields
+from datetime import date, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from shopimpact.catalog import TREES_PER_KG, WATER_L_PER_KG, resolve_category
+from shopimpact.impact import compute_impact
+
+
+@dataclass
+class LedgerAggregates:
+    """Totals behind the Live Impact Overview, updated in O(1) per purchase."""
+    count: int = 0
+    spend: float = 0.0
+    co2: float = 0.0
+    eco_count: int = 0
+    water: float = 0.0
+    trees: float = 0.0
+
+    @property
+    def eco_rate(self) -> float:
+        return self.eco_count / self.count * 100 if self.count else 0.0
+
+    def add(self, purchase: Dict, sign: int = 1) -> None:
+        info = resolve_category(purchase['type'])
+        impact = purchase['co2_impact']
+        self.count += sign
+        self.spend += sign * purchase['price']
+        self.co2 += sign * impact
+        self.eco_count += sign * int(info.eco)
+        self.water += sign * impact * WATER_L_PER_KG[info.water_intensive]
+        self.trees += sign * impact * TREES_PER_KG[info.tree_intensive]
+
+    def remove(self, purchase: Dict) -> None:
+        """Undo ``add`` for a deleted purchase, or the old values of an edited one."""
+        self.add(purchase, sign=-1)
+
+    def merge(self, other: 'LedgerAggregates') -> None:
+        """Fold in the totals of another block of purchases (bulk imports)."""
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> Optional['LedgerAggregates']:
+        if not data:
+            return None
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'LedgerAggregates':
+        """Full rebuild (migrations, legacy files without stored aggregates)."""
+        if df.empty:
+            return cls()
+        toll = compute_impact(df['type'], df['price'], df['co2_impact'])
+        return cls(
+            count=len(df),
+            spend=float(df['price'].sum()),
+            co2=float(toll.co2.sum()),
+            eco_count=int(toll.eco.sum()),
+            water=float(toll.water.sum()),
+            trees=float(toll.trees.sum()),
+        )
+
+
+GRANULARITIES = ('day', 'week', 'month')
+ROLLUP_COLUMNS = ['bucket', 'co2_impact', 'price', 'count']
+
+
+class BucketTotals(NamedTuple):
+    """One rollup bucket; all zero for a bucket with no purchases."""
+    co2_impact: float = 0.0
+    price: float = 0.0
+    count: int = 0
+
+
+def bucket_keys(date_str: str) -> Dict[str, str]:
+    """Day, week (Monday) and month bucket keys for a stored ``'%Y-%m-%d %H:%M'`` date."""
+    day = date_str[:10]
+    d = date.fromisoformat(day)
+    return {
+        'day': day,
+        'week': (d - timedelta(days=d.weekday())).isoformat(),
+        'month': day[:7],
+    }
+
+
+def bucket_range(granularity: str, start: Optional[str] = None,
+                 end: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Inclusive bucket keys covering the dates ``start``..``end``."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity!r} (expected one of {', '.join(GRANULARITIES)})")
+    return (
+        bucket_keys(start)[granularity] if start else None,
+        bucket_keys(end)[granularity] if end else None,
+    )
+
+
+def frame_buckets(dates: pd.Series) -> Dict[str, pd.Series]:
+    """Vectorized ``bucket_keys`` for a whole column."""
+    day = dates.str[:10]
+    parsed = pd.to_datetime(day, format='%Y-%m-%d')
+    week = (parsed - pd.to_timedelta(parsed.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d')
+    return {'day': day, 'week': week, 'month': day.str[:7]}
+
+
+class TimeRollups:
+    """CO₂, spend and item count per day/week/month bucket, maintained at write time.
+
+    Buckets are keyed by ISO strings (``2024-03-05``, week start ``2024-03-04``,
+    ``2024-03``), so range filters are plain string comparisons.
+    """
+
+    def __init__(self, buckets: Optional[Dict[str, Dict[str, List]]] = None):
+        self.buckets = buckets or {g: {} for g in GRANULARITIES}
+
+    def add(self, purchase: Dict, sign: int = 1) -> None:
+        for granularity, key in bucket_keys(purchase['date']).items():
+            row = self.buckets[granularity].setdefault(key, [0.0, 0.0, 0])
+            row[0] += sign * purchase['co2_impact']
+            row[1] += sign * purchase['price']
+            row[2] += sign
+            if row[2] == 0:
+                del self.buckets[granularity][key]
+
+    def remove(self, purchase: Dict) -> None:
+        """Take a purchase back out; buckets left empty are dropped.
+
+        On an empty instance this builds negative deltas, which is how the
+        SQLite backend upserts a removal.
+        """
+        self.add(purchase, sign=-1)
+
+    def merge_frame(self, df: pd.DataFrame) -> None:
+        """Fold a block of purchases in with one groupby per granularity."""
+        if df.empty:
+            return
+        values = df[['co2_impact', 'price']].assign(count=1)
+        for granularity, keys in frame_buckets(df['date']).items():
+            grouped = values.groupby(keys.to_numpy()).sum()
+            target = self.buckets[granularity]
+            for key, co2, price, count in grouped.itertuples(name=None):
+                row = target.setdefault(key, [0.0, 0.0, 0])
+                row[0] += float(co2)
+                row[1] += float(price)
+                row[2] += int(count)
+
+    def bucket(self, granularity: str, key: str) -> BucketTotals:
+        """Totals of the single bucket ``key`` (e.g. ``'2024-03'`` for a month): one dict lookup."""
+        row = self.buckets[granularity].get(key)
+        return BucketTotals(*row) if row else BucketTotals()
+
+    def query(self, granularity: str, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """Buckets whose key falls in ``[start, end]`` (inclusive, ISO date strings), oldest first."""
+        lo, hi = bucket_range(granularity, start, end)
+        rows = [
+            (key, *values) for key, values in self.buckets[granularity].items()
+            if (lo is None or key >= lo) and (hi is None or key <= hi)
+        ]
+        rows.sort()
+        return pd.DataFrame(rows, columns=ROLLUP_COLUMNS)
+
+    def to_dict(self) -> Dict:
+        return self.buckets
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> Optional['TimeRollups']:
+        if not data:
+            return None
+        return cls({g: dict(data.get(g, {})) for g in GRANULARITIES})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'TimeRollups':
+        rollups = cls()
+        rollups.merge_frame(df)
+        return rollups
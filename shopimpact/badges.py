@@ -0,0 +1,239 @@
+"""
+ShopImpact - Badges
+Declarative badge rules with incremental per-rule state.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from shopimpact.catalog import is_eco
+
+BADGES = {
+    'first_step': {'name': '🌱 First Step', 'desc': 'Logged your first purchase', 'icon': '🌱'},
+    'thrift_king': {'name': '👑 Thrift King', 'desc': 'Bought 3 second-hand items', 'icon': '👑'},
+    'low_carbon': {'name': '🍃 Low Carbon', 'desc': 'Logged an item with < 1kg CO₂', 'icon': '🍃'},
+    'big_saver': {'name': '💰 Big Saver', 'desc': 'Spent over ₹10,000 in one go', 'icon': '💰'},
+    'eco_warrior': {'name': '🛡️ Eco Warrior', 'desc': 'Kept a month of 5+ items under your CO₂ goal', 'icon': '🛡️'},
+    'consistent': {'name': '📅 Consistent', 'desc': 'Logged 5 items total', 'icon': '📅'}
+}
+
+
+def _eco_mask(df: pd.DataFrame) -> np.ndarray:
+    types = df['type']
+    flags = {t: is_eco(t) for t in types.unique()}
+    return types.map(flags).to_numpy(dtype=bool)
+
+
+class BadgeRule(ABC):
+    """One badge condition.
+
+    ``update`` folds a single purchase into the rule's state and ``unlocked``
+    checks it; both are O(1). ``backfill`` replays a block of history on top
+    of ``state`` with vectorized operations and returns the new state and
+    whether the badge would have unlocked at any point in that block.
+    """
+    badge: str
+
+    def bind(self, goals: Dict) -> 'BadgeRule':
+        """The rule with thresholds taken from the user's goals (``user_profile``)."""
+        return self
+
+    def initial_state(self) -> Any:
+        return 0
+
+    def update(self, state: Any, purchase: Dict) -> Any:
+        return state
+
+    def revert(self, state: Any, purchase: Dict) -> Any:
+        """Undo ``update`` for a deleted purchase, or the old values of an edited one."""
+        return state
+
+    @abstractmethod
+    def unlocked(self, state: Any, purchase: Dict) -> bool:
+        """Whether the badge unlocks at ``state``, right after ``purchase`` was folded in."""
+
+    @abstractmethod
+    def backfill(self, df: pd.DataFrame, state: Any) -> Tuple[Any, bool]:
+        """Replay ``df`` on top of ``state``; returns the new state and whether it ever unlocked."""
+
+
+class CountRule(BadgeRule):
+    """Unlocks once ``threshold`` purchases (optionally matching ``eco_only``) are logged."""
+
+    def __init__(self, badge: str, threshold: int, eco_only: bool = False):
+        self.badge, self.threshold, self.eco_only = badge, threshold, eco_only
+
+    def update(self, state: int, purchase: Dict) -> int:
+        if self.eco_only and not is_eco(purchase['type']):
+            return state
+        return state + 1
+
+    def revert(self, state: int, purchase: Dict) -> int:
+        if self.eco_only and not is_eco(purchase['type']):
+            return state
+        return max(state - 1, 0)
+
+    def unlocked(self, state: int, purchase: Dict) -> bool:
+        return state >= self.threshold
+
+    def backfill(self, df: pd.DataFrame, state: int) -> Tuple[int, bool]:
+        count = state + (int(_eco_mask(df).sum()) if self.eco_only else len(df))
+        return count, count >= self.threshold
+
+
+class LastItemRule(BadgeRule):
+    """Unlocks when a single purchase satisfies ``predicate`` (a per-row and a vectorized form)."""
+
+    def __init__(self, badge: str, predicate: Callable[[Dict], bool],
+                 vector_predicate: Callable[[pd.DataFrame], np.ndarray]):
+        self.badge, self.predicate, self.vector_predicate = badge, predicate, vector_predicate
+
+    def initial_state(self) -> None:
+        return None
+
+    def unlocked(self, state: None, purchase: Dict) -> bool:
+        return self.predicate(purchase)
+
+    def backfill(self, df: pd.DataFrame, state: None) -> Tuple[None, bool]:
+        return None, bool(np.any(self.vector_predicate(df)))
+
+
+def _month(date_str: str) -> str:
+    """'YYYY-MM' of a stored date, the same key as the month rollups."""
+    return date_str[:7]
+
+
+class MonthlyTotalRule(BadgeRule):
+    """Unlocks when a month's CO₂ stays below ``limit`` once ``min_items`` are logged in it.
+
+    With ``goal_key``, the limit is that ``user_profile`` value when one is set.
+    The state keeps ``[co2, count]`` per month, so purchases dated in another
+    month (imports, edits) count towards their own month. It does not depend
+    on the limit, so changing the goal applies at once.
+    """
+
+    def __init__(self, badge: str, limit: float, min_items: int, goal_key: Optional[str] = None):
+        self.badge, self.limit, self.min_items, self.goal_key = badge, limit, min_items, goal_key
+
+    def bind(self, goals: Dict) -> 'MonthlyTotalRule':
+        try:
+            limit = float(goals.get(self.goal_key) or 0) if self.goal_key else 0
+        except (TypeError, ValueError):
+            limit = 0
+        return MonthlyTotalRule(self.badge, limit, self.min_items) if limit > 0 else self
+
+    def initial_state(self) -> Dict:
+        return {}  # {'YYYY-MM': [co2 total, item count]}; lists so it round-trips through JSON
+
+    @staticmethod
+    def _months(state: Any) -> Dict:
+        # Progress saved as a single all-time [co2, count] total starts over
+        return dict(state) if isinstance(state, dict) else {}
+
+    def update(self, state: Dict, purchase: Dict) -> Dict:
+        state = self._months(state)
+        month = _month(purchase['date'])
+        co2, count = state.get(month, (0.0, 0))
+        state[month] = [co2 + purchase['co2_impact'], count + 1]
+        return state
+
+    def revert(self, state: Dict, purchase: Dict) -> Dict:
+        state = self._months(state)
+        month = _month(purchase['date'])
+        if month in state:
+            co2, count = state[month]
+            if count > 1:
+                state[month] = [co2 - purchase['co2_impact'], count - 1]
+            else:
+                del state[month]
+        return state
+
+    def unlocked(self, state: Dict, purchase: Dict) -> bool:
+        co2, count = state.get(_month(purchase['date']), (0.0, 0))
+        return count >= self.min_items and co2 < self.limit
+
+    def backfill(self, df: pd.DataFrame, state: Dict) -> Tuple[Dict, bool]:
+        state = self._months(state)
+        if not len(df):
+            return state, False
+        codes, months = pd.factorize(df['date'].str[:7])
+        start_co2 = np.array([state.get(m, (0.0, 0))[0] for m in months], dtype=np.float64)
+        start_count = np.array([state.get(m, (0.0, 0))[1] for m in months], dtype=np.int64)
+        co2 = pd.Series(df['co2_impact'].to_numpy(dtype=np.float64))
+        # Month-to-date totals after each row, in row order within each month
+        running = start_co2[codes] + co2.groupby(codes).cumsum().to_numpy()
+        counts = start_count[codes] + co2.groupby(codes).cumcount().to_numpy() + 1
+        hit = np.any((counts >= self.min_items) & (running < self.limit))
+        sums = np.bincount(codes, weights=co2.to_numpy(), minlength=len(months))
+        sizes = np.bincount(codes, minlength=len(months))
+        for i, month in enumerate(months):
+            state[month] = [float(start_co2[i] + sums[i]), int(start_count[i] + sizes[i])]
+        return state, bool(hit)
+
+
+DEFAULT_RULES: List[BadgeRule] = [
+    CountRule('first_step', 1),
+    CountRule('thrift_king', 3, eco_only=True),
+    LastItemRule('low_carbon', lambda p: p['co2_impact'] < 1.0,
+                 lambda df: df['co2_impact'].to_numpy() < 1.0),
+    LastItemRule('big_saver', lambda p: p['price'] > 10000,
+                 lambda df: df['price'].to_numpy() > 10000),
+    MonthlyTotalRule('eco_warrior', limit=50, min_items=5, goal_key='co2Goal'),
+    CountRule('consistent', 5),
+]
+
+
+class BadgeEngine:
+    """Evaluates every rule against each new purchase in O(rules).
+
+    Rule state lives in a plain dict (``user_profile['badge_progress']``), so
+    it is persisted together with the earned badges. ``goals`` (the profile,
+    e.g. ``co2Goal``) override the default thresholds of rules tied to them.
+    """
+
+    def __init__(self, rules: Optional[List[BadgeRule]] = None):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+
+    def _rules(self, goals: Optional[Dict]) -> List[BadgeRule]:
+        return [rule.bind(goals) for rule in self.rules] if goals else self.rules
+
+    def evaluate(self, progress: Dict, purchase: Dict, owned: List[str],
+                 goals: Optional[Dict] = None) -> List[str]:
+        """Update ``progress`` in place and return every badge unlocked by ``purchase``."""
+        unlocked = []
+        for rule in self._rules(goals):
+            state = progress.get(rule.badge, rule.initial_state())
+            state = rule.update(state, purchase)
+            progress[rule.badge] = state
+            if rule.badge not in owned and rule.unlocked(state, purchase):
+                unlocked.append(rule.badge)
+        return unlocked
+
+    def retract(self, progress: Dict, purchase: Dict) -> None:
+        """Take a deleted purchase (or an edited one's old values) back out of ``progress``.
+
+        Badges already earned are kept.
+        """
+        for rule in self.rules:
+            if rule.badge in progress:
+                progress[rule.badge] = rule.revert(progress[rule.badge], purchase)
+
+    def backfill(self, df: pd.DataFrame, owned: List[str], progress: Optional[Dict] = None,
+                 goals: Optional[Dict] = None) -> Tuple[Dict, List[str]]:
+        """Replay a block of history (e.g. an import) in one vectorized pass per rule.
+
+        Starts from ``progress`` (a fresh state when omitted), so a long
+        history can be folded chunk by chunk. Returns the resulting progress
+        dict and the badges not yet in ``owned``.
+        """
+        progress = dict(progress or {})
+        unlocked = []
+        for rule in self._rules(goals):
+            state, hit = rule.backfill(df, progress.get(rule.badge, rule.initial_state()))
+            progress[rule.badge] = state
+            if hit and rule.badge not in owned:
+                unlocked.append(rule.badge)
+        return progress, unlocked
@@ -0,0 +1,209 @@
+"""
+ShopImpact - Benchmarks
+Times the hot paths on synthetic histories and writes machine-readable results.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from shopimpact.aggregates import LedgerAggregates
+from shopimpact.badges import BadgeEngine
+from shopimpact.exporter import write_export
+from shopimpact.goals import month_progress
+from shopimpact.storage import DEFAULT_COMPACT_EVERY, JournalStore, SQLiteStore, Storage, get_default_data
+from shopimpact.synthetic import synthetic_ledger
+
+DEFAULT_SIZES = '1k,100k,1m'
+DEFAULT_OUTPUT = 'bench_results.json'
+# A run is flagged when a benchmark gets this much slower than the baseline
+DEFAULT_THRESHOLD = 1.25
+# Purchases per badges_evaluate sample
+BADGE_SAMPLE = 1000
+BACKENDS = {'json': lambda d: JournalStore(d / 'bench.json'), 'sqlite': lambda d: SQLiteStore(d / 'bench.db')}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+
+class _NullSink:
+    """Byte sink that only counts, so exports are timed without holding the file."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data: bytes) -> int:
+        self.bytes += len(data)
+        return len(data)
+
+
+def _time(fn: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _record(results: List[Dict], name: str, backend: str, rows: int, samples: List[float], ops: int = 1) -> None:
+    median = statistics.median(samples)
+    results.append({
+        'benchmark': name, 'backend': backend, 'rows': rows, 'ops': ops, 'repeat': len(samples),
+        'median_s': median, 'min_s': min(samples), 'per_op_us': median / ops * 1e6,
+    })
+    print(f"  {backend:<6} {rows:>9,} {name:<22} {median * 1000:>10.2f} ms"
+          + (f"  ({median / ops * 1e6:,.1f} µs/op)" if ops > 1 else ''), file=sys.stderr)
+
+
+def bench_backend(backend: str, df: pd.DataFrame, repeat: int, results: List[Dict]) -> None:
+    rows = len(df)
+    engine = BadgeEngine()
+    with tempfile.TemporaryDirectory(prefix='shopimpact-bench-') as tmp:
+        tmp = Path(tmp)
+        store: Storage = BACKENDS[backend](tmp)
+        _record(results, 'bulk_import', backend, rows, _time(lambda: store.append_frames([df]), 1))
+
+        def cold_load():
+            # What the first render of a session reads
+            fresh = BACKENDS[backend](tmp)
+            fresh.load_profile(), fresh.aggregates(), fresh.recent(5)
+            if hasattr(fresh, 'close'):
+                fresh.close()
+        _record(results, 'cold_load', backend, rows, _time(cold_load, repeat))
+
+        # Hidden Toll: the dashboard reads the maintained totals; the full
+        # recompute is what migrations and legacy files fall back to.
+        _record(results, 'hidden_toll', backend, rows, _time(store.aggregates, repeat))
+        full = store.frame()
+        _record(results, 'hidden_toll_recompute', backend, rows,
+                _time(lambda: LedgerAggregates.from_frame(full), repeat))
+
+        # Month-to-date budget check, done before and after every add: one rollup bucket
+        month = date.fromisoformat(full['date'].max()[:10]) if rows else date.today()
+        profile = get_default_data()['user_profile']
+        _record(results, 'month_goals', backend, rows,
+                _time(lambda: month_progress(store.month_totals(month), profile, month), repeat))
+
+        _record(results, 'category_totals', backend, rows, _time(store.category_totals, repeat))
+        _record(results, 'split_totals', backend, rows,
+                _time(lambda: store.split_totals(['Books (Used)', 'Thrifted Clothing']), repeat))
+        for granularity in ('day', 'week', 'month'):
+            _record(results, f'rollup_{granularity}', backend, rows,
+                    _time(lambda: store.rollup(granularity), repeat))
+        _record(results, 'recent_5', backend, rows, _time(lambda: store.recent(5), repeat))
+        _record(results, 'frame', backend, rows, _time(store.frame, repeat))
+        _record(results, 'export_csv', backend, rows,
+                _time(lambda: write_export(store, _NullSink(), 'csv'), repeat))
+
+        progress, owned = engine.backfill(full, [], goals=profile)
+        _record(results, 'badges_backfill', backend, rows,
+                _time(lambda: engine.backfill(full, [], goals=profile), repeat))
+
+        # Per-purchase check, as check_badges runs it after every add, on the rule state of the whole history
+        sample = df.tail(BADGE_SAMPLE).to_dict('records')
+
+        def evaluate_badges():
+            state = dict(progress)
+            for purchase in sample:
+                engine.evaluate(state, purchase, owned, goals=profile)
+        _record(results, 'badges_evaluate', backend, rows, _time(evaluate_badges, repeat), ops=len(sample))
+
+        # One journal compaction per DEFAULT_COMPACT_EVERY appends, so this is the amortized cost;
+        # the final flush keeps queued (write-behind) records in the measurement
+        purchases = df.head(DEFAULT_COMPACT_EVERY).to_dict('records')
+
+        def add_purchases():
+            for purchase in purchases:
+                store.append_purchase(purchase)
+                engine.evaluate(progress, purchase, owned, goals=profile)
+            store.flush()
+        _record(results, 'add_purchase', backend, rows, _time(add_purchases, 1), ops=len(purchases))
+        if hasattr(store, 'close'):
+            store.close()
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """Benchmarks present in both runs whose median grew by more than ``threshold``."""
+    def key(r):
+        return r['benchmark'], r['backend'], r['rows']
+    old = {key(r): r for r in baseline['results']}
+    regressions = []
+    for r in current['results']:
+        before = old.get(key(r))
+        if before and before['median_s'] > 0:
+            ratio = r['median_s'] / before['median_s']
+            if ratio > threshold:
+                regressions.append({**r, 'baseline_s': before['median_s'], 'ratio': ratio})
+    return regressions
+
+
+def run(sizes: List[int], backends: List[str], repeat: int = 3, seed: int = 0) -> Dict:
+    results: List[Dict] = []
+    for size in sizes:
+        df = synthetic_ledger(size, seed=seed)
+        for backend in backends:
+            bench_backend(backend, df, repeat, results)
+    return {'env': environment(), 'config': {'sizes': sizes, 'backends': backends, 'repeat': repeat, 'seed': seed},
+            'results': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark ShopImpact on synthetic purchase histories.")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"Comma-separated history sizes (default {DEFAULT_SIZES})")
+    parser.add_argument('--backend', action='append', choices=list(BACKENDS), dest='backends',
+                        help="Storage backend (repeatable; default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="Samples per benchmark; the median is reported")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help="Results file (JSON)")
+    parser.add_argument('--compare', metavar='BASELINE', help="Previous results file; exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Slowdown ratio counted as a regression (default {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+
+    report = run([parse_size(s) for s in args.sizes.split(',')], args.backends or list(BACKENDS),
+                 args.repeat, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(report['results'])} results to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            slower = compare(report, json.load(f), args.threshold)
+        for r in slower:
+            print(f"REGRESSION {r['backend']} {r['rows']:,} {r['benchmark']}: "
+                  f"{r['baseline_s'] * 1000:.2f} ms -> {r['median_s'] * 1000:.2f} ms ({r['ratio']:.2f}x)",
+                  file=sys.stderr)
+        sys.exit(1 if slower else 0)
@@ -0,0 +1,205 @@
+"""
+ShopImpact - Catalog
+Product taxonomy, brands and the compiled category resolver.
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple
+
+# Taxonomy groups, in display order. PRODUCT_TYPES keeps this order (ledger codes depend on it).
+PRODUCT_GROUPS = {
+    'Fashion & Apparel': [
+        'Fast Fashion', 'T-Shirt', 'Jeans', 'Dress', 'Suit', 'Jacket', 'Sweater', 'Hoodie', 'Shorts', 'Skirt',
+        'Blazer', 'Coat', 'Pants', 'Leggings', 'Activewear', 'Swimwear', 'Underwear', 'Socks', 'Shoes', 'Sneakers',
+        'Cotton Shirt', 'Linen Shirt', 'Bamboo Fabric Clothing', 'Hemp Clothing', 'Recycled Polyester Gear',
+        'Upcycled Jacket', 'Vegan Leather Jacket', 'Organic Cotton T-Shirt', 'Rental Dress', 'Rental Tuxedo',
+        'Handloom Saree', 'Khadi Kurta', 'Ethical Wool Sweater', 'Silk Scarf (Ahimsa Silk)'
+    ],
+    'Electronics & Tech': [
+        'Electronics', 'Smartphone', 'Laptop', 'Tablet', 'Desktop Computer', 'Monitor', 'Keyboard', 'Mouse',
+        'Headphones', 'Gaming Console', 'Smartwatch', 'Camera', 'TV', 'Speaker', 'Drone',
+        'Refurbished Smartphone', 'Refurbished Laptop', 'Second-Hand Tablet', 'Used Camera Lens', 'Used Gaming Console',
+        'E-Reader', 'Solar Charger', 'Rechargeable Batteries', 'Smart Thermostat', 'LED Smart Bulb',
+        'Energy Efficient AC', 'Repair Service (Phone)', 'Repair Service (Laptop)'
+    ],
+    'Food & Groceries': [
+        'Local Groceries', 'Organic Vegetables', 'Organic Fruits', 'Meat', 'Dairy Products', 'Snacks',
+        'Restaurant Meal', 'Fast Food', 'Coffee', 'Dessert',
+        'Plant-Based Meat', 'Oat Milk', 'Almond Milk', 'Soy Milk', 'Loose Leaf Tea', 'Fair Trade Coffee',
+        'Bulk Grains (No Plastic)', 'Ugly Produce (Imperfect Veg)', 'Locally Sourced Honey', 'Home-Grown Herbs',
+        'Compostable Coffee Pods', 'Tap Water (Filtered)', 'Bottled Water'
+    ],
+    'Home & Living': [
+        'Home Decor', 'Sofa', 'Chair', 'Table', 'Bed', 'Mattress', 'Kitchenware', 'Appliance',
+        'Vintage Furniture', 'Bamboo Furniture', 'Reclaimed Wood Table', 'Cast Iron Skillet (Lifetime)',
+        'Glass Food Containers', 'Beeswax Wraps', 'Silicone Stasher Bags', 'Compostable Plates',
+        'Biodegradable Trash Bags', 'Loofah Sponge', 'Bamboo Toothbrush', 'Safety Razor', 'Menstrual Cup',
+        'Solid Shampoo Bar', 'Refillable Soap', 'Solar Garden Lights', 'Rainwater Harvesting Kit'
+    ],
+    'Transport & Travel': [
+        'Car Parts', 'Tires', 'Car Accessories',
+        'Bicycle', 'E-Bike', 'Electric Scooter', 'Public Transit Pass', 'Train Ticket', 'Flight Ticket',
+        'EV Charging Session', 'Carpool Contribution', 'Walking Shoes'
+    ],
+    'Books, Media & Hobbies': [
+        'Books (New)', 'Books (Used)', 'E-book', 'Vinyl Record', 'Video Game',
+        'Library Membership', 'Digital Magazine Subscription', 'Audiobook', 'Digital Game Download',
+        'Yoga Mat (Cork)', 'Gym Equipment', 'Sports Gear', 'Camping Gear', 'Used Sports Gear',
+        'Musical Instrument (Used)', 'Art Supplies (Non-Toxic)'
+    ],
+    'Specialized & Eco': [
+        'Leather Goods', 'Vegan Leather',
+        'Second-Hand Item', 'Thrifted Clothing', 'Used Electronics', 'Refurbished Tech',
+        'Office Supplies', 'Stationery', 'Recycled Paper Notebook', 'Refillable Pen',
+        'Gift Card', 'Subscription', 'Event Ticket', 'Digital Download', 'Carbon Offset Credit', 'Tree Planting Donation',
+        '500+ (Other)'
+    ],
+}
+
+PRODUCT_TYPES = [t for types in PRODUCT_GROUPS.values() for t in types]
+
+ALL_BRANDS = [
+    # Global Giants
+    'Zara', 'H&M', 'Nike', 'Adidas', 'Uniqlo', 'Gucci', 'Louis Vuitton', 'Patagonia', 'The North Face', 'Levi\'s',
+    'Apple', 'Samsung', 'Sony', 'Dell', 'HP', 'Lenovo', 'Asus', 'Microsoft', 'Google', 'Canon',
+    'IKEA', 'West Elm', 'Pottery Barn', 'Ashley Furniture', 'Wayfair',
+    'Sephora', 'L\'Oreal', 'Estee Lauder', 'Mac', 'Fenty Beauty', 'The Body Shop', 'Lush',
+    'Amazon', 'Barnes & Noble', 'Penguin Random House', 'Nintendo', 'PlayStation', 'Xbox',
+    'Toyota', 'Honda', 'Ford', 'Tesla', 'BMW', 'Tata Motors', 'Mahindra', 'Hyundai',
+    
+    # Fast Fashion & High Street
+    'SHEIN', 'Forever 21', 'Primark', 'Mango', 'Pull&Bear', 'Bershka', 'Stradivarius', 'Topshop', 'Fashion Nova',
+    'Urban Outfitters', 'ASOS', 'Boohoo', 'PrettyLittleThing', 'Missguided', 'Cotton On', 'Old Navy', 'GAP',
+    'C&A', 'New Look', 'River Island', 'Next', 'Reserved', 'Monki', 'Weekday', '& Other Stories', 'Oysho',
+    'Massimo Dutti', 'LC Waikiki', 'Defacto', 'Giordano', 'Baleno', 'Metersbonwe', 'UR (Urban Revivo)', 'Sinsay',
+    'Lindex', 'Gina Tricot', 'Cubus', 'Terranova', 'Calliope', 'Splash', 'Max Fashion', 'Westside', 'Pantaloons',
+    'Reliance Trends', 'Shoppers Stop', 'Avra', 'NA-KD', 'Revolve', 'FabIndia', 'Biba', 'W for Woman', 'Manyavar',
+    
+    # Food & Consumables
+    'Whole Foods', 'Trader Joe\'s', 'Nestle', 'Coca-Cola', 'Pepsi', 'Danone', 'Beyond Meat', 'Impossible Foods',
+    'Amul', 'Britannia', 'Haldiram\'s', 'ITC', 'Mother Dairy', 'Tata Consumer', 'Organic India', '24 Mantra',
+    
+    # Eco & Specialized
+    'Local Thrift Store', 'Goodwill', 'Salvation Army', 'Depop', 'Poshmark', 'Etsy', 'eBay', 'ThredUp', 'Vinted',
+    'Back Market', 'Gazelle', 'Cashify', 'OLX', 'Quikr',
+    'Local Farm', 'Farmers Market', 'Small Business', 'Handmade', 'Generic', 'Zero Waste Store',
+    'Bambooee', 'Who Gives A Crap', 'Stasher', 'Swell', 'Hydro Flask', 'Klean Kanteen',
+    'Mamaearth', 'Forest Essentials', 'Kama Ayurveda', 'Khadi Natural', 'Bare Necessities',
+    'Other'
+]
+
+# Simplified Multipliers for logic
+BASE_MULTIPLIERS = {
+    # High Impact
+    'Fast Fashion': 2.5, 'Jeans': 3.2, 'Coat': 4.2, 'Leather Goods': 3.5, 'Shoes': 3.0, 'Sneakers': 3.0,
+    'Electronics': 1.8, 'Smartphone': 2.5, 'Laptop': 3.0, 'Desktop Computer': 3.5, 'Gaming Console': 3.0, 'TV': 3.0,
+    'Meat': 1.5, 'Dairy Products': 0.6, 'Cheese': 1.0, 'Flight Ticket': 5.0, 'Car Parts': 2.0,
+    'Sofa': 4.0, 'Bed': 3.5, 'Appliance': 2.0, 'AC': 4.0,
+    
+    # Medium Impact
+    'Cotton Shirt': 1.5, 'T-Shirt': 1.5, 'Furniture': 1.5, 'Cosmetics': 1.5, 'Perfume': 1.5,
+    'Books (New)': 0.5, 'Paper': 0.5, 'Plastic Items': 2.0,
+
+    # Low Impact / Eco
+    'Local Groceries': 0.3, 'Organic Vegetables': 0.2, 'Bulk Grains': 0.2, 'Plant-Based Meat': 0.5,
+    'Bamboo Fabric': 0.8, 'Hemp Clothing': 0.6, 'Linen Shirt': 0.8, 'Organic Cotton': 0.8,
+    'Books (Used)': 0.05, 'E-book': 0.02, 'Audiobook': 0.02, 'Digital Download': 0.02,
+    'Bicycle': 5.0, 
+    'Used Electronics': 0.15, 'Refurbished Tech': 0.15, 'Refurbished Smartphone': 0.2,
+    'Second-Hand Item': 0.1, 'Thrifted Clothing': 0.08, 'Vintage Furniture': 0.1,
+    'Service': 0.0, 'Repair Service': 0.05, 'Rental Dress': 0.1,
+    'Solar Charger': 1.0, 'LED Bulb': 0.1
+}
+
+ECO_FRIENDLY_CATEGORIES = [
+    'Second-Hand Item', 'Local Groceries', 'Books (Used)', 'Thrifted Clothing',
+    'Used Electronics', 'Vintage Furniture', 'Organic Vegetables', 'Organic Fruits',
+    'Refurbished Tech', 'Bicycle', 'Vegan Leather', 'Digital Download',
+    'Refurbished Smartphone', 'Refurbished Laptop', 'Bamboo Fabric Clothing', 'Hemp Clothing',
+    'Plant-Based Meat', 'Oat Milk', 'Reclaimed Wood Table', 'Compostable Plates',
+    'Solar Charger', 'Repair Service', 'Rental Dress', 'Library Membership', 'Public Transit Pass',
+    'Ugly Produce', 'Bulk Grains'
+]
+
+# Hidden Toll keyword classes (see "The Hidden Toll" on the dashboard)
+WATER_INTENSIVE_KEYWORDS = ['Shirt', 'Jeans', 'Cotton', 'Meat', 'Dairy', 'Fashion', 'Dress']
+TREE_INTENSIVE_KEYWORDS = ['Paper', 'Book', 'Wood', 'Furniture', 'Table', 'Chair', 'Sofa']
+WATER_L_PER_KG = {True: 150, False: 20}       # High water multiplier vs base manufacturing usage
+TREES_PER_KG = {True: 0.05, False: 0.002}     # Paper/furniture vs minimal packaging impact
+
+_ECO_SET = frozenset(ECO_FRIENDLY_CATEGORIES)
+
+
+class CategoryInfo(NamedTuple):
+    multiplier: float
+    eco: bool
+    water_intensive: bool
+    tree_intensive: bool
+
+
+def _keyword_multiplier(product_type: str) -> float:
+    if 'Refurbished' in product_type or 'Used' in product_type or 'Second-Hand' in product_type or 'Thrift' in product_type:
+        return 0.1
+    elif 'Bamboo' in product_type or 'Hemp' in product_type or 'Organic' in product_type:
+        return 0.5
+    elif 'Rental' in product_type:
+        return 0.1
+    elif 'Leather' in product_type:
+        return 3.5
+    elif 'Plastic' in product_type:
+        return 2.0
+    else:
+        return 1.0
+
+
+def _classify(product_type: str) -> CategoryInfo:
+    """Runs the keyword rules once for a single type."""
+    if product_type in BASE_MULTIPLIERS:
+        multiplier = BASE_MULTIPLIERS[product_type]
+    else:
+        multiplier = _keyword_multiplier(product_type)
+    return CategoryInfo(
+        multiplier=multiplier,
+        eco=product_type in _ECO_SET,
+        water_intensive=any(x in product_type for x in WATER_INTENSIVE_KEYWORDS),
+        tree_intensive=any(x in product_type for x in TREE_INTENSIVE_KEYWORDS),
+    )
+
+
+# Compiled once at import: every known type resolves with a single dict hit.
+CATEGORY_TABLE: Dict[str, CategoryInfo] = {
+    t: _classify(t) for t in [*PRODUCT_TYPES, *BASE_MULTIPLIERS, *ECO_FRIENDLY_CATEGORIES]
+}
+
+
+@lru_cache(maxsize=4096)
+def _resolve_unknown(product_type: str) -> CategoryInfo:
+    return _classify(product_type)
+
+
+def resolve_category(product_type: str) -> CategoryInfo:
+    """O(1) lookup for known types; free-text types fall back to the memoized keyword rules."""
+    info = CATEGORY_TABLE.get(product_type)
+    return info if info is not None else _resolve_unknown(product_type)
+
+
+def resolve_many(product_types: Iterable[str]) -> List[CategoryInfo]:
+    table = CATEGORY_TABLE
+    return [table.get(t) or _resolve_unknown(t) for t in product_types]
+
+
+def get_product_multiplier(product_type: str) -> float:
+    return resolve_category(product_type).multiplier
+
+
+def is_eco(product_type: str) -> bool:
+    return resolve_category(product_type).eco
+
+
+def estimate_co2(product_type: str, price: float) -> float:
+    """CO₂ (kg) for one purchase: price x multiplier / 100, halved for eco-friendly categories."""
+    info = resolve_category(product_type)
+    co2_impact = price * info.multiplier / 100
+    if info.eco:
+        co2_impact *= 0.5
+    return co2_impact
@@ -0,0 +1,92 @@
+"""
+ShopImpact - Downsampling
+Bounded-size series for charts: LTTB and min/max bucketing.
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Upper bound on points sent to the browser per trend chart,
+# e.g. SHOPIMPACT_TREND_POINTS=500
+POINT_BUDGET_ENV = 'SHOPIMPACT_TREND_POINTS'
+DEFAULT_POINT_BUDGET = 1000
+DOWNSAMPLE_METHODS = ('minmax', 'lttb')
+
+
+def point_budget() -> int:
+    try:
+        return max(int(os.environ.get(POINT_BUDGET_ENV, DEFAULT_POINT_BUDGET)), 4)
+    except ValueError:
+        return DEFAULT_POINT_BUDGET
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the first/last point plus the min and max of each of ``(n_out - 2) // 2`` buckets.
+
+    Every local extreme survives at bucket resolution, so peaks are never
+    flattened away. Returns at most ``n_out`` sorted indices.
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    n_buckets = max((n_out - 2) // 2, 1)
+    bucket = np.minimum(np.arange(n) * n_buckets // n, n_buckets - 1)
+    # Sort by (bucket, y): each bucket's first entry is its min, its last its max
+    order = np.lexsort((y, bucket))
+    starts = np.flatnonzero(np.r_[True, bucket[order][1:] != bucket[order][:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    keep = np.concatenate(([0, n - 1], order[starts], order[ends]))
+    return np.unique(keep)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: ``n_out`` indices that preserve the visual shape."""
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:max(n_out, 0)], dtype=np.int64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Interior points split into n_out - 2 buckets; first and last are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def downsample(df: pd.DataFrame, x: str, y: str, max_points: Optional[int] = None,
+               method: str = 'minmax') -> pd.DataFrame:
+    """Rows of ``df`` (sorted by ``x``) reduced to at most ``max_points`` for plotting.
+
+    ``x`` may be numeric or date-like; other columns ride along with the kept rows.
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unknown downsampling method: {method!r} (expected one of {', '.join(DOWNSAMPLE_METHODS)})")
+    max_points = max_points or point_budget()
+    if len(df) <= max_points:
+        return df
+    values = df[y].to_numpy(dtype=np.float64)
+    if method == 'minmax':
+        keep = minmax_indices(values, max_points)
+    else:
+        xs = df[x]
+        if not pd.api.types.is_numeric_dtype(xs):
+            xs = pd.to_datetime(xs).astype('int64')
+        keep = lttb_indices(xs.to_numpy(dtype=np.float64), values, max_points)
+    return df.iloc[keep]
@@ -0,0 +1,95 @@
+"""
+ShopImpact - Exporter
+Streams filtered purchase history to CSV, Parquet or Feather.
+"""
+
+import argparse
+from datetime import date
+from typing import BinaryIO, Iterable, List, Optional
+
+import pandas as pd
+
+from shopimpact.storage import DEFAULT_CHUNKSIZE, PURCHASE_COLUMNS, Storage, open_storage
+
+EXPORT_FORMATS = {
+    'csv': {'label': 'CSV', 'mime': 'text/csv', 'ext': 'csv'},
+    'parquet': {'label': 'Parquet', 'mime': 'application/vnd.apache.parquet', 'ext': 'parquet'},
+    'feather': {'label': 'Feather (Arrow IPC)', 'mime': 'application/vnd.apache.arrow.file', 'ext': 'feather'},
+}
+
+
+def arrow_available() -> bool:
+    """Parquet/Feather need the optional ``pyarrow`` package."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def available_formats() -> List[str]:
+    return [f for f in EXPORT_FORMATS if f == 'csv' or arrow_available()]
+
+
+def _write_csv(frames: Iterable[pd.DataFrame], out: BinaryIO) -> int:
+    rows, header = 0, True
+    for frame in frames:
+        out.write(frame.to_csv(index=False, header=header).encode('utf-8'))
+        header = False
+        rows += len(frame)
+    if header:
+        # Nothing matched: still emit a header-only file
+        out.write(pd.DataFrame(columns=PURCHASE_COLUMNS).to_csv(index=False).encode('utf-8'))
+    return rows
+
+
+def _write_arrow(frames: Iterable[pd.DataFrame], out: BinaryIO, fmt: str) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('date', pa.string()), ('type', pa.string()), ('brand', pa.string()),
+        ('price', pa.float64()), ('co2_impact', pa.float64()),
+    ])
+    # Parquet: one row group per chunk. Feather v2 is the Arrow IPC file format.
+    writer = pq.ParquetWriter(out, schema) if fmt == 'parquet' else pa.ipc.new_file(out, schema)
+    rows = 0
+    try:
+        for frame in frames:
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            rows += len(frame)
+    finally:
+        writer.close()
+    return rows
+
+
+def write_export(storage: Storage, out: BinaryIO, fmt: str = 'csv',
+                 start: Optional[date] = None, end: Optional[date] = None,
+                 types: Optional[Iterable[str]] = None,
+                 chunksize: int = DEFAULT_CHUNKSIZE) -> int:
+    """Write matching purchases to ``out`` chunk by chunk; returns the row count.
+
+    Only one chunk is materialized at a time, so peak memory follows
+    ``chunksize`` rather than history size.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt!r} (expected one of {', '.join(EXPORT_FORMATS)})")
+    frames = storage.iter_frames(start=start, end=end, types=types, chunksize=chunksize)
+    if fmt == 'csv':
+        return _write_csv(frames, out)
+    if not arrow_available():
+        raise ImportError(f"{EXPORT_FORMATS[fmt]['label']} export requires pyarrow (pip install pyarrow)")
+    return _write_arrow(frames, out, fmt)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export ShopImpact purchases.")
+    parser.add_argument('output', help="Destination file")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--start', type=date.fromisoformat, help="First day (YYYY-MM-DD), inclusive")
+    parser.add_argument('--end', type=date.fromisoformat, help="Last day (YYYY-MM-DD), inclusive")
+    parser.add_argument('--type', action='append', dest='types', help="Category to include (repeatable)")
+    args = parser.parse_args()
+    with open(args.output, 'wb') as f:
+        n = write_export(open_storage(), f, args.format, args.start, args.end, args.types)
+    print(f"Exported {n:,} purchases to {args.output}")
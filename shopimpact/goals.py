@@ -0,0 +1,101 @@
+"""
+ShopImpact - Goals
+Month-to-date spend and CO₂ against the profile's budget and goal, with alerts.
+"""
+
+import calendar
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional
+
+from shopimpact.aggregates import BucketTotals
+
+# user_profile keys holding the monthly limits, per tracked metric
+GOAL_KEYS = {'spend': 'monthlyBudget', 'co2': 'co2Goal'}
+# Shares of a limit that raise an alert when a purchase takes the month past them
+ALERT_LEVELS = (0.5, 0.8, 1.0)
+
+
+class GoalStatus(NamedTuple):
+    metric: str  # 'spend' or 'co2'
+    used: float  # Month to date
+    limit: float  # 0 when the user has not set one
+    projected: float  # Month-end total at the current daily rate
+
+    @property
+    def ratio(self) -> float:
+        return self.used / self.limit if self.limit > 0 else 0.0
+
+    @property
+    def projected_ratio(self) -> float:
+        return self.projected / self.limit if self.limit > 0 else 0.0
+
+    @property
+    def projected_overrun(self) -> float:
+        """How far the projection ends up above the limit (0 when on track or unset)."""
+        return max(self.projected - self.limit, 0.0) if self.limit > 0 else 0.0
+
+
+class MonthProgress(NamedTuple):
+    month: str  # 'YYYY-MM'
+    day: int  # Day of the month the projection is taken at
+    days: int  # Days in the month
+    count: int
+    spend: GoalStatus
+    co2: GoalStatus
+
+
+class GoalAlert(NamedTuple):
+    status: GoalStatus
+    level: Optional[float]  # One of ALERT_LEVELS, or None for a projection that went over the limit
+
+    @property
+    def message(self) -> str:
+        s = self.status
+        if s.metric == 'spend':
+            what, used, over = "monthly budget", f"₹{s.used:,.0f} of ₹{s.limit:,.0f}", f"₹{s.projected_overrun:,.0f}"
+        else:
+            what, used, over = "monthly CO₂ goal", f"{s.used:.1f} of {s.limit:.1f} kg", f"{s.projected_overrun:.1f} kg"
+        if self.level is None:
+            return f"At this pace you will exceed your {what} by {over} this month."
+        if self.level >= 1.0:
+            return f"You have gone over your {what}: {used}."
+        return f"You have used {self.level:.0%} of your {what}: {used}."
+
+
+def _limit(profile: Dict, metric: str) -> float:
+    try:
+        return max(float(profile.get(GOAL_KEYS[metric]) or 0), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def month_progress(totals: BucketTotals, profile: Dict, today: date) -> MonthProgress:
+    """Month-to-date ``totals`` (``Storage.month_totals``) against the limits in ``profile``.
+
+    The projection extrapolates the month so far linearly: ``used / day * days``.
+    """
+    days = calendar.monthrange(today.year, today.month)[1]
+    scale = days / today.day
+    return MonthProgress(
+        month=today.strftime('%Y-%m'), day=today.day, days=days, count=int(totals.count),
+        spend=GoalStatus('spend', totals.price, _limit(profile, 'spend'), totals.price * scale),
+        co2=GoalStatus('co2', totals.co2_impact, _limit(profile, 'co2'), totals.co2_impact * scale),
+    )
+
+
+def crossed_alerts(before: MonthProgress, after: MonthProgress) -> List[GoalAlert]:
+    """Alerts for the thresholds that the change from ``before`` to ``after`` crossed.
+
+    Only the highest ``ALERT_LEVELS`` entry crossed per metric is reported.
+    A projection newly over the limit is reported only if no level was crossed.
+    """
+    alerts = []
+    for old, new in ((before.spend, after.spend), (before.co2, after.co2)):
+        if new.limit <= 0:
+            continue
+        levels = [level for level in ALERT_LEVELS if old.ratio < level <= new.ratio]
+        if levels:
+            alerts.append(GoalAlert(new, levels[-1]))
+        elif new.ratio < 1.0 and old.projected_ratio <= 1.0 < new.projected_ratio:
+            alerts.append(GoalAlert(new, None))
+    return alerts
@@ -0,0 +1,275 @@
+"""
+ShopImpact - History
+Sort and filter indexes over a Ledger for the paginated purchase history.
+"""
+
+import bisect
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from shopimpact.catalog import resolve_category
+
+if TYPE_CHECKING:
+    from shopimpact.ledger import Ledger
+
+SORT_KEYS = ('date', 'price', 'co2_impact')
+# Orders kept per ledger: one per sort key, plus rows grouped by category and by brand
+ORDERS = SORT_KEYS + ('type', 'brand')
+DEFAULT_PAGE_SIZE = 25
+# Result sets kept per index, i.e. filter/sort combinations being paged through
+MAX_CACHED_RESULTS = 16
+# A batch of appends larger than this share of the indexed rows is folded in by a rebuild
+REBUILD_FRACTION = 0.25
+
+# Grouped orders sort by (code, date): code << _DATE_BITS | (date + _DATE_BIAS) as one int64
+_DATE_BITS = 34
+_DATE_BIAS = 1 << 33
+
+
+@dataclass(frozen=True)
+class HistoryQuery:
+    """Filters and sort order of one history listing. Empty filters match everything.
+
+    ``start``/``end`` are inclusive dates; ``eco`` keeps only eco (True) or
+    only non-eco (False) categories.
+    """
+    start: Optional[date] = None
+    end: Optional[date] = None
+    types: Tuple[str, ...] = ()
+    brands: Tuple[str, ...] = ()
+    eco: Optional[bool] = None
+    sort: str = 'date'
+    descending: bool = True
+
+    def __post_init__(self):
+        if self.sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {self.sort!r} (expected one of {', '.join(SORT_KEYS)})")
+
+    @property
+    def filtered(self) -> bool:
+        return bool(self.start or self.end or self.types or self.brands or self.eco is not None)
+
+
+class HistoryPage(NamedTuple):
+    rows: pd.DataFrame  # 'id' plus PURCHASE_COLUMNS, in display order
+    total: int  # Rows matching the filters across all pages
+
+
+def _epoch_bounds(start: Optional[date], end: Optional[date]) -> Tuple[Optional[int], Optional[int]]:
+    """Inclusive dates -> half-open epoch-second bounds."""
+    lo = int(np.datetime64(start, 's').astype(np.int64)) if start else None
+    hi = int(np.datetime64(end + timedelta(days=1), 's').astype(np.int64)) if end else None
+    return lo, hi
+
+
+class HistoryIndex:
+    """Row orders over one Ledger, kept up to date as it changes.
+
+    Each ``SORT_KEYS`` column has a permutation of row positions sorted by
+    it. ``type`` and ``brand`` hold the rows grouped by code, in date order
+    within each group; per-code counts mark where each group's run starts.
+    Ties always break by position, so descending order is the reverse.
+
+    A listing starts from whichever index narrows its filters to the fewest
+    rows. An unfiltered listing is a slice of one permutation, and so is a
+    date range or a single category or brand in date order: those pages
+    cost O(log n + page size). Other combinations only check and sort the
+    narrowed rows. Either way the matching positions are cached, so
+    further pages are slices.
+
+    Appends are folded in on the next query, with one vectorized merge per
+    order instead of a re-sort. Edits and deletes update the orders directly.
+    """
+
+    def __init__(self, ledger: 'Ledger'):
+        self.ledger = ledger
+        self._results: Dict[HistoryQuery, np.ndarray] = {}
+        self._build()
+
+    # ---------- keys ----------
+    def _keys(self, name: str, rows: np.ndarray) -> np.ndarray:
+        cols = self.ledger.columns()
+        if name in SORT_KEYS:
+            return cols[name][rows]
+        codes = cols[name][rows].astype(np.int64)
+        return (codes << _DATE_BITS) | (cols['date'][rows] + _DATE_BIAS)
+
+    def _key_of(self, name: str) -> Callable[[int], Tuple]:
+        # Scalar (key, position) for bisecting an order without gathering all its keys
+        cols = self.ledger.columns()
+        if name in SORT_KEYS:
+            values = cols[name]
+            return lambda p: (values[p], p)
+        codes, dates = cols[name], cols['date']
+        return lambda p: ((int(codes[p]) << _DATE_BITS) | (int(dates[p]) + _DATE_BIAS), p)
+
+    # ---------- maintenance ----------
+    def _build(self) -> None:
+        n = len(self.ledger)
+        rows = np.arange(n)
+        self._orders = {name: np.argsort(self._keys(name, rows), kind='stable').astype(np.int32)
+                        for name in ORDERS}
+        cols = self.ledger.columns()
+        self._counts = {name: np.bincount(cols[name], minlength=len(self._vocabulary(name)))
+                        for name in ('type', 'brand')}
+        self._n = n
+        self._results.clear()
+
+    def _vocabulary(self, name: str):
+        return self.ledger.types if name == 'type' else self.ledger.brands
+
+    def _count(self, name: str, code: int, delta: int) -> None:
+        counts = self._counts[name]
+        if code >= len(counts):
+            counts = self._counts[name] = np.pad(counts, (0, len(self._vocabulary(name)) - len(counts)))
+        counts[code] += delta
+
+    def _sync(self) -> None:
+        n = len(self.ledger)
+        if n == self._n:
+            return
+        if n - self._n > REBUILD_FRACTION * max(self._n, 1):
+            self._build()
+            return
+        new = np.arange(self._n, n)
+        for name, order in self._orders.items():
+            keys = self._keys(name, new)
+            ranked = np.argsort(keys, kind='stable')
+            # New rows have the highest positions, so they go after equal keys
+            at = np.searchsorted(self._keys(name, order), keys[ranked], side='right')
+            self._orders[name] = np.insert(order, at, new[ranked].astype(np.int32))
+        cols = self.ledger.columns()
+        for name in ('type', 'brand'):
+            for code in cols[name][self._n:n].tolist():
+                self._count(name, code, 1)
+        self._n = n
+        self._results.clear()
+
+    def remove(self, i: int) -> None:
+        """Drop row ``i``, before the ledger deletes it (later positions move up one)."""
+        if i >= self._n:
+            return  # Not folded in yet; the pending tail just gets shorter
+        cols = self.ledger.columns()
+        for name in ('type', 'brand'):
+            self._count(name, int(cols[name][i]), -1)
+        for name, order in self._orders.items():
+            order = order[order != i]
+            order[order > i] -= 1
+            self._orders[name] = order
+        self._n -= 1
+        self._results.clear()
+
+    def detach(self, i: int) -> None:
+        """Take row ``i`` out of the orders before the ledger overwrites it."""
+        if i >= self._n:
+            return
+        cols = self.ledger.columns()
+        for name in ('type', 'brand'):
+            self._count(name, int(cols[name][i]), -1)
+        for name, order in self._orders.items():
+            self._orders[name] = order[order != i]
+        self._results.clear()
+
+    def attach(self, i: int) -> None:
+        """Put row ``i`` back after an overwrite, at its new place in every order."""
+        if i >= self._n:
+            return
+        cols = self.ledger.columns()
+        for name in ('type', 'brand'):
+            self._count(name, int(cols[name][i]), 1)
+        for name, order in self._orders.items():
+            key = self._key_of(name)
+            at = bisect.bisect_left(order, key(i), key=key)
+            self._orders[name] = np.insert(order, at, i)
+        self._results.clear()
+
+    # ---------- queries ----------
+    def _offsets(self, name: str) -> np.ndarray:
+        return np.concatenate(([0], np.cumsum(self._counts[name])))
+
+    def _date_span(self, order: np.ndarray, start: int, stop: int,
+                   lo: Optional[int], hi: Optional[int]) -> Tuple[int, int]:
+        # The rows order[start:stop] are in date order: narrow them to [lo, hi)
+        dates = self.ledger.columns()['date']
+        if lo is not None:
+            start = bisect.bisect_left(order, lo, start, stop, key=dates.__getitem__)
+        if hi is not None:
+            stop = bisect.bisect_left(order, hi, start, stop, key=dates.__getitem__)
+        return start, stop
+
+    def _codes(self, name: str, q: HistoryQuery) -> Optional[List[int]]:
+        vocabulary = self._vocabulary(name)
+        values = q.types if name == 'type' else q.brands
+        eco = q.eco if name == 'type' else None
+        if not values and eco is None:
+            return None
+        codes = ([vocabulary.index[v] for v in values if v in vocabulary.index] if values
+                 else range(len(vocabulary)))
+        if eco is not None:
+            codes = [c for c in codes if resolve_category(vocabulary.values[c]).eco == eco]
+        return sorted(set(codes))
+
+    def _select(self, q: HistoryQuery) -> np.ndarray:
+        """Matching positions in ascending ``q.sort`` order."""
+        lo, hi = _epoch_bounds(q.start, q.end)
+        dated = lo is not None or hi is not None
+        codes = {name: self._codes(name, q) for name in ('type', 'brand')}
+
+        # Candidate sources: slices of one order, each slice in date order
+        options = []
+        if dated:
+            options.append(('date', [self._date_span(self._orders['date'], 0, self._n, lo, hi)]))
+        for name, wanted in codes.items():
+            if wanted is None:
+                continue
+            offsets = self._offsets(name)
+            runs = []
+            for code in wanted:
+                if code + 1 < len(offsets):
+                    start, stop = self._date_span(
+                        self._orders[name], int(offsets[code]), int(offsets[code + 1]), lo, hi
+                    )
+                    if stop > start:
+                        runs.append((start, stop))
+            options.append((name, runs))
+        if not options:
+            return self._orders[q.sort]
+
+        source, runs = min(options, key=lambda option: sum(stop - start for start, stop in option[1]))
+        order = self._orders[source]
+        if len(runs) == 1:
+            rows = order[runs[0][0]:runs[0][1]]
+        else:
+            rows = np.concatenate([order[start:stop] for start, stop in runs] or [order[:0]])
+        # Filters the chosen source did not apply (every source applies the date range)
+        cols = self.ledger.columns()
+        for name, wanted in codes.items():
+            if wanted is not None and name != source:
+                rows = rows[np.isin(cols[name][rows], wanted)]
+        if q.sort == 'date' and len(runs) <= 1:
+            return rows
+        return rows[np.lexsort((rows, cols[q.sort][rows]))]
+
+    def query(self, q: HistoryQuery) -> np.ndarray:
+        """Positions of the rows matching ``q``, in display order."""
+        self._sync()
+        result = self._results.get(q)
+        if result is None:
+            result = self._select(q)
+            if q.descending:
+                result = result[::-1]
+            if len(self._results) >= MAX_CACHED_RESULTS:
+                self._results.pop(next(iter(self._results)))
+            self._results[q] = result
+        return result
+
+    def page(self, q: HistoryQuery, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> HistoryPage:
+        result = self.query(q)
+        rows = result[offset:offset + limit]
+        df = self.ledger.frame(rows=rows)
+        df.insert(0, 'id', self.ledger.ids[rows])
+        return HistoryPage(df, len(result))
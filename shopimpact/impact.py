@@ -0,0 +1,69 @@
+"""
+ShopImpact - Impact Kernel
+Vectorized CO₂ / water / tree estimates over whole ledgers.
+"""
+
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from shopimpact.catalog import TREES_PER_KG, WATER_L_PER_KG, resolve_many
+
+
+class ImpactArrays(NamedTuple):
+    co2: np.ndarray
+    water: np.ndarray
+    trees: np.ndarray
+    eco: np.ndarray
+
+
+def category_factors(categories: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Per-category multiplier, eco flag, water and tree factors, aligned with ``categories``."""
+    infos = resolve_many(categories)
+    multiplier = np.array([i.multiplier for i in infos], dtype=np.float64)
+    eco = np.array([i.eco for i in infos], dtype=bool)
+    water = np.array([WATER_L_PER_KG[i.water_intensive] for i in infos], dtype=np.float64)
+    trees = np.array([TREES_PER_KG[i.tree_intensive] for i in infos], dtype=np.float64)
+    return multiplier, eco, water, trees
+
+
+def compute_impact(types, prices, co2=None) -> ImpactArrays:
+    """Score a ledger in one pass.
+
+    ``types`` is factorized into integer category codes, so every distinct
+    type is resolved once and rows only do array gathers. If the stored
+    ``co2`` column is passed it is used as-is (that is what the dashboard
+    shows); otherwise CO₂ is recomputed from ``prices`` with the same
+    operation order as ``estimate_co2``.
+    """
+    codes, categories = pd.factorize(np.asarray(types, dtype=object))
+    multiplier, eco, water, trees = category_factors(list(categories))
+    if co2 is None:
+        co2 = np.asarray(prices, dtype=np.float64) * multiplier[codes] / 100
+        co2 = np.where(eco[codes], co2 * 0.5, co2)
+    else:
+        co2 = np.asarray(co2, dtype=np.float64)
+    return ImpactArrays(co2=co2, water=co2 * water[codes], trees=co2 * trees[codes], eco=eco[codes])
+
+
+def compute_impact_batch(ledgers: Sequence[Tuple], with_co2: bool = False) -> List[ImpactArrays]:
+    """Score several ledgers with a single kernel call.
+
+    Each ledger is a ``(types, prices)`` tuple, or ``(types, prices, co2)``
+    when ``with_co2`` is set. Results come back in the same order.
+    """
+    if not ledgers:
+        return []
+    sizes = [len(ledger[0]) for ledger in ledgers]
+    types = np.concatenate([np.asarray(ledger[0], dtype=object) for ledger in ledgers])
+    prices = np.concatenate([np.asarray(ledger[1], dtype=np.float64) for ledger in ledgers])
+    co2: Optional[np.ndarray] = None
+    if with_co2:
+        co2 = np.concatenate([np.asarray(ledger[2], dtype=np.float64) for ledger in ledgers])
+    result = compute_impact(types, prices, co2)
+    splits = np.cumsum(sizes)[:-1]
+    return [
+        ImpactArrays(*parts)
+        for parts in zip(*(np.split(column, splits) for column in result))
+    ]
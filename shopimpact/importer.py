@@ -0,0 +1,164 @@
+"""
+ShopImpact - Importer
+Streams purchase CSVs (bank exports, receipts, our own export) into storage.
+"""
+
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from shopimpact.badges import BadgeEngine
+from shopimpact.impact import compute_impact
+from shopimpact.storage import DEFAULT_CHUNKSIZE, PURCHASE_COLUMNS, Storage, open_storage
+
+DEFAULT_TYPE = '500+ (Other)'
+DEFAULT_BRAND = 'Other'
+
+# Accepted header names per target column (matched case-insensitively)
+COLUMN_ALIASES = {
+    'type': ['type', 'category', 'product', 'item', 'description', 'product type'],
+    'brand': ['brand', 'merchant', 'vendor', 'store', 'payee'],
+    'price': ['price', 'amount', 'total', 'cost', 'debit', 'value'],
+    'date': ['date', 'timestamp', 'transaction date', 'posted', 'posting date', 'time'],
+}
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    new_badges: List[str] = field(default_factory=list)
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def resolve_columns(header: List[str], column_map: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Map target columns (type/brand/price/date) to CSV headers.
+
+    ``column_map`` overrides the alias guesses. Only ``price`` is required.
+    """
+    lookup = {h.strip().lower(): h for h in header}
+    mapping = {}
+    for target, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lookup:
+                mapping[target] = lookup[alias]
+                break
+    mapping.update(column_map or {})
+    if 'price' not in mapping:
+        raise ValueError(f"No price/amount column found in CSV header: {header}")
+    return mapping
+
+
+def clean_price(raw: pd.Series) -> pd.Series:
+    if not pd.api.types.is_numeric_dtype(raw):
+        # Strip currency symbols and thousands separators ("₹1,299.00")
+        raw = raw.astype(str).str.replace(r'[^0-9.\-]', '', regex=True)
+    # Bank exports list purchases as debits (negative amounts)
+    return pd.to_numeric(raw, errors='coerce').abs()
+
+
+def clean_dates(raw: pd.Series, now: str) -> pd.Series:
+    """Stored ``'%Y-%m-%d %H:%M'`` strings; blank cells get ``now``, unparseable ones NaN."""
+    # Exports repeat the same dates many times; parse and format each distinct value once.
+    # 'mixed' parses each value on its own, so one format does not turn the others into NaT.
+    codes, uniques = pd.factorize(raw.fillna('').astype(str).str.strip())
+    parsed = pd.to_datetime(pd.Series(uniques), format='mixed', errors='coerce')
+    formatted = parsed.dt.strftime('%Y-%m-%d %H:%M').astype(object)
+    formatted[pd.Series(uniques) == ''] = now
+    return pd.Series(formatted.to_numpy()[codes], index=raw.index)
+
+
+def normalize_chunk(chunk: pd.DataFrame, mapping: Dict[str, str], now: str) -> pd.DataFrame:
+    """Turn one raw CSV chunk into scored purchase rows; invalid rows are dropped.
+
+    Rows without a positive price or with a date that cannot be parsed are invalid.
+    """
+    price = clean_price(chunk[mapping['price']])
+    valid = price.notna() & (price > 0)
+    if 'date' in mapping:
+        date = clean_dates(chunk[mapping['date']], now)
+        valid &= date.notna()
+    else:
+        date = pd.Series(now, index=chunk.index)
+    chunk, price, date = chunk[valid], price[valid], date[valid]
+
+    if 'type' in mapping:
+        ptype = chunk[mapping['type']].fillna('').astype(str).str.strip().replace('', DEFAULT_TYPE)
+    else:
+        ptype = pd.Series(DEFAULT_TYPE, index=chunk.index)
+    if 'brand' in mapping:
+        brand = chunk[mapping['brand']].fillna('').astype(str).str.strip().replace('', DEFAULT_BRAND)
+    else:
+        brand = pd.Series(DEFAULT_BRAND, index=chunk.index)
+
+    price = price.astype('float64')
+    # Same formula as add_purchase, vectorized
+    co2 = compute_impact(ptype, price).co2
+    return pd.DataFrame({
+        'date': date.to_numpy(), 'type': ptype.to_numpy(), 'brand': brand.to_numpy(),
+        'price': price.to_numpy(), 'co2_impact': co2,
+    }, columns=PURCHASE_COLUMNS)
+
+
+def import_csv(source, storage: Storage, profile: Dict,
+               column_map: Optional[Dict[str, str]] = None,
+               chunksize: int = DEFAULT_CHUNKSIZE,
+               engine: Optional[BadgeEngine] = None,
+               on_progress: Optional[Callable[[int], None]] = None) -> ImportReport:
+    """Stream ``source`` (path or file object) into ``storage`` in bounded memory.
+
+    Chunks are scored and handed to ``storage.append_frames`` as a generator,
+    so the whole file is committed at once. Badge rules are folded over each
+    chunk and the unlocked badges are written to ``profile`` at the end; the
+    caller is responsible for saving the profile.
+    """
+    engine = engine or BadgeEngine()
+    report = ImportReport()
+    progress = dict(profile.get('badge_progress', {}))
+    unlocked: List[str] = []
+    now = datetime.now().strftime('%Y-%m-%d %H:%M')
+    start = time.perf_counter()
+
+    def chunks() -> Iterator[pd.DataFrame]:
+        nonlocal progress
+        mapping = None
+        for raw in pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=False):
+            mapping = mapping or resolve_columns(list(raw.columns), column_map)
+            scored = normalize_chunk(raw, mapping, now)
+            report.skipped += len(raw) - len(scored)
+            progress, hits = engine.backfill(scored, profile['badges'] + unlocked, progress, goals=profile)
+            unlocked.extend(hits)
+            report.rows += len(scored)
+            if on_progress:
+                on_progress(report.rows)
+            yield scored
+
+    storage.append_frames(chunks())
+    report.seconds = time.perf_counter() - start
+    profile['badge_progress'] = progress
+    profile['badges'].extend(unlocked)
+    report.new_badges = unlocked
+    return report
+
+
+if __name__ == '__main__':
+    # python -m shopimpact.importer purchases.csv  (backend from SHOPIMPACT_STORAGE)
+    store = open_storage()
+    user_profile = store.load_profile()
+    user_profile.setdefault('badges', [])
+    if 'badge_progress' not in user_profile:
+        user_profile['badge_progress'], _ = BadgeEngine().backfill(
+            store.frame(), user_profile['badges'], goals=user_profile
+        )
+    result = import_csv(sys.argv[1], store, user_profile)
+    store.save_profile(user_profile)
+    print(f"Imported {result.rows:,} rows ({result.skipped:,} skipped) in {result.seconds:.1f}s "
+          f"= {result.rows_per_sec:,.0f} rows/sec; new badges: {result.new_badges or 'none'}")
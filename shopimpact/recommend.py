@@ -0,0 +1,135 @@
+"""
+ShopImpact - Recommender
+Precomputed greener alternatives per category, with the CO₂ they would save.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from shopimpact.catalog import PRODUCT_GROUPS, PRODUCT_TYPES, resolve_category
+
+MAX_ALTERNATIVES = 3
+
+# Broad second-hand / shared options offered for anything in a group, on top of
+# the same-named variants (e.g. 'Laptop' -> 'Refurbished Laptop') found automatically
+GROUP_SUBSTITUTES = {
+    'Fashion & Apparel': ['Thrifted Clothing'],
+    'Electronics & Tech': ['Used Electronics', 'Refurbished Tech'],
+    'Food & Groceries': ['Local Groceries'],
+    'Home & Living': ['Vintage Furniture', 'Second-Hand Item'],
+    'Transport & Travel': ['Public Transit Pass', 'Bicycle'],
+    'Books, Media & Hobbies': ['Library Membership'],
+    'Specialized & Eco': ['Second-Hand Item'],
+}
+
+ECO_TIPS = {
+    'T-Shirt': "Consider **Organic Cotton**, **Hemp**, or **Thrifted** T-Shirts. They use up to 90% less water!",
+    'Jeans': "Did you know **Vintage Jeans** or **Hemp Denim** are way more durable and eco-friendly?",
+    'Dress': "How about a **Rental Dress** for that occasion? Or check a local **Thrift Store**.",
+    'Smartphone': "A **Refurbished Smartphone** saves ~50kg of CO₂ compared to a new one!",
+    'Laptop': "Check out **Refurbished Laptops** or upgrade your RAM instead of buying new.",
+    'Meat': "Try **Plant-Based Meat** or have a 'Meatless Monday' to slash your carbon footprint.",
+    'Dairy Products': "**Oat Milk** or **Soy Milk** have a much lower carbon footprint than dairy.",
+    'Furniture': "Look for **Vintage**, **Second-Hand**, or **FSC-Certified Wood** furniture.",
+    'Books (New)': "Try a **Library Membership**, **Used Books**, or **E-books** to save paper.",
+    'Bottled Water': "Switch to a **Reusable Bottle** and filtered tap water. Plastic is forever!",
+    'Fast Fashion': "Slow down! Try **Thrifted** or **High-Quality Ethical Brands** that last longer.",
+    'Toothbrush': "Switch to a **Bamboo Toothbrush** - plastic ones take 400 years to decompose.",
+    'Shampoo': "Try a **Solid Shampoo Bar** to eliminate plastic bottle waste.",
+    'Coffee': "Use a **Reusable Cup**. Disposable cups are lined with plastic and rarely recycled.",
+    'Gift Wrap': "Use **Old Newspapers** or **Fabric Wraps** (Furoshiki) instead of glossy paper.",
+}
+# Substring -> tip for types without their own entry, first match wins
+TIP_KEYWORDS = [
+    ('Meat', 'Meat'), ('Phone', 'Smartphone'), ('Mobile', 'Smartphone'),
+    ('Laptop', 'Laptop'), ('Computer', 'Laptop'),
+    ('Clothing', 'Fast Fashion'), ('Wear', 'Fast Fashion'), ('Jacket', 'Fast Fashion'),
+]
+
+_WORD_RE = re.compile(r'\w+')
+
+
+class Alternative(NamedTuple):
+    product_type: str
+    co2_per_rupee: float
+    saved_per_rupee: float
+
+    def co2_saved(self, price: float) -> float:
+        return price * self.saved_per_rupee
+
+
+class Recommendation(NamedTuple):
+    alternatives: Tuple[Alternative, ...]
+    tip: Optional[str]
+
+
+def co2_per_rupee(product_type: str) -> float:
+    """Slope of ``estimate_co2``: kg CO₂ per rupee spent on ``product_type``."""
+    info = resolve_category(product_type)
+    return info.multiplier / 100 * (0.5 if info.eco else 1.0)
+
+
+def _words(product_type: str) -> frozenset:
+    # Crude singular form so 'Books' relates to 'E-book'
+    return frozenset(w[:-1] if len(w) > 3 and w.endswith('s') else w
+                     for w in _WORD_RE.findall(product_type.casefold()))
+
+
+def _tip(product_type: str) -> Optional[str]:
+    if product_type in ECO_TIPS:
+        return ECO_TIPS[product_type]
+    for keyword, key in TIP_KEYWORDS:
+        if keyword in product_type:
+            return ECO_TIPS[key]
+    return None
+
+
+class Recommender:
+    """Greener alternatives for every category, ranked once at construction.
+
+    Candidates come from the category's own taxonomy group: variants sharing
+    a word with it ('Refurbished Smartphone' for 'Smartphone') rank first,
+    then the group's ``GROUP_SUBSTITUTES``; within each tier, bigger savings
+    first. Only candidates with a lower CO₂ per rupee qualify. CO₂ is linear
+    in price, so savings are stored per rupee and ``recommend`` is a single
+    dict lookup.
+    """
+
+    def __init__(self, max_alternatives: int = MAX_ALTERNATIVES):
+        self.max_alternatives = max_alternatives
+        self._group_of = {t: group for group, types in PRODUCT_GROUPS.items() for t in types}
+        self._table: Dict[str, Recommendation] = {t: self._rank(t) for t in PRODUCT_TYPES}
+
+    def _rank(self, product_type: str) -> Recommendation:
+        group = self._group_of.get(product_type)
+        tip = _tip(product_type)
+        if group is None:
+            return Recommendation((), tip)
+        own = co2_per_rupee(product_type)
+        words = _words(product_type)
+        tiers: Dict[str, int] = {}
+        for candidate in PRODUCT_GROUPS[group]:
+            if words & _words(candidate):
+                tiers[candidate] = 0
+        for candidate in GROUP_SUBSTITUTES.get(group, []):
+            tiers.setdefault(candidate, 1)
+        tiers.pop(product_type, None)
+
+        ranked: List[Tuple[int, float, Alternative]] = []
+        for candidate, tier in tiers.items():
+            rate = co2_per_rupee(candidate)
+            if rate < own:
+                ranked.append((tier, rate, Alternative(candidate, rate, own - rate)))
+        ranked.sort(key=lambda r: (r[0], r[1]))
+        return Recommendation(tuple(r[2] for r in ranked[:self.max_alternatives]), tip)
+
+    def recommend(self, product_type: str) -> Recommendation:
+        rec = self._table.get(product_type)
+        return rec if rec is not None else _recommend_unknown(product_type)
+
+
+@lru_cache(maxsize=4096)
+def _recommend_unknown(product_type: str) -> Recommendation:
+    # Free-text types have no group; only the keyword tips apply
+    return Recommendation((), _tip(product_type))
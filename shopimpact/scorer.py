@@ -0,0 +1,114 @@
+"""
+ShopImpact - Batch Scorer
+Scores CSV/JSONL purchase files with the impact kernel across a process pool.
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterator, Optional, TextIO
+
+import pandas as pd
+
+from shopimpact.impact import compute_impact
+from shopimpact.importer import DEFAULT_TYPE, clean_price, resolve_columns
+
+SCORE_FORMATS = ('csv', 'jsonl')
+DEFAULT_SCORE_CHUNKSIZE = 100_000
+SCORE_COLUMNS = ['co2_impact', 'water_liters', 'trees_equivalent', 'eco']
+
+
+def score_chunk(chunk: pd.DataFrame, mapping: Dict[str, str]) -> pd.DataFrame:
+    """Append ``SCORE_COLUMNS`` to ``chunk``; rows without a usable price score as empty."""
+    price = clean_price(chunk[mapping['price']]).astype('float64')
+    if 'type' in mapping:
+        ptype = chunk[mapping['type']].fillna('').astype(str).str.strip().replace('', DEFAULT_TYPE)
+    else:
+        ptype = pd.Series(DEFAULT_TYPE, index=chunk.index)
+    impact = compute_impact(ptype, price)
+    return chunk.assign(
+        co2_impact=impact.co2,
+        water_liters=impact.water,
+        trees_equivalent=impact.trees,
+        eco=impact.eco,
+    )
+
+
+def read_chunks(path: str, fmt: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    source = sys.stdin if path == '-' else path
+    if fmt == 'jsonl':
+        yield from pd.read_json(source, lines=True, chunksize=chunksize, dtype=False)
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=False)
+
+
+def render_chunk(chunk: pd.DataFrame, mapping: Dict[str, str], fmt: str, header: bool) -> str:
+    """Score and serialize one chunk. Formatting costs more than scoring, so both run in the worker."""
+    scored = score_chunk(chunk, mapping)
+    if fmt == 'jsonl':
+        return scored.to_json(orient='records', lines=True, force_ascii=False)
+    return scored.to_csv(index=False, header=header)
+
+
+def score_file(path: str, out: TextIO, fmt: str = 'csv', out_fmt: Optional[str] = None,
+               workers: Optional[int] = None, chunksize: int = DEFAULT_SCORE_CHUNKSIZE,
+               column_map: Optional[Dict[str, str]] = None) -> int:
+    """Score ``path`` chunk by chunk into ``out``; returns the row count.
+
+    With more than one worker, chunks are scored in a process pool. At most
+    two chunks per worker are in flight and results are written in input
+    order, so memory stays bounded by the chunk size.
+    """
+    out_fmt = out_fmt or fmt
+    workers = workers or os.cpu_count() or 1
+    pool: Optional[Executor] = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    rows, pending = 0, deque()
+    mapping = None
+
+    def drain(limit: int) -> None:
+        while len(pending) > limit:
+            out.write(pending.popleft().result())
+
+    try:
+        for raw in read_chunks(path, fmt, chunksize):
+            mapping = mapping or resolve_columns([str(c) for c in raw.columns], column_map)
+            header = rows == 0
+            rows += len(raw)
+            if pool is None:
+                out.write(render_chunk(raw, mapping, out_fmt, header))
+                continue
+            pending.append(pool.submit(render_chunk, raw, mapping, out_fmt, header))
+            drain(2 * workers)
+        drain(0)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score ShopImpact purchases (CO₂, water, trees) in bulk.")
+    parser.add_argument('input', help="CSV or JSONL file of purchases ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="Destination file (default: stdout)")
+    parser.add_argument('--format', choices=SCORE_FORMATS, help="Input format (default: from extension)")
+    parser.add_argument('--output-format', choices=SCORE_FORMATS, help="Output format (default: input format)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_SCORE_CHUNKSIZE)
+    args = parser.parse_args()
+
+    in_fmt = args.format or ('jsonl' if args.input.endswith(('.jsonl', '.ndjson')) else 'csv')
+    out_fmt = args.output_format or (
+        'jsonl' if args.output.endswith(('.jsonl', '.ndjson')) else 'csv' if args.output != '-' else in_fmt
+    )
+    start = time.perf_counter()
+    if args.output == '-':
+        n = score_file(args.input, sys.stdout, in_fmt, out_fmt, args.workers, args.chunksize)
+    else:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            n = score_file(args.input, f, in_fmt, out_fmt, args.workers, args.chunksize)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {n:,} purchases in {elapsed:.1f}s = {n / elapsed if elapsed else 0:,.0f} rows/sec",
+          file=sys.stderr)
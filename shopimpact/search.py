@@ -0,0 +1,222 @@
+"""
+ShopImpact - Product Search
+In-memory prefix and trigram index that resolves free-text products to a category.
+"""
+
+import argparse
+import bisect
+import os
+import re
+import sys
+import time
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from shopimpact.catalog import PRODUCT_TYPES
+
+# Local catalog of products/SKUs, e.g. SHOPIMPACT_SKU_CATALOG=catalog.csv
+SKU_CATALOG_ENV = 'SHOPIMPACT_SKU_CATALOG'
+DEFAULT_LIMIT = 10
+# Trigram (Jaccard) similarity below this is not offered as a fuzzy match
+MIN_FUZZY_SCORE = 0.3
+
+# Accepted header names per catalog column (matched case-insensitively)
+CATALOG_ALIASES = {
+    'name': ['name', 'product', 'title', 'description', 'item'],
+    'category': ['category', 'type', 'product type'],
+    'sku': ['sku', 'id', 'code', 'ean', 'upc'],
+}
+
+# Unknown catalog categories named in the error, at most
+MAX_REPORTED_CATEGORIES = 10
+
+_TOKEN_RE = re.compile(r'\w+')
+# Catalog categories are matched to PRODUCT_TYPES ignoring case
+_CANONICAL_TYPES = {t.casefold(): t for t in PRODUCT_TYPES}
+
+
+class Match(NamedTuple):
+    name: str
+    category: str
+    sku: str
+    score: float
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.casefold())
+
+
+def _trigrams(token: str) -> List[str]:
+    padded = f'  {token} '
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class SkuIndex:
+    """Search index over catalog entries, built once and then read-only.
+
+    Entries are ordered shortest name first, so for prefix queries the lowest
+    matching ids are the best matches. Every (token, entry) pair is kept in
+    one sorted list: the entries whose token starts with a prefix are a single
+    contiguous slice, found with two binary searches. Queries with no prefix
+    match fall back to trigram similarity, which tolerates typos.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str, str]]):
+        seen = {}
+        for name, category, sku in entries:
+            name = str(name).strip()
+            if name and name.casefold() not in seen:
+                seen[name.casefold()] = (name, str(category).strip(), str(sku or '').strip())
+        rows = sorted(seen.values(), key=lambda r: (len(r[0]), r[0].casefold()))
+        self.names = [r[0] for r in rows]
+        self.categories = [r[1] for r in rows]
+        self.skus = [r[2] for r in rows]
+
+        tokens, token_docs = [], []
+        for doc, name in enumerate(self.names):
+            for token in set(tokenize(name)):
+                tokens.append(token)
+                token_docs.append(doc)
+        order = sorted(range(len(tokens)), key=tokens.__getitem__)
+        self._tokens = [tokens[i] for i in order]
+        self._token_docs = np.asarray(token_docs, dtype=np.int32)[order]
+
+        # Trigram postings in CSR form. Trigrams are cut once per distinct token,
+        # then fanned out to every (token, entry) pair with repeat/arange.
+        first = np.fromiter(
+            (i == 0 or self._tokens[i] != self._tokens[i - 1] for i in range(len(self._tokens))),
+            dtype=bool, count=len(self._tokens),
+        )
+        token_ids = np.cumsum(first) - 1
+        gram_ids = {}
+        token_grams = [
+            [gram_ids.setdefault(g, len(gram_ids)) for g in _trigrams(self._tokens[i])]
+            for i in np.flatnonzero(first)
+        ]
+        lengths = np.fromiter(map(len, token_grams), dtype=np.int64, count=len(token_grams))
+        flat = np.fromiter((g for grams in token_grams for g in grams), dtype=np.int64, count=int(lengths.sum()))
+        per_pair = lengths[token_ids]
+        pair = np.repeat(np.arange(len(token_ids)), per_pair)
+        within = np.arange(len(pair)) - np.repeat(np.cumsum(per_pair) - per_pair, per_pair)
+        grams = flat[(np.cumsum(lengths) - lengths)[token_ids][pair] + within]
+        # One posting per (trigram, entry), sorted by trigram
+        n = max(len(rows), 1)
+        keys = np.sort(grams * n + self._token_docs[pair])
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))] if len(keys) else keys
+        grams, docs = np.divmod(keys, n)
+        self._gram_ids = gram_ids
+        self._gram_offsets = np.searchsorted(grams, np.arange(len(gram_ids) + 1))
+        self._gram_docs = docs.astype(np.int32)
+        self._doc_grams = np.bincount(docs, minlength=len(rows))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def from_product_types(cls) -> 'SkuIndex':
+        return cls((t, t, '') for t in PRODUCT_TYPES)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'SkuIndex':
+        """Catalog CSV or JSONL (name, category, optional sku), plus every ``PRODUCT_TYPES`` entry.
+
+        Categories are matched case-insensitively to ``PRODUCT_TYPES``; a
+        ``ValueError`` lists the ones that are not, so every match resolves
+        to a category the multipliers and charts know.
+        """
+        if path.endswith(('.jsonl', '.ndjson')):
+            df = pd.read_json(path, lines=True, dtype=False)
+        else:
+            df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        lookup = {str(c).strip().lower(): c for c in df.columns}
+        cols = {}
+        for target, aliases in CATALOG_ALIASES.items():
+            cols[target] = next((lookup[a] for a in aliases if a in lookup), None)
+        if cols['name'] is None or cols['category'] is None:
+            raise ValueError(f"Catalog needs a name and a category column, got: {list(df.columns)}")
+        skus = df[cols['sku']].tolist() if cols['sku'] is not None else [''] * len(df)
+        raw = df[cols['category']].astype(str).str.strip()
+        categories = raw.str.casefold().map(_CANONICAL_TYPES)
+        unknown = raw[categories.isna()].unique().tolist()
+        if unknown:
+            shown = ', '.join(repr(c) for c in unknown[:MAX_REPORTED_CATEGORIES])
+            extra = len(unknown) - MAX_REPORTED_CATEGORIES
+            more = f" and {extra} more" if extra > 0 else ''
+            raise ValueError(
+                f"Catalog has {int(categories.isna().sum()):,} rows with a category that is not a "
+                f"product type: {shown}{more}"
+            )
+        return cls([
+            *((t, t, '') for t in PRODUCT_TYPES),
+            *zip(df[cols['name']].tolist(), categories.tolist(), skus),
+        ])
+
+    def _prefix_docs(self, prefix: str) -> np.ndarray:
+        lo = bisect.bisect_left(self._tokens, prefix)
+        hi = bisect.bisect_left(self._tokens, prefix + '\U0010ffff', lo)
+        return self._token_docs[lo:hi]
+
+    def _match(self, doc: int, score: float) -> Match:
+        return Match(self.names[doc], self.categories[doc], self.skus[doc], score)
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Match]:
+        """Best entries for ``query``: every query word as a word prefix, else by trigram similarity."""
+        tokens = tokenize(query)
+        if not tokens or not len(self):
+            return []
+        hits = np.zeros(len(self), dtype=np.int16)
+        for token in set(tokens):
+            hits[self._prefix_docs(token)] += 1
+        docs = np.flatnonzero(hits == len(set(tokens)))[:limit]
+        if len(docs):
+            return [self._match(int(d), 1.0) for d in docs]
+        return self.fuzzy(tokens, limit)
+
+    def fuzzy(self, tokens: List[str], limit: int = DEFAULT_LIMIT) -> List[Match]:
+        query_grams = {g for token in tokens for g in _trigrams(token)}
+        ids = [self._gram_ids[g] for g in query_grams if g in self._gram_ids]
+        if not ids:
+            return []
+        offsets = self._gram_offsets
+        shared = np.bincount(
+            np.concatenate([self._gram_docs[offsets[i]:offsets[i + 1]] for i in ids]), minlength=len(self)
+        )
+        # Jaccard >= MIN_FUZZY_SCORE needs at least that share of the query's trigrams
+        docs = np.flatnonzero(shared >= MIN_FUZZY_SCORE * len(query_grams))
+        shared = shared[docs]
+        score = shared / (len(query_grams) + self._doc_grams[docs] - shared)
+        keep = score >= MIN_FUZZY_SCORE
+        docs, score = docs[keep], score[keep]
+        if len(docs) > limit:
+            top = np.argpartition(-score, limit)[:limit]
+            docs, score = docs[top], score[top]
+        # Ties keep index order, i.e. shorter names first
+        order = np.lexsort((docs, -score))
+        return [self._match(int(docs[i]), float(score[i])) for i in order]
+
+
+def load_index(path: Optional[str] = None) -> SkuIndex:
+    """The catalog at ``path`` (default ``SHOPIMPACT_SKU_CATALOG``), or just ``PRODUCT_TYPES`` without one."""
+    path = path or os.environ.get(SKU_CATALOG_ENV)
+    return SkuIndex.from_file(path) if path else SkuIndex.from_product_types()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Search a ShopImpact product catalog.")
+    parser.add_argument('query', nargs='+')
+    parser.add_argument('--catalog', help=f"Catalog CSV/JSONL (default: ${SKU_CATALOG_ENV})")
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_index(args.catalog)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    matches = index.search(' '.join(args.query), args.limit)
+    elapsed = time.perf_counter() - start
+    for m in matches:
+        print(f"{m.score:.2f}  {m.name}  ->  {m.category}" + (f"  [{m.sku}]" if m.sku else ''))
+    print(f"Indexed {len(index):,} products in {built:.2f}s; query took {elapsed * 1000:.3f} ms",
+          file=sys.stderr)
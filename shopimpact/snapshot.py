@@ -0,0 +1,114 @@
+"""
+ShopImpact - Columnar Snapshot
+Single-file binary snapshot of a Ledger whose columns are memory-mapped on load.
+"""
+
+import json
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from shopimpact.ledger import PURCHASE_COLUMNS, Ledger
+
+MAGIC = b'SHOPIMPACT-COLS\n'
+FORMAT_VERSION = 1
+# Column blocks start on cache-line boundaries, so every view is aligned for its dtype
+ALIGN = 64
+# Stored columns: the purchase fields plus each row's stable id
+SNAPSHOT_COLUMNS = PURCHASE_COLUMNS + ['id']
+
+_LENGTH = struct.Struct('<Q')
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+def write_snapshot(path: Path, ledger: Ledger, meta: Dict) -> None:
+    """Write ``ledger`` and the JSON-serializable ``meta`` to ``path`` atomically.
+
+    Layout: magic, header length, JSON header (row count, vocabularies, column
+    dtypes and offsets, ``meta``), then each column as a raw little-endian
+    array. The column bytes are the Ledger's own arrays, so writing is one
+    sequential copy.
+    """
+    path = Path(path)
+    columns = {name: np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+               for name, values in {**ledger.columns(), 'id': ledger.ids}.items()}
+    layout, offset = {}, 0
+    for name in SNAPSHOT_COLUMNS:
+        layout[name] = {'dtype': columns[name].dtype.str, 'offset': offset}
+        offset = _aligned(offset + columns[name].nbytes)
+    header = json.dumps({
+        'format': FORMAT_VERSION, 'rows': len(ledger), 'columns': layout,
+        'types': ledger.types.values, 'brands': ledger.brands.values, 'next_id': ledger.next_id,
+        'meta': meta,
+    }, separators=(',', ':')).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + _LENGTH.size + len(header))
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + _LENGTH.pack(len(header)) + header)
+            for name in SNAPSHOT_COLUMNS:
+                f.seek(data_start + layout[name]['offset'])
+                f.write(memoryview(columns[name]).cast('B'))
+            # Seeking alone does not extend the file: pad it out to the last column's
+            # (aligned) end, so every block is in bounds, including empty ones
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_snapshot(path: Path) -> Tuple[Ledger, Dict]:
+    """Map ``path`` and return its Ledger and ``meta``.
+
+    Nothing but the header is read up front: the Ledger's columns are
+    read-only views of the mapping, so a query only pages in the rows it
+    touches, and the first append copies them into memory. Raises
+    ``ValueError`` for files that are not a snapshot this version can read.
+
+    On Windows a mapped file cannot be replaced, which would block the next
+    compaction, so the file is read into memory there instead.
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(len(MAGIC) + _LENGTH.size)
+        if len(prefix) < len(MAGIC) + _LENGTH.size or not prefix.startswith(MAGIC):
+            raise ValueError(f"{path} is not a ShopImpact snapshot")
+        (length,) = _LENGTH.unpack(prefix[len(MAGIC):])
+        header = json.loads(f.read(length))
+    if header.get('format') != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported snapshot format {header.get('format')!r}")
+    rows = header['rows']
+    data_start = _aligned(len(MAGIC) + _LENGTH.size + length)
+    if os.name == 'nt':
+        buffer = np.fromfile(path, dtype=np.uint8)
+    elif rows:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        buffer = np.empty(0, dtype=np.uint8)  # Nothing to map (and older empty snapshots end at the header)
+    columns = {}
+    for name in SNAPSHOT_COLUMNS:
+        if name not in header['columns']:
+            continue  # 'id' is absent from snapshots written before rows had ids
+        dtype = np.dtype(header['columns'][name]['dtype'])
+        if not rows:
+            columns[name] = np.empty(0, dtype=dtype)
+            continue
+        start = data_start + header['columns'][name]['offset']
+        if start + rows * dtype.itemsize > len(buffer):
+            raise ValueError(f"{path} is truncated")
+        # Plain ndarray views, so derived arrays are not np.memmap instances
+        columns[name] = np.asarray(buffer[start:start + rows * dtype.itemsize]).view(dtype)
+    ledger = Ledger.from_columns(columns, header['types'], header['brands'],
+                                 columns.get('id'), header.get('next_id'))
+    return ledger, header['meta']
@@ -0,0 +1,150 @@
+"""
+ShopImpact - Spans
+Lightweight per-rerun timing of named stages, with JSONL and Prometheus-text sinks.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Local sinks, e.g. SHOPIMPACT_SPANS_JSONL=spans.jsonl SHOPIMPACT_SPANS_PROM=/var/lib/node_exporter/shopimpact.prom
+SPANS_JSONL_ENV = 'SHOPIMPACT_SPANS_JSONL'
+SPANS_PROM_ENV = 'SHOPIMPACT_SPANS_PROM'
+
+
+class Span:
+    """One timed stage. Set ``rows`` inside the block once the row count is known."""
+
+    __slots__ = ('name', 'rows', 'depth', 'seconds', '_recorder', '_start')
+
+    def __init__(self, recorder: 'SpanRecorder', name: str, rows: Optional[int]):
+        self.name, self.rows, self._recorder = name, rows, recorder
+        self.depth, self.seconds, self._start = 0, 0.0, 0.0
+
+    def __enter__(self) -> 'Span':
+        self.depth = self._recorder._depth
+        self._recorder._depth += 1
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.seconds = time.perf_counter() - self._start
+        self._recorder._depth -= 1
+
+
+class _NullSpan:
+    """Shared stand-in when recording is off: no clock reads, no allocation."""
+
+    rows = None
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def __setattr__(self, name, value) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class SpanRecorder:
+    """Collects the spans of one script run (one Streamlit rerun)."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.spans: List[Span] = []
+        self.started = time.perf_counter()
+        self._depth = 0
+
+    def span(self, name: str, rows: Optional[int] = None):
+        if not self.enabled:
+            return _NULL_SPAN
+        span = Span(self, name, rows)
+        self.spans.append(span)
+        return span
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> List[Dict]:
+        return [
+            {'span': s.name, 'depth': s.depth, 'ms': round(s.seconds * 1000, 3), 'rows': s.rows}
+            for s in self.spans
+        ]
+
+
+class SpanTotals:
+    """Process-wide running sums per span name, for the Prometheus text file."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, List] = {}  # name -> [count, seconds, rows]
+        self.reruns = 0
+        self.rerun_seconds = 0.0
+
+    def add(self, recorder: SpanRecorder) -> None:
+        with self._lock:
+            self.reruns += 1
+            self.rerun_seconds += recorder.elapsed()
+            for s in recorder.spans:
+                entry = self._totals.setdefault(s.name, [0, 0.0, 0])
+                entry[0] += 1
+                entry[1] += s.seconds
+                entry[2] += s.rows or 0
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            lines = [
+                '# HELP shopimpact_rerun_seconds Wall time of whole script runs.',
+                '# TYPE shopimpact_rerun_seconds summary',
+                f'shopimpact_rerun_seconds_sum {self.rerun_seconds:.6f}',
+                f'shopimpact_rerun_seconds_count {self.reruns}',
+                '# HELP shopimpact_span_seconds Wall time spent in each instrumented stage.',
+                '# TYPE shopimpact_span_seconds summary',
+            ]
+            for name, (count, seconds, _) in sorted(self._totals.items()):
+                lines.append(f'shopimpact_span_seconds_sum{{span="{name}"}} {seconds:.6f}')
+                lines.append(f'shopimpact_span_seconds_count{{span="{name}"}} {count}')
+            lines += [
+                '# HELP shopimpact_span_rows_total Rows processed in each instrumented stage.',
+                '# TYPE shopimpact_span_rows_total counter',
+            ]
+            for name, (_, _, rows) in sorted(self._totals.items()):
+                lines.append(f'shopimpact_span_rows_total{{span="{name}"}} {rows}')
+            return '\n'.join(lines) + '\n'
+
+
+def sinks_configured() -> bool:
+    return bool(os.environ.get(SPANS_JSONL_ENV) or os.environ.get(SPANS_PROM_ENV))
+
+
+def flush(recorder: SpanRecorder, totals: SpanTotals, **labels) -> Dict:
+    """Fold ``recorder`` into ``totals`` and write the configured sinks; returns the JSONL record."""
+    record = {
+        'ts': time.time(), **labels,
+        'total_ms': round(recorder.elapsed() * 1000, 3), 'spans': recorder.summary(),
+    }
+    if not recorder.enabled:
+        return record
+    totals.add(recorder)
+    jsonl_path = os.environ.get(SPANS_JSONL_ENV)
+    if jsonl_path:
+        # One short line per rerun; O_APPEND keeps concurrent writers from interleaving
+        with open(jsonl_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+    prom_path = os.environ.get(SPANS_PROM_ENV)
+    if prom_path:
+        # Textfile collectors must never see a half-written file
+        path = Path(prom_path)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent or '.', prefix=path.name + '.', suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(totals.to_prometheus())
+        os.replace(tmp_path, path)
+    return record
@@ -0,0 +1,1150 @@
+"""
+ShopImpact - Storage
+Pluggable persistence: an append-only JSON journal (default) and SQLite.
+"""
+
+import copy
+import dataclasses
+import atexit
+import hashlib
+import itertools
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from shopimpact.aggregates import (
+    ROLLUP_COLUMNS, BucketTotals, LedgerAggregates, TimeRollups, bucket_keys, bucket_range
+)
+from shopimpact.catalog import resolve_category
+from shopimpact.history import DEFAULT_PAGE_SIZE, HistoryPage, HistoryQuery
+from shopimpact.ledger import PURCHASE_COLUMNS, Ledger
+from shopimpact.snapshot import read_snapshot, write_snapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows: locking is in-process only
+    fcntl = None
+
+# Number of journal records replayed on load before the journal is folded
+# back into the snapshot.
+DEFAULT_COMPACT_EVERY = 500
+
+DEFAULT_CHUNKSIZE = 50_000
+
+# Journal writes are queued and flushed in the background by default, e.g.
+# SHOPIMPACT_DURABILITY=sync to commit every change before returning.
+# SHOPIMPACT_FLUSH_DELAY_MS bounds how long a change may sit in memory and
+# SHOPIMPACT_FLUSH_BATCH how many may queue before the writer waits for disk.
+DURABILITY_ENV = 'SHOPIMPACT_DURABILITY'
+FLUSH_DELAY_ENV = 'SHOPIMPACT_FLUSH_DELAY_MS'
+FLUSH_BATCH_ENV = 'SHOPIMPACT_FLUSH_BATCH'
+DURABILITY_MODES = ('async', 'sync')
+DEFAULT_FLUSH_DELAY_MS = 250
+DEFAULT_FLUSH_BATCH = 64
+
+# Backend selection, e.g. SHOPIMPACT_STORAGE=sqlite SHOPIMPACT_DB=/srv/shopimpact.db
+STORAGE_ENV = 'SHOPIMPACT_STORAGE'
+DB_ENV = 'SHOPIMPACT_DB'
+DATA_DIR_ENV = 'SHOPIMPACT_DATA_DIR'
+DEFAULT_JSON_PATH = Path("shopimpact_data_v3.json")
+DEFAULT_DB_PATH = Path("shopimpact_data_v3.db")
+
+# The default user keeps the original single-file layout; everyone else gets
+# their own partition under <data dir>/users/<user id>/.
+DEFAULT_USER = 'default'
+_SAFE_USER_ID = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9_.-]{0,63}$')
+
+# Process-wide source for JournalStore versions, so two store objects for the
+# same user never hand out the same version number.
+_VERSIONS = itertools.count(1)
+
+
+def date_bounds(start: Optional[date], end: Optional[date]) -> Tuple[Optional[str], Optional[str]]:
+    """Inclusive date range -> half-open bounds comparable with stored ``'%Y-%m-%d %H:%M'`` strings."""
+    lo = start.strftime('%Y-%m-%d') if start else None
+    hi = (end + timedelta(days=1)).strftime('%Y-%m-%d') if end else None
+    return lo, hi
+
+
+def get_default_data() -> Dict:
+    return {
+        'purchases': [],
+        'user_profile': {
+            'name': 'Friend',
+            'monthlyBudget': 15000,
+            'co2Goal': 50,
+            'badges': []
+        }
+    }
+
+
+class Storage(ABC):
+    """Interface shared by all backends.
+
+    Besides whole-history load/save, backends answer the handful of queries
+    the app needs (recent items, counts, per-category and per-date totals), so
+    a backend with indexes never has to hand every row to the UI.
+    """
+
+    # ---------- persistence ----------
+    @abstractmethod
+    def load(self) -> Dict:
+        """Return the full ``{'purchases': [...], 'user_profile': {...}}`` document."""
+
+    @abstractmethod
+    def load_profile(self) -> Dict:
+        ...
+
+    @abstractmethod
+    def append_purchase(self, purchase: Dict) -> None:
+        ...
+
+    @abstractmethod
+    def append_frames(self, frames: Iterable[pd.DataFrame]) -> int:
+        """Append blocks of purchases (``PURCHASE_COLUMNS``) as one commit.
+
+        ``frames`` may be a generator; nothing is visible until it is
+        exhausted. Returns the number of rows appended.
+        """
+
+    @abstractmethod
+    def update_purchase(self, purchase_id: int, purchase: Dict) -> None:
+        """Replace the purchase with id ``purchase_id`` (``KeyError`` if it is gone)."""
+
+    @abstractmethod
+    def delete_purchase(self, purchase_id: int) -> None:
+        """Remove the purchase with id ``purchase_id`` (``KeyError`` if it is gone)."""
+
+    @abstractmethod
+    def save_profile(self, profile: Dict) -> None:
+        ...
+
+    @abstractmethod
+    def save(self, data: Dict) -> None:
+        """Replace the whole history (used for resets and migrations)."""
+
+    # ---------- queries ----------
+    @abstractmethod
+    def version(self) -> int:
+        """Counter that changes whenever purchases change (not on profile updates).
+
+        Derived views can be cached against it.
+        """
+
+    @abstractmethod
+    def aggregates(self) -> LedgerAggregates:
+        """Running totals, maintained on every write and persisted with the profile."""
+
+    def count(self) -> int:
+        return self.aggregates().count
+
+    @abstractmethod
+    def recent(self, n: int) -> List[Dict]:
+        """The last ``n`` purchases, newest first."""
+
+    @abstractmethod
+    def category_totals(self) -> pd.DataFrame:
+        """Columns ``type, co2_impact, price`` summed per type."""
+
+    @abstractmethod
+    def rollup(self, granularity: str, start: Optional[date] = None,
+               end: Optional[date] = None) -> pd.DataFrame:
+        """Columns ``bucket, co2_impact, price, count`` per day/week/month, oldest first.
+
+        Read from rollups maintained at write time, so the cost depends on the
+        number of buckets in ``[start, end]`` rather than on the number of purchases.
+        """
+
+    @abstractmethod
+    def month_totals(self, day: date) -> BucketTotals:
+        """CO₂, spend and item count of the calendar month containing ``day``.
+
+        A single rollup bucket, so budget checks cost the same at any history size.
+        """
+
+    @abstractmethod
+    def split_totals(self, types: Iterable[str]) -> Dict[bool, Dict[str, float]]:
+        """Count/price/co2 totals keyed by whether the type is in ``types``."""
+
+    @abstractmethod
+    def history(self, query: HistoryQuery, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> HistoryPage:
+        """One page of the purchases matching ``query``, with their ids, plus the total match count.
+
+        Served from indexes rather than a scan of the whole history.
+        """
+
+    @abstractmethod
+    def frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """All purchases as a DataFrame (restricted to ``columns`` if given)."""
+
+    @abstractmethod
+    def iter_frames(self, start: Optional[date] = None, end: Optional[date] = None,
+                    types: Optional[Iterable[str]] = None,
+                    chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+        """Purchases in insertion order as DataFrames of at most ``chunksize`` rows.
+
+        ``start``/``end`` are inclusive dates; ``types`` restricts categories.
+        """
+
+    def flush(self) -> None:
+        """Make every accepted write durable. A no-op for backends that commit inline."""
+
+
+def durability(mode: Optional[str] = None) -> str:
+    mode = (mode or os.environ.get(DURABILITY_ENV, 'async')).lower()
+    if mode not in DURABILITY_MODES:
+        raise ValueError(f"Unknown durability mode: {mode!r} (expected 'async' or 'sync')")
+    return mode
+
+
+class FileLock:
+    """Re-entrant lock: a thread lock plus an advisory ``flock`` on ``path``.
+
+    The thread lock serializes sessions within one server process; the flock
+    serializes processes sharing the same data directory.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> 'FileLock':
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._lock.release()
+
+
+# ==================== WRITE-BEHIND ====================
+
+class WriteBehind:
+    """Background thread that flushes stores with queued writes.
+
+    A store calls ``schedule`` when its queue goes from empty to non-empty and
+    is flushed once that oldest change is ``delay`` seconds old, so a burst
+    (a purchase, the badge progress it moved, a profile edit) becomes one
+    journal write. Whatever is still queued is flushed at interpreter exit.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._due: Dict['JournalStore', float] = {}
+        self._stores: 'weakref.WeakSet[JournalStore]' = weakref.WeakSet()
+        self._thread: Optional[threading.Thread] = None
+        # Held by the thread while it writes, so flush_all can wait it out
+        self._busy = threading.Lock()
+
+    def schedule(self, store: 'JournalStore', delay: float) -> None:
+        with self._cond:
+            self._stores.add(store)
+            if store in self._due:
+                return  # The oldest queued change sets the deadline
+            self._due[store] = time.monotonic() + delay
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='shopimpact-writer', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    due = [store for store, deadline in self._due.items() if deadline <= now]
+                    if due:
+                        break
+                    self._cond.wait(min(self._due.values()) - now if self._due else None)
+                for store in due:
+                    del self._due[store]
+            with self._busy:
+                for store in due:
+                    try:
+                        store.flush()
+                    except Exception as e:
+                        # The records stay queued; retry later and let the next
+                        # write on this store flush inline, so the error reaches the user
+                        store._write_error = e
+                        self.schedule(store, store.flush_delay)
+
+    def flush_all(self) -> None:
+        with self._busy:
+            with self._cond:
+                self._due.clear()
+                stores = [store for store in self._stores if store._queue]
+            for store in stores:
+                try:
+                    store.flush()
+                except Exception as e:
+                    print(f"ShopImpact: could not flush {store.journal_path}: {e}", file=sys.stderr)
+
+
+_WRITER = WriteBehind()
+atexit.register(_WRITER.flush_all)
+
+
+# ==================== JSON JOURNAL ====================
+
+def _apply_record(data: Dict, agg: LedgerAggregates, rollups: TimeRollups, record: Dict) -> None:
+    op = record.get('op')
+    if op == 'purchase':
+        data['purchases'].append(record['purchase'])
+        agg.add(record['purchase'])
+        rollups.add(record['purchase'])
+    elif op in ('update', 'delete'):
+        ledger = data['purchases']
+        i = ledger.position(record['id'])
+        if i is None:
+            return  # Already deleted by another session
+        old = ledger.update(i, record['purchase']) if op == 'update' else ledger.delete(i)
+        agg.remove(old)
+        rollups.remove(old)
+        if op == 'update':
+            agg.add(record['purchase'])
+            rollups.add(record['purchase'])
+    elif op == 'profile':
+        data['user_profile'] = record['user_profile']
+
+
+def _coalesce(records: List[Dict]) -> List[Dict]:
+    """Drop profile records superseded later in the same batch; every purchase is kept."""
+    last = max((i for i, r in enumerate(records) if r['op'] == 'profile'), default=None)
+    return [r for i, r in enumerate(records) if r['op'] != 'profile' or i == last]
+
+
+class JournalStore(Storage):
+    """Snapshot file plus an append-only JSONL journal.
+
+    The snapshot is a columnar binary file (``shopimpact_data_v3.columns``,
+    see ``shopimpact.snapshot``) that is memory-mapped on load, so opening a
+    store reads its header and not its rows. A store that only has the
+    original ``shopimpact_data_v3.json`` is read from that once and migrated;
+    the JSON file is kept as ``.json.bak``. Each purchase or profile change is
+    appended to the journal as one line, and ``load`` replays snapshot + tail.
+    The snapshot is only ever replaced via temp-file-plus-rename, so a crash
+    mid-write can never truncate the existing history.
+
+    The replayed document is kept in memory with the purchases in a columnar
+    ``Ledger``, so queries are vectorized over its arrays. All file access happens under a ``FileLock``, and the
+    in-memory copy is replayed again whenever another process has changed
+    the files since we last saw them.
+
+    With ``durability='async'`` (the default) a change is applied in memory
+    and queued; ``WriteBehind`` appends the queue to the journal with a single
+    fsync at most ``flush_delay`` seconds later, and the caller only waits for
+    the disk once ``flush_batch`` changes are queued. Other processes see the
+    change after that flush. ``'sync'`` writes every change before returning.
+    """
+
+    def __init__(self, snapshot_path: Path, compact_every: int = DEFAULT_COMPACT_EVERY,
+                 mode: Optional[str] = None, flush_delay: Optional[float] = None,
+                 flush_batch: Optional[int] = None):
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = self.snapshot_path.with_suffix('.journal')
+        self.columns_path = self.snapshot_path.with_suffix('.columns')
+        self.compact_every = compact_every
+        self.durability = durability(mode)
+        self.flush_delay = (flush_delay if flush_delay is not None
+                            else int(os.environ.get(FLUSH_DELAY_ENV, DEFAULT_FLUSH_DELAY_MS)) / 1000)
+        self.flush_batch = max(1, flush_batch if flush_batch is not None
+                               else int(os.environ.get(FLUSH_BATCH_ENV, DEFAULT_FLUSH_BATCH)))
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = FileLock(self.snapshot_path.with_suffix('.lock'))
+        self._seen: Optional[Tuple] = None
+        self._data: Optional[Dict] = None
+        self._version = next(_VERSIONS)
+        self._agg = LedgerAggregates()
+        self._rollups = TimeRollups()
+        self._seq: int = 0
+        self._pending: int = 0
+        # Records applied in memory but not yet in the journal (no seq yet)
+        self._queue: List[Dict] = []
+        self._write_error: Optional[Exception] = None
+        # Set when the last replay started from the legacy JSON snapshot
+        self._from_json = False
+
+    def exists(self) -> bool:
+        return self.columns_path.exists() or self.snapshot_path.exists() or self.journal_path.exists()
+
+    # ---------- reading ----------
+    def _read_snapshot(self) -> Tuple[Dict, LedgerAggregates, TimeRollups, int]:
+        self._from_json = False
+        if self.columns_path.exists():
+            # A damaged file raises rather than falling back: the JSON file, if
+            # any, is older than the journal and would silently lose history
+            ledger, meta = read_snapshot(self.columns_path)
+            seq = int(meta.pop('journal_seq', 0))
+            agg = LedgerAggregates.from_dict(meta.pop('aggregates', None))
+            rollups = TimeRollups.from_dict(meta.pop('rollups', None))
+            if agg is None or rollups is None:
+                df = ledger.frame()
+                agg, rollups = agg or LedgerAggregates.from_frame(df), rollups or TimeRollups.from_frame(df)
+            return {**meta, 'purchases': ledger}, agg, rollups, seq
+        self._from_json = self.snapshot_path.exists()
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = get_default_data()
+        seq = int(data.pop('journal_seq', 0))
+        agg = LedgerAggregates.from_dict(data.pop('aggregates', None))
+        rollups = TimeRollups.from_dict(data.pop('rollups', None))
+        data.setdefault('user_profile', get_default_data()['user_profile'])
+        df = pd.DataFrame(data.get('purchases', []), columns=PURCHASE_COLUMNS)
+        # Held as a columnar Ledger in memory; written back as the original list layout
+        data['purchases'] = Ledger.from_frame(df)
+        if agg is None or rollups is None:
+            # Snapshot written before aggregates/rollups were persisted
+            agg = agg or LedgerAggregates.from_frame(df)
+            rollups = rollups or TimeRollups.from_frame(df)
+        return data, agg, rollups, seq
+
+    def _read_journal(self) -> List[Dict]:
+        """Return all complete journal records, dropping a torn trailing line."""
+        if not self.journal_path.exists():
+            return []
+        with open(self.journal_path, 'rb') as f:
+            raw = f.read()
+        valid_end = raw.rfind(b'\n') + 1
+        records = []
+        for line in raw[:valid_end].splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        if valid_end < len(raw):
+            # A crash interrupted the last append; cut it off so the next
+            # record starts on a clean line.
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_end)
+        return records
+
+    def _replay(self) -> Dict:
+        data, agg, rollups, snap_seq = self._read_snapshot()
+        seq, pending = snap_seq, 0
+        for record in self._read_journal():
+            rec_seq = record.get('seq', 0)
+            if rec_seq <= snap_seq:
+                continue  # Already folded into the snapshot by a compaction
+            _apply_record(data, agg, rollups, record)
+            seq, pending = rec_seq, pending + 1
+        self._data, self._agg, self._rollups = data, agg, rollups
+        self._seq, self._pending = seq, pending
+        self._version = next(_VERSIONS)
+        return data
+
+    def _fingerprint(self) -> Tuple:
+        stamp = []
+        for path in (self.columns_path, self.snapshot_path, self.journal_path):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _state(self) -> Dict:
+        with self._lock:
+            stamp = self._fingerprint()
+            if self._data is None or stamp != self._seen:
+                self._replay()
+                self._seen = self._fingerprint()
+                # Changes still waiting for the writer go back on top
+                for record in self._queue:
+                    _apply_record(self._data, self._agg, self._rollups, record)
+                if self._from_json:
+                    self.compact()  # One-time migration to the columnar snapshot
+            return self._data
+
+    def load(self) -> Dict:
+        with self._lock:
+            data = self._state()
+            return {**copy.deepcopy({k: v for k, v in data.items() if k != 'purchases'}),
+                    'purchases': data['purchases'].records()}
+
+    def load_profile(self) -> Dict:
+        return copy.deepcopy(self._state()['user_profile'])
+
+    # ---------- writing ----------
+    def _append(self, record: Dict) -> None:
+        with self._lock:
+            data = self._state()
+            # Applied before it is queued: a record that fails to apply is never written,
+            # and a compaction triggered by the flush snapshots memory that includes it
+            _apply_record(data, self._agg, self._rollups, record)
+            if record['op'] != 'profile':
+                self._version = next(_VERSIONS)
+            self._queue.append(record)
+            if self.durability == 'sync':
+                try:
+                    self._flush_locked()
+                except BaseException:
+                    # Not committed: forget it and rebuild memory from disk on next access
+                    self._queue = [r for r in self._queue if r is not record]
+                    self._seen = None
+                    raise
+            elif len(self._queue) >= self.flush_batch or self._write_error is not None:
+                # Backpressure, or the background writer is failing: write inline
+                self._flush_locked()
+            elif len(self._queue) == 1:
+                _WRITER.schedule(self, self.flush_delay)
+
+    def _flush_locked(self) -> None:
+        if not self._queue:
+            return
+        # Catch up with other processes first, so our seqs follow theirs
+        self._state()
+        records, self._queue = _coalesce(self._queue), []
+        lines = ''.join(json.dumps({'seq': self._seq + i, **record}, separators=(',', ':')) + '\n'
+                        for i, record in enumerate(records, 1))
+        try:
+            size = self.journal_path.stat().st_size if self.journal_path.exists() else 0
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                try:
+                    f.write(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+                except BaseException:
+                    # Never leave half a batch behind for the retry to duplicate
+                    f.truncate(size)
+                    raise
+        except BaseException:
+            self._queue = records
+            raise
+        self._seq += len(records)
+        self._pending += len(records)
+        self._write_error = None
+        self._seen = self._fingerprint()
+        if self._pending >= self.compact_every:
+            self.compact()
+
+    def flush(self) -> None:
+        """Write all queued changes to the journal now."""
+        with self._lock:
+            self._flush_locked()
+
+    def append_purchase(self, purchase: Dict) -> None:
+        self._append({'op': 'purchase', 'purchase': dict(purchase)})
+
+    def update_purchase(self, purchase_id: int, purchase: Dict) -> None:
+        with self._lock:
+            if self._state()['purchases'].position(purchase_id) is None:
+                raise KeyError(f"No purchase with id {purchase_id}")
+            self._append({'op': 'update', 'id': int(purchase_id), 'purchase': dict(purchase)})
+
+    def delete_purchase(self, purchase_id: int) -> None:
+        with self._lock:
+            if self._state()['purchases'].position(purchase_id) is None:
+                raise KeyError(f"No purchase with id {purchase_id}")
+            self._append({'op': 'delete', 'id': int(purchase_id)})
+
+    def save_profile(self, profile: Dict) -> None:
+        self._append({'op': 'profile', 'user_profile': copy.deepcopy(profile)})
+
+    def append_frames(self, frames: Iterable[pd.DataFrame]) -> int:
+        # Bulk loads go straight into a new snapshot: one write instead of
+        # one journal line per row.
+        with self._lock:
+            self._flush_locked()
+            data = self._state()
+            agg = dataclasses.replace(self._agg)
+            rollups = copy.deepcopy(self._rollups)
+            # Build on a copy so a failed snapshot write leaves the live state untouched
+            ledger = data['purchases'].copy()
+            for frame in frames:
+                ledger.extend(frame)
+                agg.merge(LedgerAggregates.from_frame(frame))
+                rollups.merge_frame(frame)
+            added = len(ledger) - len(data['purchases'])
+            if not added:
+                return 0
+            data = {**data, 'purchases': ledger}
+            self._write_snapshot(data, agg, rollups, self._seq)
+            self._truncate_journal()
+            self._data, self._agg, self._rollups = data, agg, rollups
+            self._version = next(_VERSIONS)
+            self._seen = self._fingerprint()
+            return added
+
+    def save(self, data: Dict) -> None:
+        with self._lock:
+            self._state()
+            self._queue = []  # Replaced wholesale below
+            df = pd.DataFrame(data['purchases'], columns=PURCHASE_COLUMNS)
+            data = {**copy.deepcopy({k: v for k, v in data.items() if k != 'purchases'}),
+                    'purchases': Ledger.from_frame(df)}
+            agg, rollups = LedgerAggregates.from_frame(df), TimeRollups.from_frame(df)
+            self._write_snapshot(data, agg, rollups, self._seq)
+            self._truncate_journal()
+            self._data, self._agg, self._rollups = data, agg, rollups
+            self._version = next(_VERSIONS)
+            self._seen = self._fingerprint()
+
+    def compact(self) -> None:
+        """Fold the journal into a fresh snapshot."""
+        with self._lock:
+            self._flush_locked()
+            self._write_snapshot(self._state(), self._agg, self._rollups, self._seq)
+            self._truncate_journal()
+            self._seen = self._fingerprint()
+
+    def _write_snapshot(self, data: Dict, agg: LedgerAggregates, rollups: TimeRollups, seq: int) -> None:
+        meta = {**{k: v for k, v in data.items() if k != 'purchases'},
+                'aggregates': agg.to_dict(), 'rollups': rollups.to_dict(), 'journal_seq': seq}
+        write_snapshot(self.columns_path, data['purchases'], meta)
+        if self.snapshot_path.exists():
+            # Superseded by the columnar snapshot; kept for rollback, never read again
+            os.replace(self.snapshot_path, self.snapshot_path.with_name(self.snapshot_path.name + '.bak'))
+        self._from_json = False
+
+    def _truncate_journal(self) -> None:
+        # Safe even if we crash before this point: records up to the
+        # snapshot's journal_seq are skipped on replay.
+        with open(self.journal_path, 'w', encoding='utf-8'):
+            pass
+        self._pending = 0
+
+    # ---------- queries ----------
+    def version(self) -> int:
+        with self._lock:
+            self._state()
+            return self._version
+
+    def aggregates(self) -> LedgerAggregates:
+        with self._lock:
+            self._state()
+            return dataclasses.replace(self._agg)
+
+    def recent(self, n: int) -> List[Dict]:
+        ledger = self._state()['purchases']
+        total = len(ledger)
+        return ledger.records(slice(max(total - n, 0), total))[::-1] if n > 0 else []
+
+    def frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        return self._state()['purchases'].frame(columns)
+
+    def iter_frames(self, start: Optional[date] = None, end: Optional[date] = None,
+                    types: Optional[Iterable[str]] = None,
+                    chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+        lo, hi = (np.datetime64(bound, 's').astype(np.int64) if bound else None
+                  for bound in date_bounds(start, end))
+        ledger = self._state()['purchases']
+        total = len(ledger)
+        type_mask = ledger.type_mask(types) if types is not None else None
+        for offset in range(0, total, chunksize):
+            stop = min(offset + chunksize, total)
+            dates = ledger.columns(offset, stop)['date']
+            mask = np.ones(len(dates), dtype=bool)
+            if lo is not None:
+                mask &= dates >= lo
+            if hi is not None:
+                mask &= dates < hi
+            if type_mask is not None:
+                mask &= type_mask[offset:stop]
+            rows = offset + np.flatnonzero(mask)
+            if len(rows):
+                yield ledger.frame(rows=rows)
+
+    def category_totals(self) -> pd.DataFrame:
+        ledger = self._state()['purchases']
+        cols = ledger.columns()
+        n_types = len(ledger.types)
+        co2 = np.bincount(cols['type'], weights=cols['co2_impact'], minlength=n_types)
+        price = np.bincount(cols['type'], weights=cols['price'], minlength=n_types)
+        present = np.flatnonzero(np.bincount(cols['type'], minlength=n_types))
+        df = pd.DataFrame({
+            'type': np.asarray(ledger.types.values, dtype=object)[present],
+            'co2_impact': co2[present], 'price': price[present],
+        })
+        return df.sort_values('type', ignore_index=True)
+
+    def rollup(self, granularity: str, start: Optional[date] = None,
+               end: Optional[date] = None) -> pd.DataFrame:
+        with self._lock:
+            self._state()
+            return self._rollups.query(
+                granularity, start.isoformat() if start else None, end.isoformat() if end else None
+            )
+
+    def month_totals(self, day: date) -> BucketTotals:
+        with self._lock:
+            self._state()
+            return self._rollups.bucket('month', bucket_keys(day.isoformat())['month'])
+
+    def split_totals(self, types: Iterable[str]) -> Dict[bool, Dict[str, float]]:
+        ledger = self._state()['purchases']
+        cols = ledger.columns()
+        mask = ledger.type_mask(types)[:len(cols['type'])]
+        return {
+            flag: {
+                'count': int(m.sum()),
+                'price': float(cols['price'][m].sum()),
+                'co2_impact': float(cols['co2_impact'][m].sum()),
+            }
+            for flag, m in ((True, mask), (False, ~mask))
+        }
+
+    def history(self, query: HistoryQuery, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> HistoryPage:
+        # The index lives on the ledger and is updated in place, so build and read it under the lock
+        with self._lock:
+            return self._state()['purchases'].history().page(query, offset, limit)
+
+
+# ==================== SQLITE ====================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS purchases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    type TEXT NOT NULL,
+    brand TEXT NOT NULL,
+    price REAL NOT NULL,
+    co2_impact REAL NOT NULL
+);
+-- Covering indexes: the category chart and date-range exports never touch the table.
+CREATE INDEX IF NOT EXISTS idx_purchases_date ON purchases(date, co2_impact);
+CREATE INDEX IF NOT EXISTS idx_purchases_type ON purchases(type, co2_impact, price);
+-- History browser: each sort order, and category/brand listings in date order.
+CREATE INDEX IF NOT EXISTS idx_purchases_type_date ON purchases(type, date);
+CREATE INDEX IF NOT EXISTS idx_purchases_brand_date ON purchases(brand, date);
+CREATE INDEX IF NOT EXISTS idx_purchases_price ON purchases(price);
+CREATE INDEX IF NOT EXISTS idx_purchases_co2 ON purchases(co2_impact);
+CREATE TABLE IF NOT EXISTS user_profile (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+-- Day/week/month rollups (TimeRollups), upserted in the same transaction as each insert.
+CREATE TABLE IF NOT EXISTS rollups (
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    co2_impact REAL NOT NULL,
+    price REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (granularity, bucket)
+) WITHOUT ROWID;
+-- Running totals (LedgerAggregates), updated in the same transaction as each insert.
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _placeholders(values: List) -> str:
+    return ','.join('?' * len(values))
+
+
+class SQLiteStore(Storage):
+    """SQLite backend: purchases live in an indexed table, not in memory.
+
+    Queries read the database itself, so there is no write queue here; the
+    durability mode picks the WAL sync level instead. ``'async'`` (NORMAL)
+    commits without an fsync, which happens at checkpoints; ``'sync'`` (FULL)
+    fsyncs the WAL on every commit.
+    """
+
+    def __init__(self, db_path: Path, mode: Optional[str] = None):
+        self.db_path = Path(db_path)
+        self.durability = durability(mode)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        # Streamlit serves sessions from several threads; access is
+        # serialized through self._lock. Other processes are handled by
+        # SQLite's own locking (writers wait up to `timeout` seconds).
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=' + ('FULL' if self.durability == 'sync' else 'NORMAL'))
+        self._conn.executescript(_SCHEMA)
+        with self._transaction():
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0')")
+            if not self._query("SELECT 1 FROM meta WHERE key = 'aggregates'"):
+                self._write_aggregates(LedgerAggregates.from_frame(self.frame()))
+            if not self._query("SELECT 1 FROM meta WHERE key = 'rollups'"):
+                # Database created before rollups were maintained
+                self._conn.execute('DELETE FROM rollups')
+                self._upsert_rollups(TimeRollups.from_frame(self.frame()))
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('rollups', '1')")
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database write lock up front.
+
+        BEGIN IMMEDIATE makes the aggregates read-modify-write atomic with
+        respect to other processes using the same file.
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ---------- persistence ----------
+    def load(self) -> Dict:
+        return {'purchases': self.frame().to_dict('records'), 'user_profile': self.load_profile()}
+
+    def load_profile(self) -> Dict:
+        profile = get_default_data()['user_profile']
+        for key, value in self._query('SELECT key, value FROM user_profile'):
+            profile[key] = json.loads(value)
+        return profile
+
+    def _write_aggregates(self, agg: LedgerAggregates) -> None:
+        # Every purchase change rewrites the aggregates, so bump the data version here too
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('aggregates', ?)", (json.dumps(agg.to_dict()),)
+        )
+        self._conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+
+    def _upsert_rollups(self, rollups: TimeRollups) -> None:
+        self._conn.executemany(
+            'INSERT INTO rollups (granularity, bucket, co2_impact, price, count) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (granularity, bucket) DO UPDATE SET '
+            'co2_impact = co2_impact + excluded.co2_impact, price = price + excluded.price, '
+            'count = count + excluded.count',
+            [
+                (granularity, key, *values)
+                for granularity, buckets in rollups.to_dict().items()
+                for key, values in buckets.items()
+            ]
+        )
+
+    def append_purchase(self, purchase: Dict) -> None:
+        with self._transaction():
+            self._conn.execute(
+                'INSERT INTO purchases (date, type, brand, price, co2_impact) VALUES (?, ?, ?, ?, ?)',
+                tuple(purchase[c] for c in PURCHASE_COLUMNS)
+            )
+            agg = self.aggregates()
+            agg.add(purchase)
+            self._write_aggregates(agg)
+            rollups = TimeRollups()
+            rollups.add(purchase)
+            self._upsert_rollups(rollups)
+
+    def append_frames(self, frames: Iterable[pd.DataFrame]) -> int:
+        total = 0
+        with self._transaction():
+            agg = self.aggregates()
+            for frame in frames:
+                self._conn.executemany(
+                    'INSERT INTO purchases (date, type, brand, price, co2_impact) VALUES (?, ?, ?, ?, ?)',
+                    zip(*(frame[c].tolist() for c in PURCHASE_COLUMNS))
+                )
+                agg.merge(LedgerAggregates.from_frame(frame))
+                self._upsert_rollups(TimeRollups.from_frame(frame))
+                total += len(frame)
+            self._write_aggregates(agg)
+        return total
+
+    def _purchase(self, purchase_id: int) -> Dict:
+        rows = self._query('SELECT date, type, brand, price, co2_impact FROM purchases WHERE id = ?', (purchase_id,))
+        if not rows:
+            raise KeyError(f"No purchase with id {purchase_id}")
+        return dict(zip(PURCHASE_COLUMNS, rows[0]))
+
+    def _replace_totals(self, old: Dict, new: Optional[Dict]) -> None:
+        """Move the aggregates and rollups from ``old`` to ``new`` (None for a delete)."""
+        agg = self.aggregates()
+        agg.remove(old)
+        removed = TimeRollups()
+        removed.remove(old)
+        self._upsert_rollups(removed)
+        if new is not None:
+            agg.add(new)
+            added = TimeRollups()
+            added.add(new)
+            self._upsert_rollups(added)
+        self._conn.execute('DELETE FROM rollups WHERE count <= 0')
+        self._write_aggregates(agg)
+
+    def update_purchase(self, purchase_id: int, purchase: Dict) -> None:
+        with self._transaction():
+            old = self._purchase(purchase_id)
+            self._conn.execute(
+                'UPDATE purchases SET date = ?, type = ?, brand = ?, price = ?, co2_impact = ? WHERE id = ?',
+                (*(purchase[c] for c in PURCHASE_COLUMNS), purchase_id)
+            )
+            self._replace_totals(old, purchase)
+
+    def delete_purchase(self, purchase_id: int) -> None:
+        with self._transaction():
+            old = self._purchase(purchase_id)
+            self._conn.execute('DELETE FROM purchases WHERE id = ?', (purchase_id,))
+            self._replace_totals(old, None)
+
+    def _write_profile(self, profile: Dict) -> None:
+        self._conn.execute('DELETE FROM user_profile')
+        self._conn.executemany(
+            'INSERT INTO user_profile (key, value) VALUES (?, ?)',
+            [(key, json.dumps(value)) for key, value in profile.items()]
+        )
+
+    def save_profile(self, profile: Dict) -> None:
+        with self._transaction():
+            self._write_profile(profile)
+
+    def save(self, data: Dict) -> None:
+        with self._transaction():
+            self._conn.execute('DELETE FROM purchases')
+            self._conn.executemany(
+                'INSERT INTO purchases (date, type, brand, price, co2_impact) VALUES (?, ?, ?, ?, ?)',
+                (tuple(p[c] for c in PURCHASE_COLUMNS) for p in data.get('purchases', []))
+            )
+            self._write_profile(data.get('user_profile', get_default_data()['user_profile']))
+            df = pd.DataFrame(data.get('purchases', []), columns=PURCHASE_COLUMNS)
+            self._write_aggregates(LedgerAggregates.from_frame(df))
+            self._conn.execute('DELETE FROM rollups')
+            self._upsert_rollups(TimeRollups.from_frame(df))
+
+    # ---------- queries ----------
+    def version(self) -> int:
+        rows = self._query("SELECT value FROM meta WHERE key = 'version'")
+        return int(rows[0][0]) if rows else 0
+
+    def aggregates(self) -> LedgerAggregates:
+        # Read from the table rather than memory so several server processes
+        # sharing one database stay consistent.
+        rows = self._query("SELECT value FROM meta WHERE key = 'aggregates'")
+        return LedgerAggregates.from_dict(json.loads(rows[0][0])) if rows else LedgerAggregates()
+
+    def recent(self, n: int) -> List[Dict]:
+        rows = self._query(
+            f'SELECT {", ".join(PURCHASE_COLUMNS)} FROM purchases ORDER BY id DESC LIMIT ?', (n,)
+        )
+        return [dict(zip(PURCHASE_COLUMNS, row)) for row in rows]
+
+    def frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        columns = columns or PURCHASE_COLUMNS
+        rows = self._query(f'SELECT {", ".join(columns)} FROM purchases ORDER BY id')
+        return pd.DataFrame(rows, columns=columns)
+
+    def iter_frames(self, start: Optional[date] = None, end: Optional[date] = None,
+                    types: Optional[Iterable[str]] = None,
+                    chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+        lo, hi = date_bounds(start, end)
+        clauses, params = [], []
+        if lo is not None:
+            clauses.append('date >= ?')
+            params.append(lo)
+        if hi is not None:
+            clauses.append('date < ?')
+            params.append(hi)
+        if types is not None:
+            types = list(types)
+            clauses.append(f'type IN ({_placeholders(types)})')
+            params.extend(types)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        # Keyset pagination on id: every chunk is a short indexed query, so
+        # writers are never blocked for the whole export.
+        last_id = 0
+        while True:
+            rows = self._query(
+                f'SELECT id, {", ".join(PURCHASE_COLUMNS)} FROM purchases '
+                f'{where} {"AND" if where else "WHERE"} id > ? ORDER BY id LIMIT ?',
+                tuple(params) + (last_id, chunksize)
+            )
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield pd.DataFrame([row[1:] for row in rows], columns=PURCHASE_COLUMNS)
+
+    def category_totals(self) -> pd.DataFrame:
+        rows = self._query(
+            'SELECT type, TOTAL(co2_impact), TOTAL(price) FROM purchases GROUP BY type ORDER BY type'
+        )
+        return pd.DataFrame(rows, columns=['type', 'co2_impact', 'price'])
+
+    def rollup(self, granularity: str, start: Optional[date] = None,
+               end: Optional[date] = None) -> pd.DataFrame:
+        lo, hi = bucket_range(granularity, start.isoformat() if start else None,
+                              end.isoformat() if end else None)
+        sql = 'SELECT bucket, co2_impact, price, count FROM rollups WHERE granularity = ?'
+        params: List = [granularity]
+        if lo is not None:
+            sql += ' AND bucket >= ?'
+            params.append(lo)
+        if hi is not None:
+            sql += ' AND bucket <= ?'
+            params.append(hi)
+        rows = self._query(sql + ' ORDER BY bucket', tuple(params))
+        return pd.DataFrame(rows, columns=ROLLUP_COLUMNS)
+
+    def month_totals(self, day: date) -> BucketTotals:
+        rows = self._query(
+            "SELECT co2_impact, price, count FROM rollups WHERE granularity = 'month' AND bucket = ?",
+            (bucket_keys(day.isoformat())['month'],)
+        )
+        return BucketTotals(*rows[0]) if rows else BucketTotals()
+
+    def split_totals(self, types: Iterable[str]) -> Dict[bool, Dict[str, float]]:
+        types = list(types)
+        rows = self._query(
+            f'SELECT type IN ({_placeholders(types)}) AS eco, COUNT(*), TOTAL(price), TOTAL(co2_impact) '
+            'FROM purchases GROUP BY eco',
+            tuple(types)
+        )
+        split = {flag: {'count': 0, 'price': 0.0, 'co2_impact': 0.0} for flag in (True, False)}
+        for eco, count, price, co2 in rows:
+            split[bool(eco)] = {'count': count, 'price': price, 'co2_impact': co2}
+        return split
+
+    def _history_types(self, query: HistoryQuery) -> Optional[List[str]]:
+        if not query.types and query.eco is None:
+            return None
+        types = list(query.types)
+        if not types:
+            # Distinct types by hopping along the type index: one lookup per type, not a scan
+            types = [t for (t,) in self._query(
+                'WITH RECURSIVE t(v) AS (SELECT MIN(type) FROM purchases UNION ALL '
+                'SELECT (SELECT MIN(type) FROM purchases WHERE type > v) FROM t WHERE v IS NOT NULL) '
+                'SELECT v FROM t WHERE v IS NOT NULL'
+            )]
+        if query.eco is not None:
+            types = [t for t in types if resolve_category(t).eco == query.eco]
+        return types
+
+    def history(self, query: HistoryQuery, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> HistoryPage:
+        clauses, params = [], []
+        lo, hi = date_bounds(query.start, query.end)
+        if lo:
+            clauses.append('date >= ?')
+            params.append(lo)
+        if hi:
+            clauses.append('date < ?')
+            params.append(hi)
+        grouped = []  # (column, values) filters that have an index of their own
+        types = self._history_types(query)
+        if types is not None:
+            grouped.append(('type', types))
+        if query.brands:
+            grouped.append(('brand', list(query.brands)))
+
+        def where(unindexed: bool = False) -> str:
+            # A unary + keeps SQLite from using that column's index
+            parts = clauses + [f"{'+' if unindexed else ''}{column} IN ({_placeholders(values)})"
+                               for column, values in grouped]
+            return ' WHERE ' + ' AND '.join(parts) if parts else ''
+
+        for _, values in grouped:
+            params += values
+        n = self.count()
+        total = self._query(f'SELECT COUNT(*) FROM purchases{where()}', tuple(params))[0][0] if query.filtered else n
+        # A category or brand filter is otherwise answered from its own index, sorting every
+        # match. When it matches a large share of the rows, walking the sort key's index and
+        # skipping the rest reaches the page after about (offset + limit) * n / total rows instead.
+        walk = bool(grouped) and total and (offset + limit) * n < total * total
+        # query.sort is one of SORT_KEYS (checked by HistoryQuery), so it can be spliced in
+        direction = 'DESC' if query.descending else 'ASC'
+        rows = self._query(
+            f'SELECT id, date, type, brand, price, co2_impact FROM purchases{where(walk)} '
+            f'ORDER BY {query.sort} {direction}, id {direction} LIMIT ? OFFSET ?',
+            (*params, limit, offset)
+        )
+        return HistoryPage(pd.DataFrame(rows, columns=['id'] + PURCHASE_COLUMNS), total)
+
+
+# ==================== FACTORY & MIGRATION ====================
+
+def migrate_json_to_sqlite(json_path: Path, db_path: Path) -> int:
+    """Copy a JSON (snapshot + journal) history into a SQLite database.
+
+    Returns the number of purchases migrated.
+    """
+    source = JournalStore(json_path)
+    # Build the database under a temporary name and rename it into place, so
+    # other processes never open a half-migrated file. The JSON store's lock
+    # makes concurrent first starts migrate only once.
+    with source._lock:
+        if Path(db_path).exists():
+            return 0
+        data = source.load()
+        fd, tmp_path = tempfile.mkstemp(dir=Path(db_path).parent, suffix='.db.tmp')
+        os.close(fd)
+        target = SQLiteStore(tmp_path)
+        target.save(data)
+        target._conn.execute('PRAGMA journal_mode=DELETE')  # fold the WAL back into the file
+        target.close()
+        os.replace(tmp_path, db_path)
+    return len(data['purchases'])
+
+
+def user_partition(user_id: Optional[str] = None) -> Tuple[Path, Path]:
+    """JSON and SQLite paths for ``user_id``.
+
+    Ids that are not plain file-name safe are hashed, so any string (e.g. an
+    e-mail address) can be used as a key.
+    """
+    data_dir = Path(os.environ.get(DATA_DIR_ENV, '.'))
+    if not user_id or user_id == DEFAULT_USER:
+        return data_dir / DEFAULT_JSON_PATH, Path(os.environ.get(DB_ENV, data_dir / DEFAULT_DB_PATH))
+    if not _SAFE_USER_ID.match(user_id):
+        user_id = 'u-' + hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:32]
+    user_dir = data_dir / 'users' / user_id
+    return user_dir / DEFAULT_JSON_PATH, user_dir / DEFAULT_DB_PATH
+
+
+def open_storage(kind: Optional[str] = None, user_id: Optional[str] = None) -> Storage:
+    """Open ``user_id``'s store with the backend selected by ``kind`` or SHOPIMPACT_STORAGE.
+
+    The first time the SQLite backend is opened, an existing JSON history is
+    migrated into it automatically.
+    """
+    kind = (kind or os.environ.get(STORAGE_ENV, 'json')).lower()
+    json_path, db_path = user_partition(user_id)
+    if kind == 'json':
+        return JournalStore(json_path)
+    if kind == 'sqlite':
+        if not db_path.exists() and JournalStore(json_path).exists():
+            migrate_json_to_sqlite(json_path, db_path)
+        return SQLiteStore(db_path)
+    raise ValueError(f"Unknown storage backend: {kind!r} (expected 'json' or 'sqlite')")
+
+
+if __name__ == '__main__':
+    # One-shot migration: python -m shopimpact.storage [data.json] [data.db]
+    src = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_JSON_PATH
+    dst = Path(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_DB_PATH
+    print(f"Migrated {migrate_json_to_sqlite(src, dst)} purchases from {src} to {dst}")
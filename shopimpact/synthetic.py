@@ -0,0 +1,56 @@
+"""
+ShopImpact - Synthetic Data
+Deterministic purchase histories for benchmarks and load tests.
+"""
+
+import numpy as np
+import pandas as pd
+
+from shopimpact.catalog import ALL_BRANDS, PRODUCT_TYPES
+from shopimpact.impact import compute_impact
+from shopimpact.ledger import PURCHASE_COLUMNS, from_epoch
+
+# Share of purchases per hour of day: quiet nights, lunch bump, evening peak
+_HOUR_WEIGHTS = np.array([
+    1, 0.5, 0.3, 0.2, 0.2, 0.4, 1, 2, 3, 4, 5, 6,
+    7, 6, 5, 5, 6, 7, 9, 10, 9, 7, 4, 2,
+], dtype=np.float64)
+_WEEKEND_BOOST = 1.6
+
+
+def _zipf_weights(n: int, s: float = 1.1) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    return weights / weights.sum()
+
+
+def synthetic_ledger(n: int, seed: int = 0, start: str = '2022-01-01',
+                     span_days: int = 3 * 365) -> pd.DataFrame:
+    """``n`` purchases in ``PURCHASE_COLUMNS`` layout, identical for the same arguments.
+
+    Types and brands follow a Zipf-like popularity curve over ``PRODUCT_TYPES``
+    and ``ALL_BRANDS`` (shuffled once per seed). Prices are log-normal around
+    ₹800 and rounded to whole rupees like the slider. Dates spread over
+    ``span_days`` days from ``start``, with more purchases on weekends and in
+    the evening, and come out sorted. CO₂ is scored with the
+    same kernel as imports.
+    """
+    rng = np.random.default_rng(seed)
+    types = np.array(PRODUCT_TYPES, dtype=object)[rng.permutation(len(PRODUCT_TYPES))]
+    brands = np.array(ALL_BRANDS, dtype=object)[rng.permutation(len(ALL_BRANDS))]
+    ptype = types[rng.choice(len(types), size=n, p=_zipf_weights(len(types)))]
+    brand = brands[rng.choice(len(brands), size=n, p=_zipf_weights(len(brands)))]
+    price = np.clip(np.round(rng.lognormal(np.log(800), 0.9, size=n)), 50, 100_000)
+
+    days = span_days
+    origin = np.datetime64(start, 'D')
+    weekday = (np.arange(days) + (origin.astype(np.int64) + 3) % 7) % 7  # 0 = Monday
+    day_weights = np.where(weekday >= 5, _WEEKEND_BOOST, 1.0)
+    day = rng.choice(days, size=n, p=day_weights / day_weights.sum())
+    hour = rng.choice(24, size=n, p=_HOUR_WEIGHTS / _HOUR_WEIGHTS.sum())
+    minute = rng.integers(0, 60, size=n)
+    stamps = np.sort(origin.astype('datetime64[m]') + day * 1440 + hour * 60 + minute)
+
+    return pd.DataFrame({
+        'date': from_epoch(stamps.astype('datetime64[s]').astype(np.int64)), 'type': ptype, 'brand': brand,
+        'price': price, 'co2_impact': compute_impact(ptype, price).co2,
+    }, columns=PURCHASE_COLUMNS)
@@ -5,15 +5,31 @@ Fully Optimized, Gamified, and Beautifully Animated.
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import json
+import hashlib
+import html
+import io
 import random
+import re
 import time
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from shopimpact.cache import VersionedCache
+from shopimpact.catalog import (
+    ALL_BRANDS, ECO_FRIENDLY_CATEGORIES, PRODUCT_TYPES, estimate_co2, is_eco
+)
+from shopimpact.badges import BADGES, BadgeEngine
+from shopimpact.downsample import downsample, point_budget
+from shopimpact.exporter import EXPORT_FORMATS, available_formats, write_export
+from shopimpact.goals import MonthProgress, crossed_alerts, month_progress
+from shopimpact.history import HistoryQuery
+from shopimpact.importer import import_csv
+from shopimpact.recommend import Recommender
+from shopimpact.search import Match, SkuIndex, load_index
+from shopimpact.spans import SpanRecorder, SpanTotals, flush as flush_span_sinks, sinks_configured
+from shopimpact.storage import DEFAULT_USER, Storage, get_default_data, open_storage
+
 # ==================== PAGE CONFIGURATION ====================
 st.set_page_config(
     page_title="ShopImpact 🍃",
@@ -23,451 +39,148 @@ st.set_page_config(
 )
 
 # ==================== ADVANCED CSS & ANIMATIONS ====================
-st.markdown("""
-<style>
-    /* --- GLOBAL THEME --- */
-    @import url('https://fonts.googleapis.com/css2?family=Nunito:wght@400;600;700;800&display=swap');
-    
-    html, body, [class*="css"] {
-        font-family: 'Nunito', sans-serif;
-    }
-
-    .stApp {
-        background: linear-gradient(120deg, #e0f2f1 0%, #f1f8e9 50%, #fffde7 100%);
-        background-attachment: fixed;
-    }
-
-    /* --- TEXT VISIBILITY FIXES --- */
-    /* Force main text to black, but be specific to avoid breaking components */
-    h1, h2, h3, h4, h5, h6, p, label, .stMarkdown {
-        color: #000000 !important;
-    }
-    
-    /* --- DROPDOWN & INPUT FIXES (CRITICAL UPDATE) --- */
-    
-    /* 1. The Container for the Selected Item (The box you click) */
-    div[data-baseweb="select"] > div {
-        background-color: rgba(255, 255, 255, 0.9) !important;
-        border-color: rgba(0,0,0,0.2) !important;
-        color: #000000 !important;
-    }
-    
-    /* 2. The Text of the Selected Item */
-    div[data-baseweb="select"] span {
-        color: #000000 !important; 
-    }
-
-    /* 3. The Dropdown Menu (The list that pops up) */
-    ul[data-baseweb="menu"] {
-        background-color: #ffffff !important;
-        border: 1px solid #ccc !important;
-    }
-
-    /* 4. The Options inside the Menu */
-    ul[data-baseweb="menu"] li {
-        background-color: #ffffff !important;
-    }
-    
-    /* 5. Text inside the options */
-    ul[data-baseweb="menu"] li span {
-        color: #000000 !important;
-    }
-
-    /* 6. Hover/Selected State in Menu */
-    ul[data-baseweb="menu"] li[aria-selected="true"] {
-        background-color: #e8f5e9 !important; /* Light Green highlight */
-    }
-
-    /* Fix labels for inputs */
-    .stSelectbox label, .stNumberInput label, .stSlider label, .stTextInput label {
-        color: #000000 !important;
-        font-weight: 800;
-        font-size: 1rem;
-    }
-
-    /* --- BACKGROUND AMBIENT ANIMATION --- */
-    @keyframes dropAndDry {
-        0% { transform: translateY(-10vh) rotate(0deg) translateX(0px); opacity: 0; filter: hue-rotate(0deg); }
-        10% { opacity: 1; }
-        50% { filter: hue-rotate(0deg); } /* Green */
-        80% { filter: hue-rotate(90deg) sepia(1); } /* Dried/Brown */
-        100% { transform: translateY(110vh) rotate(720deg) translateX(50px); opacity: 0; filter: hue-rotate(90deg) sepia(1); }
-    }
-
-    .leaf {
-        position: fixed;
-        top: 0;
-        left: 50%;
-        font-size: 2rem;
-        animation: dropAndDry 15s infinite linear;
-        pointer-events: none;
-        z-index: 0;
-    }
-    .leaf:nth-child(1) { left: 10%; animation-duration: 12s; animation-delay: 0s; }
-    .leaf:nth-child(2) { left: 30%; animation-duration: 18s; animation-delay: 2s; font-size: 1.5rem; }
-    .leaf:nth-child(3) { left: 70%; animation-duration: 14s; animation-delay: 5s; }
-    .leaf:nth-child(4) { left: 90%; animation-duration: 20s; animation-delay: 1s; font-size: 2.5rem; }
-
-    /* --- NEW ACTION ANIMATIONS (TRIGGERED) --- */
-    
-    /* 1. Fast Falling Dry Leaves (Non-Eco) */
-    @keyframes fallFast {
-        0% { transform: translateY(-10vh) rotate(0deg); opacity: 1; }
-        100% { transform: translateY(110vh) rotate(360deg); opacity: 0; }
-    }
-    
-    .dry-leaf-burst {
-        position: fixed;
-        top: -10vh;
-        font-size: 2.5rem;
-        color: #8D6E63 !important; /* Brown/Sepia color */
-        animation: fallFast 1s linear forwards;
-        pointer-events: none;
-        z-index: 9999;
-    }
-
-    /* 2. Fast Rising Green Leaves (Eco) */
-    @keyframes riseFast {
-        0% { transform: translateY(110vh) rotate(0deg); opacity: 1; }
-        100% { transform: translateY(-10vh) rotate(-360deg); opacity: 0; }
-    }
-
-    .green-leaf-burst {
-        position: fixed;
-        bottom: -10vh;
-        font-size: 2.5rem;
-        color: #2e7d32 !important; /* Green color */
-        animation: riseFast 1s linear forwards;
-        pointer-events: none;
-        z-index: 9999;
-    }
-
-    /* --- GLASSMORPHISM CARDS --- */
-    div[data-testid="stMetric"], div[class*="stCard"] {
-        background: rgba(255, 255, 255, 0.85); 
-        backdrop-filter: blur(12px);
-        -webkit-backdrop-filter: blur(12px);
-        border-radius: 20px;
-        padding: 20px;
-        box-shadow: 0 8px 32px 0 rgba(31, 38, 135, 0.07);
-        border: 1px solid rgba(255, 255, 255, 0.4);
-        transition: transform 0.3s ease, box-shadow 0.3s ease;
-    }
-
-    div[data-testid="stMetric"]:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 12px 40px 0 rgba(31, 38, 135, 0.15);
-    }
-    
-    [data-testid="stMetricValue"] { color: #000000 !important; }
-    [data-testid="stMetricLabel"] { color: #333333 !important; }
-
-   /* --- BUTTONS (UPDATED FIX) --- */
-    /* 1. Apply Green Theme to ALL buttons (Regular, Download, and Form Submit) */
-    .stButton > button, 
-    .stDownloadButton > button, 
-    div[data-testid="stFormSubmitButton"] > button {
-        background: linear-gradient(45deg, #43a047, #66bb6a) !important;
-        color: white !important;
-        border: none;
-        border-radius: 15px;
-        padding: 10px 25px;
-        font-weight: 700;
-        box-shadow: 0 4px 15px rgba(67, 160, 71, 0.3);
-        transition: all 0.3s ease;
-    }
-
-    /* 2. CRITICAL: Force the text inside the buttons (which are <p> tags) to be WHITE */
-    /* This overrides the global 'black text' rule that was hiding your text */
-    .stButton > button p, 
-    .stDownloadButton > button p, 
-    div[data-testid="stFormSubmitButton"] > button p {
-        color: #ffffff !important;
-    }
-
-    /* 3. Hover Effects */
-    .stButton > button:hover, 
-    .stDownloadButton > button:hover, 
-    div[data-testid="stFormSubmitButton"] > button:hover {
-        transform: scale(1.05);
-        box-shadow: 0 6px 20px rgba(67, 160, 71, 0.5);
-        color: #ffffff !important;
-    }
-    
-    /* --- TABS --- */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 10px;
-        background-color: rgba(255,255,255,0.6);
-        border-radius: 15px;
-        padding: 10px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        white-space: pre-wrap;
-        background-color: transparent;
-        border-radius: 10px;
-        color: #000000;
-        font-weight: 800;
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: #fff;
-        color: #2e7d32 !important;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.05);
-    }
-    
-    /* Eco Suggestion Box */
-    .eco-suggestion {
-        background-color: #e8f5e9;
-        border-left: 5px solid #2e7d32;
-        padding: 15px;
-        border-radius: 5px;
-        margin-top: 10px;
-        margin-bottom: 10px;
-        color: #1b5e20 !important;
-    }
-
-    /* --- LEAF BADGE COMPONENT --- */
-    .leaf-badge {
-        /* Shape: Sharp top-left and bottom-right creates a leaf look */
-        border-radius: 0px 50px 0px 50px;
-        
-        /* Gradient: Green -> Yellow -> Brown */
-        background: linear-gradient(135deg, #a5d6a7 0%, #fff59d 50%, #bcaaa4 100%);
-        
-        padding: 15px 20px;
-        color: #4e342e !important; /* Dark brown text for readability */
-        font-weight: 800;
-        text-align: center;
-        box-shadow: 0 8px 15px rgba(0,0,0,0.1);
-        border: 2px solid rgba(255,255,255,0.6);
-        margin-top: 10px;
-        transition: transform 0.3s ease;
-    }
-    
-    .leaf-badge:hover {
-        transform: scale(1.05) rotate(2deg); /* Slight tilt on hover */
-        box-shadow: 0 12px 20px rgba(0,0,0,0.15);
-    }
-    
-    .leaf-badge small {
-        display: block;
-        font-size: 0.75rem;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-        opacity: 0.8;
-        margin-bottom: 5px;
-    }
-</style>
+# The stylesheet lives in static/shopimpact.css. With static serving on (.streamlit/config.toml),
+# each rerun only sends a <link> that the browser resolves from its cache; otherwise it is inlined.
+THEME_CSS = Path(__file__).parent / 'static' / 'shopimpact.css'
+# Earlier releases serve static .css as text/plain with nosniff, so browsers refuse the <link>
+STATIC_CSS_MIN_VERSION = (1, 56)
+AMBIENT_LEAVES = """
 <div class="leaf">🍃</div>
 <div class="leaf">🍂</div>
 <div class="leaf">🍃</div>
 <div class="leaf">🍂</div>
-""", unsafe_allow_html=True)
-
-# ==================== CONSTANTS ====================
-PRODUCT_TYPES = [
-    # --- Fashion & Apparel ---
-    'Fast Fashion', 'T-Shirt', 'Jeans', 'Dress', 'Suit', 'Jacket', 'Sweater', 'Hoodie', 'Shorts', 'Skirt',
-    'Blazer', 'Coat', 'Pants', 'Leggings', 'Activewear', 'Swimwear', 'Underwear', 'Socks', 'Shoes', 'Sneakers',
-    'Cotton Shirt', 'Linen Shirt', 'Bamboo Fabric Clothing', 'Hemp Clothing', 'Recycled Polyester Gear',
-    'Upcycled Jacket', 'Vegan Leather Jacket', 'Organic Cotton T-Shirt', 'Rental Dress', 'Rental Tuxedo',
-    'Handloom Saree', 'Khadi Kurta', 'Ethical Wool Sweater', 'Silk Scarf (Ahimsa Silk)',
-    
-    # --- Electronics & Tech ---
-    'Electronics', 'Smartphone', 'Laptop', 'Tablet', 'Desktop Computer', 'Monitor', 'Keyboard', 'Mouse',
-    'Headphones', 'Gaming Console', 'Smartwatch', 'Camera', 'TV', 'Speaker', 'Drone',
-    'Refurbished Smartphone', 'Refurbished Laptop', 'Second-Hand Tablet', 'Used Camera Lens', 'Used Gaming Console',
-    'E-Reader', 'Solar Charger', 'Rechargeable Batteries', 'Smart Thermostat', 'LED Smart Bulb',
-    'Energy Efficient AC', 'Repair Service (Phone)', 'Repair Service (Laptop)',
-
-    # --- Food & Groceries ---
-    'Local Groceries', 'Organic Vegetables', 'Organic Fruits', 'Meat', 'Dairy Products', 'Snacks',
-    'Restaurant Meal', 'Fast Food', 'Coffee', 'Dessert',
-    'Plant-Based Meat', 'Oat Milk', 'Almond Milk', 'Soy Milk', 'Loose Leaf Tea', 'Fair Trade Coffee',
-    'Bulk Grains (No Plastic)', 'Ugly Produce (Imperfect Veg)', 'Locally Sourced Honey', 'Home-Grown Herbs',
-    'Compostable Coffee Pods', 'Tap Water (Filtered)', 'Bottled Water',
-
-    # --- Home & Living ---
-    'Home Decor', 'Sofa', 'Chair', 'Table', 'Bed', 'Mattress', 'Kitchenware', 'Appliance',
-    'Vintage Furniture', 'Bamboo Furniture', 'Reclaimed Wood Table', 'Cast Iron Skillet (Lifetime)',
-    'Glass Food Containers', 'Beeswax Wraps', 'Silicone Stasher Bags', 'Compostable Plates',
-    'Biodegradable Trash Bags', 'Loofah Sponge', 'Bamboo Toothbrush', 'Safety Razor', 'Menstrual Cup',
-    'Solid Shampoo Bar', 'Refillable Soap', 'Solar Garden Lights', 'Rainwater Harvesting Kit',
-
-    # --- Transport & Travel ---
-    'Car Parts', 'Tires', 'Car Accessories',
-    'Bicycle', 'E-Bike', 'Electric Scooter', 'Public Transit Pass', 'Train Ticket', 'Flight Ticket',
-    'EV Charging Session', 'Carpool Contribution', 'Walking Shoes',
-
-    # --- Books, Media & Hobbies ---
-    'Books (New)', 'Books (Used)', 'E-book', 'Vinyl Record', 'Video Game',
-    'Library Membership', 'Digital Magazine Subscription', 'Audiobook', 'Digital Game Download',
-    'Yoga Mat (Cork)', 'Gym Equipment', 'Sports Gear', 'Camping Gear', 'Used Sports Gear',
-    'Musical Instrument (Used)', 'Art Supplies (Non-Toxic)',
-
-    # --- Specialized & Eco ---
-    'Leather Goods', 'Vegan Leather',
-    'Second-Hand Item', 'Thrifted Clothing', 'Used Electronics', 'Refurbished Tech',
-    'Office Supplies', 'Stationery', 'Recycled Paper Notebook', 'Refillable Pen',
-    'Gift Card', 'Subscription', 'Event Ticket', 'Digital Download', 'Carbon Offset Credit', 'Tree Planting Donation',
-    '500+ (Other)'
-]
-
-ALL_BRANDS = [
-    # Global Giants
-    'Zara', 'H&M', 'Nike', 'Adidas', 'Uniqlo', 'Gucci', 'Louis Vuitton', 'Patagonia', 'The North Face', 'Levi\'s',
-    'Apple', 'Samsung', 'Sony', 'Dell', 'HP', 'Lenovo', 'Asus', 'Microsoft', 'Google', 'Canon',
-    'IKEA', 'West Elm', 'Pottery Barn', 'Ashley Furniture', 'Wayfair',
-    'Sephora', 'L\'Oreal', 'Estee Lauder', 'Mac', 'Fenty Beauty', 'The Body Shop', 'Lush',
-    'Amazon', 'Barnes & Noble', 'Penguin Random House', 'Nintendo', 'PlayStation', 'Xbox',
-    'Toyota', 'Honda', 'Ford', 'Tesla', 'BMW', 'Tata Motors', 'Mahindra', 'Hyundai',
-    
-    # Fast Fashion & High Street
-    'SHEIN', 'Forever 21', 'Primark', 'Mango', 'Pull&Bear', 'Bershka', 'Stradivarius', 'Topshop', 'Fashion Nova',
-    'Urban Outfitters', 'ASOS', 'Boohoo', 'PrettyLittleThing', 'Missguided', 'Cotton On', 'Old Navy', 'GAP',
-    'C&A', 'New Look', 'River Island', 'Next', 'Reserved', 'Monki', 'Weekday', '& Other Stories', 'Oysho',
-    'Massimo Dutti', 'LC Waikiki', 'Defacto', 'Giordano', 'Baleno', 'Metersbonwe', 'UR (Urban Revivo)', 'Sinsay',
-    'Lindex', 'Gina Tricot', 'Cubus', 'Terranova', 'Calliope', 'Splash', 'Max Fashion', 'Westside', 'Pantaloons',
-    'Reliance Trends', 'Shoppers Stop', 'Avra', 'NA-KD', 'Revolve', 'FabIndia', 'Biba', 'W for Woman', 'Manyavar',
-    
-    # Food & Consumables
-    'Whole Foods', 'Trader Joe\'s', 'Nestle', 'Coca-Cola', 'Pepsi', 'Danone', 'Beyond Meat', 'Impossible Foods',
-    'Amul', 'Britannia', 'Haldiram\'s', 'ITC', 'Mother Dairy', 'Tata Consumer', 'Organic India', '24 Mantra',
-    
-    # Eco & Specialized
-    'Local Thrift Store', 'Goodwill', 'Salvation Army', 'Depop', 'Poshmark', 'Etsy', 'eBay', 'ThredUp', 'Vinted',
-    'Back Market', 'Gazelle', 'Cashify', 'OLX', 'Quikr',
-    'Local Farm', 'Farmers Market', 'Small Business', 'Handmade', 'Generic', 'Zero Waste Store',
-    'Bambooee', 'Who Gives A Crap', 'Stasher', 'Swell', 'Hydro Flask', 'Klean Kanteen',
-    'Mamaearth', 'Forest Essentials', 'Kama Ayurveda', 'Khadi Natural', 'Bare Necessities',
-    'Other'
-]
-
-# Simplified Multipliers for logic
-def get_product_multiplier(product_type: str) -> float:
-    base_multipliers = {
-        # High Impact
-        'Fast Fashion': 2.5, 'Jeans': 3.2, 'Coat': 4.2, 'Leather Goods': 3.5, 'Shoes': 3.0, 'Sneakers': 3.0,
-        'Electronics': 1.8, 'Smartphone': 2.5, 'Laptop': 3.0, 'Desktop Computer': 3.5, 'Gaming Console': 3.0, 'TV': 3.0,
-        'Meat': 1.5, 'Dairy Products': 0.6, 'Cheese': 1.0, 'Flight Ticket': 5.0, 'Car Parts': 2.0,
-        'Sofa': 4.0, 'Bed': 3.5, 'Appliance': 2.0, 'AC': 4.0,
-        
-        # Medium Impact
-        'Cotton Shirt': 1.5, 'T-Shirt': 1.5, 'Furniture': 1.5, 'Cosmetics': 1.5, 'Perfume': 1.5,
-        'Books (New)': 0.5, 'Paper': 0.5, 'Plastic Items': 2.0,
-
-        # Low Impact / Eco
-        'Local Groceries': 0.3, 'Organic Vegetables': 0.2, 'Bulk Grains': 0.2, 'Plant-Based Meat': 0.5,
-        'Bamboo Fabric': 0.8, 'Hemp Clothing': 0.6, 'Linen Shirt': 0.8, 'Organic Cotton': 0.8,
-        'Books (Used)': 0.05, 'E-book': 0.02, 'Audiobook': 0.02, 'Digital Download': 0.02,
-        'Bicycle': 5.0, 
-        'Used Electronics': 0.15, 'Refurbished Tech': 0.15, 'Refurbished Smartphone': 0.2,
-        'Second-Hand Item': 0.1, 'Thrifted Clothing': 0.08, 'Vintage Furniture': 0.1,
-        'Service': 0.0, 'Repair Service': 0.05, 'Rental Dress': 0.1,
-        'Solar Charger': 1.0, 'LED Bulb': 0.1
-    }
-    
-    if product_type in base_multipliers:
-        return base_multipliers[product_type]
-    elif 'Refurbished' in product_type or 'Used' in product_type or 'Second-Hand' in product_type or 'Thrift' in product_type:
-        return 0.1
-    elif 'Bamboo' in product_type or 'Hemp' in product_type or 'Organic' in product_type:
-        return 0.5
-    elif 'Rental' in product_type:
-        return 0.1
-    elif 'Leather' in product_type:
-        return 3.5
-    elif 'Plastic' in product_type:
-        return 2.0
-    else:
-        return 1.0
-
-ECO_FRIENDLY_CATEGORIES = [
-    'Second-Hand Item', 'Local Groceries', 'Books (Used)', 'Thrifted Clothing',
-    'Used Electronics', 'Vintage Furniture', 'Organic Vegetables', 'Organic Fruits',
-    'Refurbished Tech', 'Bicycle', 'Vegan Leather', 'Digital Download',
-    'Refurbished Smartphone', 'Refurbished Laptop', 'Bamboo Fabric Clothing', 'Hemp Clothing',
-    'Plant-Based Meat', 'Oat Milk', 'Reclaimed Wood Table', 'Compostable Plates',
-    'Solar Charger', 'Repair Service', 'Rental Dress', 'Library Membership', 'Public Transit Pass',
-    'Ugly Produce', 'Bulk Grains'
-]
-
-# ==================== BADGE SYSTEM ====================
-BADGES = {
-    'first_step': {'name': '🌱 First Step', 'desc': 'Logged your first purchase', 'icon': '🌱'},
-    'thrift_king': {'name': '👑 Thrift King', 'desc': 'Bought 3 second-hand items', 'icon': '👑'},
-    'low_carbon': {'name': '🍃 Low Carbon', 'desc': 'Logged an item with < 1kg CO₂', 'icon': '🍃'},
-    'big_saver': {'name': '💰 Big Saver', 'desc': 'Spent over ₹10,000 in one go', 'icon': '💰'},
-    'eco_warrior': {'name': '🛡️ Eco Warrior', 'desc': 'Maintained < 50kg CO₂ total', 'icon': '🛡️'},
-    'consistent': {'name': '📅 Consistent', 'desc': 'Logged 5 items total', 'icon': '📅'}
-}
+"""
+
+@st.cache_resource
+def theme_head() -> str:
+    css = THEME_CSS.read_text(encoding='utf-8')
+    streamlit_version = tuple(int(part) for part in re.findall(r'\d+', st.__version__)[:2])
+    if st.get_option('server.enableStaticServing') and streamlit_version >= STATIC_CSS_MIN_VERSION:
+        # Content hash in the URL, so an edited stylesheet is never served stale from the cache
+        version = hashlib.sha1(css.encode('utf-8')).hexdigest()[:12]
+        return f'<link rel="stylesheet" href="app/static/{THEME_CSS.name}?v={version}">'
+    return f'<style>\n{css}</style>'
+
+st.markdown(theme_head() + AMBIENT_LEAVES, unsafe_allow_html=True)
+
+# ==================== INSTRUMENTATION ====================
+# Per-rerun stage timings: shown in the ?debug=1 sidebar and appended to the files named by
+# SHOPIMPACT_SPANS_JSONL / SHOPIMPACT_SPANS_PROM. Otherwise every span is a shared no-op.
+DEBUG = bool(st.query_params.get('debug'))
+SPANS = SpanRecorder(enabled=DEBUG or sinks_configured())
+
+@st.cache_resource
+def get_span_totals() -> SpanTotals:
+    # Process-wide sums behind the Prometheus text file
+    return SpanTotals()
+
+def flush_spans() -> Dict:
+    return flush_span_sinks(
+        SPANS, get_span_totals(), user=current_user_id(), view=st.session_state.get('active_view')
+    )
+
+def rerun() -> None:
+    """st.rerun() stops the script, so this run's spans are flushed first and kept for the debug panel."""
+    if SPANS.enabled:
+        st.session_state.previous_spans = flush_spans()
+    st.rerun()
 
 # ==================== DATA MANAGEMENT ====================
-DATA_FILE = Path("shopimpact_data_v3.json")
+# Backend is chosen with SHOPIMPACT_STORAGE=json|sqlite (see shopimpact/storage.py).
+# Each user gets their own partition, selected with ?user=<id> in the URL.
+def current_user_id() -> str:
+    if 'user_id' not in st.session_state:
+        st.session_state.user_id = st.query_params.get('user') or DEFAULT_USER
+    return st.session_state.user_id
+
+@st.cache_resource(max_entries=1000)
+def open_user_storage(user_id: str) -> Storage:
+    # One store object per user and process, shared by that user's sessions
+    with SPANS.span('storage.open') as span:
+        storage = open_storage(user_id=user_id)
+        span.rows = storage.count()
+    return storage
+
+def get_storage() -> Storage:
+    return open_user_storage(current_user_id())
 
-def get_default_data() -> Dict:
-    return {
-        'purchases': [],
-        'user_profile': {
-            'name': 'Friend',
-            'monthlyBudget': 15000,
-            'co2Goal': 50,
-            'badges': []
-        }
-    }
+def save_data(data: Dict) -> None:
+    """Rewrites the whole history. Only used for resets; day-to-day changes are appended."""
+    try:
+        with SPANS.span('storage.save', rows=len(data['purchases'])):
+            get_storage().save(data)
+    except Exception as e:
+        st.error(f"Error saving data: {e}")
 
-@st.cache_data
-def load_data_cached() -> Dict:
-    if DATA_FILE.exists():
-        try:
-            with open(DATA_FILE, 'r') as f:
-                return json.load(f)
-        except Exception:
-            return get_default_data()
-    return get_default_data()
+def save_profile(profile: Dict) -> None:
+    try:
+        with SPANS.span('storage.save_profile'):
+            get_storage().save_profile(profile)
+    except Exception as e:
+        st.error(f"Error saving data: {e}")
 
-def save_data(data: Dict) -> None:
+def save_purchase(purchase: Dict) -> None:
     try:
-        with open(DATA_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
-        load_data_cached.clear()
+        with SPANS.span('storage.append_purchase', rows=1):
+            get_storage().append_purchase(purchase)
     except Exception as e:
         st.error(f"Error saving data: {e}")
 
+def save_purchase_edit(purchase_id: int, purchase: Dict) -> bool:
+    try:
+        with SPANS.span('storage.update_purchase', rows=1):
+            get_storage().update_purchase(purchase_id, purchase)
+        return True
+    except KeyError:
+        st.warning("That purchase was already deleted.")
+    except Exception as e:
+        st.error(f"Error saving data: {e}")
+    return False
+
+def remove_purchase(purchase_id: int) -> bool:
+    try:
+        with SPANS.span('storage.delete_purchase', rows=1):
+            get_storage().delete_purchase(purchase_id)
+        return True
+    except KeyError:
+        st.warning("That purchase was already deleted.")
+    except Exception as e:
+        st.error(f"Error saving data: {e}")
+    return False
+
 # ==================== LOGIC FUNCTIONS ====================
 
-def suggest_eco_option(selected_product: str) -> Optional[str]:
-    suggestions = {
-        'T-Shirt': "Consider **Organic Cotton**, **Hemp**, or **Thrifted** T-Shirts. They use up to 90% less water!",
-        'Jeans': "Did you know **Vintage Jeans** or **Hemp Denim** are way more durable and eco-friendly?",
-        'Dress': "How about a **Rental Dress** for that occasion? Or check a local **Thrift Store**.",
-        'Smartphone': "A **Refurbished Smartphone** saves ~50kg of CO₂ compared to a new one!",
-        'Laptop': "Check out **Refurbished Laptops** or upgrade your RAM instead of buying new.",
-        'Meat': "Try **Plant-Based Meat** or have a 'Meatless Monday' to slash your carbon footprint.",
-        'Dairy Products': "**Oat Milk** or **Soy Milk** have a much lower carbon footprint than dairy.",
-        'Furniture': "Look for **Vintage**, **Second-Hand**, or **FSC-Certified Wood** furniture.",
-        'Books (New)': "Try a **Library Membership**, **Used Books**, or **E-books** to save paper.",
-        'Bottled Water': "Switch to a **Reusable Bottle** and filtered tap water. Plastic is forever!",
-        'Fast Fashion': "Slow down! Try **Thrifted** or **High-Quality Ethical Brands** that last longer.",
-        'Toothbrush': "Switch to a **Bamboo Toothbrush** - plastic ones take 400 years to decompose.",
-        'Shampoo': "Try a **Solid Shampoo Bar** to eliminate plastic bottle waste.",
-        'Coffee': "Use a **Reusable Cup**. Disposable cups are lined with plastic and rarely recycled.",
-        'Gift Wrap': "Use **Old Newspapers** or **Fabric Wraps** (Furoshiki) instead of glossy paper."
-    }
-    
-    if selected_product in suggestions:
-        return suggestions[selected_product]
-    
-    if 'Meat' in selected_product:
-        return suggestions['Meat']
-    if 'Phone' in selected_product or 'Mobile' in selected_product:
-        return suggestions['Smartphone']
-    if 'Laptop' in selected_product or 'Computer' in selected_product:
-        return suggestions['Laptop']
-    if 'Clothing' in selected_product or 'Wear' in selected_product or 'Jacket' in selected_product:
-        return suggestions['Fast Fashion']
-    
-    return None
+@st.cache_resource
+def get_sku_index() -> SkuIndex:
+    # Built once per process from SHOPIMPACT_SKU_CATALOG (or just the categories) and shared by all sessions
+    with SPANS.span('search.build_index') as span:
+        index = load_index()
+        span.rows = len(index)
+    return index
+
+def search_products(query: str) -> List[Match]:
+    with SPANS.span('search.query') as span:
+        matches = get_sku_index().search(query)
+        span.rows = len(matches)
+    return matches
+
+def format_match(match: Match) -> str:
+    return match.name if match.name == match.category else f"{match.name} → {match.category}"
+
+@st.cache_resource
+def get_recommender() -> Recommender:
+    # Alternatives are ranked once per process; form interactions only do a dict lookup
+    return Recommender()
+
+def suggest_eco_option(selected_product: str, price: float) -> Optional[str]:
+    rec = get_recommender().recommend(selected_product)
+    lines = [rec.tip] if rec.tip else []
+    if rec.alternatives and price > 0:
+        picks = " · ".join(
+            f"<b>{alt.product_type}</b> (−{alt.co2_saved(price):.1f} kg CO₂)" for alt in rec.alternatives
+        )
+        lines.append(f"Greener picks at ₹{price:,.0f}: {picks}")
+    return "<br>".join(lines) or None
 
 def trigger_animation(is_eco: bool):
     """Triggers a 1-second burst of leaves."""
@@ -495,41 +208,53 @@ def trigger_animation(is_eco: bool):
     
     st.markdown(leaves_html, unsafe_allow_html=True)
 
-def check_badges():
-    purchases = st.session_state.purchases
-    my_badges = st.session_state.user_profile['badges']
-    new_badge = None
+BADGE_ENGINE = BadgeEngine()
 
-    if len(purchases) >= 1 and 'first_step' not in my_badges:
-        new_badge = 'first_step'
-    
-    thrift_count = sum(1 for p in purchases if p['type'] in ECO_FRIENDLY_CATEGORIES)
-    if thrift_count >= 3 and 'thrift_king' not in my_badges:
-        new_badge = 'thrift_king'
-        
-    if purchases and purchases[-1]['co2_impact'] < 1.0 and 'low_carbon' not in my_badges:
-        new_badge = 'low_carbon'
-        
-    if purchases and purchases[-1]['price'] > 10000 and 'big_saver' not in my_badges:
-        new_badge = 'big_saver'
-
-    if len(purchases) >= 5 and 'consistent' not in my_badges:
-        new_badge = 'consistent'
-
-    if new_badge:
-        st.session_state.user_profile['badges'].append(new_badge)
-        badge_info = BADGES[new_badge]
+def announce_badges(new_badges: List[str]):
+    for badge_key in new_badges:
+        badge_info = BADGES[badge_key]
         st.toast(f"🏆 BADGE UNLOCKED: {badge_info['name']}", icon=badge_info['icon'])
         # REMOVED BALLOONS HERE as per request
-        save_data({
-            'purchases': st.session_state.purchases,
-            'user_profile': st.session_state.user_profile
-        })
+
+def check_badges(purchase: Dict):
+    """Runs every badge rule against the new purchase; all unlocked badges are awarded together."""
+    profile = st.session_state.user_profile
+    progress = profile.setdefault('badge_progress', {})
+    with SPANS.span('badges.evaluate'):
+        new_badges = BADGE_ENGINE.evaluate(progress, purchase, profile['badges'], goals=profile)
+    profile['badges'].extend(new_badges)
+    announce_badges(new_badges)
+    # Rule progress changed even if nothing unlocked
+    save_profile(profile)
+
+def retract_badges(purchase: Dict, replacement: Optional[Dict] = None):
+    """Takes a deleted purchase (or an edited one's old values) back out of the badge rules.
+
+    An edit then counts the ``replacement`` as a new purchase. Badges already earned are kept.
+    """
+    profile = st.session_state.user_profile
+    with SPANS.span('badges.retract'):
+        BADGE_ENGINE.retract(profile.setdefault('badge_progress', {}), purchase)
+    if replacement is not None:
+        check_badges(replacement)
+    else:
+        save_profile(profile)
+
+def current_month_progress() -> MonthProgress:
+    # One rollup bucket read (month-to-date counters kept at write time), not a scan of the history
+    today = datetime.now().date()
+    with SPANS.span('goals.month_totals'):
+        return month_progress(get_storage().month_totals(today), st.session_state.user_profile, today)
+
+def format_goal_value(metric: str, value: float) -> str:
+    return f"₹{value:,.0f}" if metric == 'spend' else f"{value:.1f} kg"
+
+def announce_goal_alerts(before: MonthProgress, after: MonthProgress):
+    for alert in crossed_alerts(before, after):
+        st.toast(alert.message, icon="🚨" if alert.level is not None and alert.level >= 1.0 else "⚠️")
 
 def add_purchase(product_type: str, brand: str, price: float):
-    co2_impact = price * get_product_multiplier(product_type) / 100
-    if product_type in ECO_FRIENDLY_CATEGORIES:
-        co2_impact *= 0.5
+    co2_impact = estimate_co2(product_type, price)
     
     purchase = {
         'date': datetime.now().strftime('%Y-%m-%d %H:%M'),
@@ -538,21 +263,195 @@ def add_purchase(product_type: str, brand: str, price: float):
         'price': float(price),
         'co2_impact': float(co2_impact)
     }
-    st.session_state.purchases.append(purchase)
+    before = current_month_progress()
+    save_purchase(purchase)
+    announce_goal_alerts(before, current_month_progress())
+    check_badges(purchase)
+
+# ==================== ANALYTICS ====================
+@st.cache_resource
+def get_analytics_cache() -> VersionedCache:
+    # Shared across sessions; entries are keyed by user and data version
+    return VersionedCache()
+
+def build_analytics(storage: Storage) -> Dict:
+    """Aggregations and Plotly figures for the Analytics tab (cached per data version)."""
+    # Plotly is imported on first chart build, so sessions that never open Analytics don't pay for it
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    # 1. SIMPLE BAR CHART
+    with SPANS.span('analytics.category_totals') as span:
+        category_group = storage.category_totals()
+        span.rows = len(category_group)
+    category_group = category_group.sort_values(by='co2_impact', ascending=False).head(5)
+    
+    fig_bar = px.bar(
+        category_group, 
+        x='co2_impact', 
+        y='type', 
+        orientation='h',
+        text='co2_impact',
+        title="🏆 Top 5 Categories Adding to Your Footprint",
+        labels={'co2_impact': 'CO₂ (kg)', 'type': 'Category'},
+        color='co2_impact',
+        color_continuous_scale='Reds'
+    )
     
-    save_data({
-        'purchases': st.session_state.purchases,
-        'user_profile': st.session_state.user_profile
-    })
-    check_badges()
+    # FORCE BLACK TEXT EVERYWHERE
+    fig_bar.update_traces(texttemplate='%{text:.1f} kg', textposition='outside', textfont_color='black')
+    fig_bar.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)', 
+        plot_bgcolor='rgba(0,0,0,0)', 
+        font=dict(color='black'),        # Main Font Black
+        xaxis=dict(showticklabels=False, title_font=dict(color='black')), # Hide x numbers, keep title black
+        yaxis=dict(tickfont=dict(color='black'), title_font=dict(color='black')), # Force Y-axis labels black
+        title_font=dict(color='black')
+    )
+
+    # 2. ECO VS. NON-ECO
+    # Split data
+    with SPANS.span('analytics.split_totals'):
+        split = storage.split_totals(ECO_FRIENDLY_CATEGORIES)
+    
+    # Stats
+    eco_count = split[True]['count']
+    non_eco_count = split[False]['count']
+    eco_spend = split[True]['price']
+    non_eco_spend = split[False]['price']
+    eco_co2 = split[True]['co2_impact']
+    non_eco_co2 = split[False]['co2_impact']
+
+    comp_data = {
+        'Type': ['Money Spent (₹)', 'Carbon Emitted (kg)'],
+        'Eco-Friendly': [eco_spend, eco_co2],
+        'Regular': [non_eco_spend, non_eco_co2]
+    }
+    
+    fig_comp = go.Figure(data=[
+        go.Bar(name='Eco-Friendly', x=comp_data['Type'], y=comp_data['Eco-Friendly'], marker_color='#66bb6a'),
+        go.Bar(name='Regular', x=comp_data['Type'], y=comp_data['Regular'], marker_color='#ef5350')
+    ])
+    
+    # FORCE BLACK TEXT EVERYWHERE
+    fig_comp.update_layout(
+        barmode='group',
+        title="Spending vs. Impact Comparison",
+        paper_bgcolor='rgba(0,0,0,0)', 
+        plot_bgcolor='rgba(255,255,255,0.5)',
+        font=dict(color='black'), # Global black font
+        legend=dict(orientation="h", y=1.02, x=1, font=dict(color='black')), # Legend text black
+        xaxis=dict(tickfont=dict(color='black')), # X-axis text black
+        yaxis=dict(tickfont=dict(color='black')), # Y-axis text black
+        title_font=dict(color='black')
+    )
+
+    return {
+        'fig_bar': fig_bar, 'fig_comp': fig_comp,
+        'eco_count': eco_count, 'non_eco_count': non_eco_count,
+        'eco_co2': eco_co2, 'non_eco_co2': non_eco_co2,
+    }
+
+TREND_GRANULARITIES = {'Day': 'day', 'Week': 'week', 'Month': 'month'}
+
+def build_trend_figure(storage: Storage, granularity: str, start=None, end=None) -> Dict:
+    """Carbon trend from the stored day/week/month rollups (cached per data version and range)."""
+    with SPANS.span(f'trend.rollup_{granularity}') as span:
+        trend = storage.rollup(granularity, start, end)
+        span.rows = total_points = len(trend)
+    # Bounded payload whatever the history length; min/max bucketing keeps every peak
+    with SPANS.span('trend.downsample') as span:
+        trend = downsample(trend, 'bucket', 'co2_impact', point_budget(), method='minmax')
+        span.rows = len(trend)
+    label = {'day': 'Daily', 'week': 'Weekly', 'month': 'Monthly'}[granularity]
+    import plotly.express as px
+
+    fig_trend = px.area(
+        trend,
+        x='bucket',
+        y='co2_impact',
+        title=f"{label} CO₂ Emissions (Lower is Better)",
+        labels={'co2_impact': 'Impact (kg)', 'bucket': 'Date'},
+        hover_data={'price': ':.2f', 'count': True},
+        color_discrete_sequence=['#2e7d32']
+    )
+
+    # FORCE BLACK TEXT EVERYWHERE
+    fig_trend.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)', 
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='black'),
+        xaxis=dict(tickfont=dict(color='black'), title_font=dict(color='black')),
+        yaxis=dict(tickfont=dict(color='black'), title_font=dict(color='black'), gridcolor='rgba(0,0,0,0.1)'),
+        title_font=dict(color='black')
+    )
+    return {'fig': fig_trend, 'points': len(trend), 'total_points': total_points}
+
+# ==================== HTML BLOCKS ====================
+# Lists are rendered as one st.markdown each, i.e. one delta per rerun however many rows they hold.
+TOLL_CARD_HTML = (
+    '<div class="toll-card" style="border-color: {border};">'
+    '<h3 style="color: {color} !important;">{icon} {value}</h3><p>{label}</p></div>'
+)
+RECENT_ROW_HTML = (
+    '<div class="recent-row{eco}"><span class="icon">{icon}</span> <strong>{type}</strong> ({brand}) '
+    '<span class="amount">₹{price:,.0f} | {co2:.1f}kg CO₂</span></div>'
+)
+RECENT_ACTIVITY_SIZES = [5, 10, 25, 50]
+# History view: label -> (sort key, descending)
+HISTORY_SORTS = {
+    "Newest first": ('date', True), "Oldest first": ('date', False),
+    "Price: high to low": ('price', True), "Price: low to high": ('price', False),
+    "CO₂: high to low": ('co2_impact', True), "CO₂: low to high": ('co2_impact', False),
+}
+HISTORY_ECO_FILTERS = {"All": None, "Eco only": True, "Non-eco only": False}
+HISTORY_PAGE_SIZES = [25, 50, 100]
+BADGE_CARD_HTML = (
+    '<div class="badge-card"><div class="icon">{icon}</div>'
+    '<div class="name">{name}</div><div class="desc">{desc}</div></div>'
+)
+
+def hidden_toll_html(water: float, trees: float) -> str:
+    return '<div class="toll-cards">' + TOLL_CARD_HTML.format(
+        border='#90caf9', color='#1565c0', icon='🚰', value=f"{water:,.0f} L", label='Water Wasted'
+    ) + TOLL_CARD_HTML.format(
+        border='#a1887f', color='#5d4037', icon='🪓', value=f"{trees:.2f}", label='Trees Cut Down'
+    ) + '</div>'
+
+def recent_activity_html(rows: List[Dict]) -> str:
+    parts = []
+    for row in rows:
+        row_eco = is_eco(row['type'])
+        parts.append(RECENT_ROW_HTML.format(
+            eco=' eco' if row_eco else '', icon="🍃" if row_eco else "🛍️",
+            type=html.escape(str(row['type'])), brand=html.escape(str(row['brand'])),
+            price=row['price'], co2=row['co2_impact'],
+        ))
+    return ''.join(parts)
+
+def badge_grid_html(badge_keys: List[str]) -> str:
+    return '<div class="badge-grid">' + ''.join(
+        BADGE_CARD_HTML.format(icon=BADGES[k]['icon'], name=BADGES[k]['name'], desc=BADGES[k]['desc'])
+        for k in badge_keys
+    ) + '</div>'
 
 # ==================== INITIALIZATION ====================
 if 'initialized' not in st.session_state:
-    data = load_data_cached()
-    st.session_state.purchases = data.get('purchases', [])
-    st.session_state.user_profile = data.get('user_profile', get_default_data()['user_profile'])
+    with SPANS.span('storage.load_profile'):
+        st.session_state.user_profile = get_storage().load_profile()
     if 'badges' not in st.session_state.user_profile:
         st.session_state.user_profile['badges'] = []
+    if 'badge_progress' not in st.session_state.user_profile:
+        # Profiles from before the badge engine: replay the history once
+        with SPANS.span('badges.backfill') as span:
+            history = get_storage().frame()
+            span.rows = len(history)
+            progress, new_badges = BADGE_ENGINE.backfill(
+                history, st.session_state.user_profile['badges'], goals=st.session_state.user_profile
+            )
+        st.session_state.user_profile['badge_progress'] = progress
+        st.session_state.user_profile['badges'].extend(new_badges)
+        save_profile(st.session_state.user_profile)
     st.session_state.initialized = True
 
 # ==================== MAIN UI ====================
@@ -561,8 +460,7 @@ if 'initialized' not in st.session_state:
 col_h1, col_h2 = st.columns([2.5, 1.2]) # Adjusted ratio to give the badge more space
 
 with col_h1:
-    st.markdown("# 🍃 ShopImpact")
-    st.markdown("### *Your Conscious Shopping Companion*")
+    st.markdown("# 🍃 ShopImpact\n### *Your Conscious Shopping Companion*")
 
 with col_h2:
     if st.session_state.user_profile['badges']:
@@ -587,30 +485,53 @@ with col_h2:
         """, unsafe_allow_html=True)
 
 st.markdown("---")
-# TABS
-tab_dash, tab_analytics, tab_profile = st.tabs(["🛍️ Dashboard", "📊 Analytics", "🏆 Profile & Badges"])
+# VIEWS
+# A selector instead of st.tabs: Streamlit runs every tab body on each rerun,
+# while only the selected view's body runs here.
+VIEW_DASHBOARD, VIEW_HISTORY, VIEW_ANALYTICS, VIEW_PROFILE = (
+    "🛍️ Dashboard", "📜 History", "📊 Analytics", "🏆 Profile & Badges"
+)
+active_view = st.radio(
+    "View", [VIEW_DASHBOARD, VIEW_HISTORY, VIEW_ANALYTICS, VIEW_PROFILE],
+    horizontal=True, label_visibility="collapsed", key="active_view"
+)
 
 # --- DASHBOARD TAB ---
-with tab_dash:
+if active_view == VIEW_DASHBOARD:
     col_input, col_stats = st.columns([1, 1.5], gap="large")
     
     with col_input:
         st.markdown("#### 📝 New Purchase")
         with st.container():
             st.markdown('<div class="stCard">', unsafe_allow_html=True)
+            # Free text is resolved against the catalog index; the purchase is logged under the matched category
+            product_query = st.text_input(
+                "🔎 Search products", key="product_query", placeholder="e.g. refurbished laptop, oat milk"
+            )
+            matches = search_products(product_query) if product_query.strip() else []
+            if matches:
+                match = st.selectbox("📦 What did you buy?", matches, format_func=format_match)
+                product_type = match.category
+            else:
+                if product_query.strip():
+                    st.caption("No catalog match, pick a category instead.")
+                product_type = st.selectbox("📦 What did you buy?", PRODUCT_TYPES)
+
+            # --- DYNAMIC ECO SUGGESTION ---
+            # Filled in below the slider, since the savings depend on the price. The product
+            # and price stay outside the form so the suggestion follows them as they change.
+            suggestion_slot = st.empty()
+
+            price = st.slider("💰 Price (₹)", min_value=0, max_value=50000, value=500, step=100)
+
+            suggestion = suggest_eco_option(product_type, price)
+            if suggestion:
+                suggestion_slot.markdown(f'<div class="eco-suggestion">💡 {suggestion}</div>', unsafe_allow_html=True)
+
             # Ensure unique key for form
             with st.form("add_item_form_v2", clear_on_submit=False):
-                product_type = st.selectbox("📦 What did you buy?", PRODUCT_TYPES)
-                
-                # --- DYNAMIC ECO SUGGESTION ---
-                suggestion = suggest_eco_option(product_type)
-                if suggestion:
-                    st.markdown(f'<div class="eco-suggestion">💡 {suggestion}</div>', unsafe_allow_html=True)
-                
                 brand = st.selectbox("🏷️ Brand", ALL_BRANDS)
                 
-                price = st.slider("💰 Price (₹)", min_value=0, max_value=50000, value=500, step=100)
-                
                 # Note: Button CSS is handled globally now
                 submitted = st.form_submit_button("Add to Tracker", type="primary", use_container_width=True)
                 
@@ -620,9 +541,9 @@ with tab_dash:
                         st.success(f"Added {product_type}!")
                         
                         # TRIGGER ANIMATION LOGIC
-                        is_eco_purchase = product_type in ECO_FRIENDLY_CATEGORIES
+                        is_eco_purchase = is_eco(product_type)
                         trigger_animation(is_eco_purchase)
-                        st.rerun() # Rerun to update the new stats immediately
+                        rerun() # Rerun to update the new stats immediately
                         
                     else:
                         st.warning("Please set a price greater than 0.")
@@ -642,81 +563,57 @@ with tab_dash:
     with col_stats:
         st.markdown("#### 🚀 Live Impact Overview")
         
-        if st.session_state.purchases:
-            df = pd.DataFrame(st.session_state.purchases)
-            total_spend = df['price'].sum()
-            total_co2 = df['co2_impact'].sum()
+        storage = get_storage()
+        # Running totals kept by the storage layer; O(1) regardless of history size
+        with SPANS.span('dashboard.aggregates') as span:
+            agg = storage.aggregates()
+            span.rows = agg.count
+        if agg.count:
             
             # 1. Standard Metrics
             m1, m2, m3 = st.columns(3)
             with m1:
-                st.metric("Total Spent", f"₹{total_spend:,.0f}", delta=f"{len(df)} items")
+                st.metric("Total Spent", f"₹{agg.spend:,.0f}", delta=f"{agg.count} items")
             with m2:
-                st.metric("Total CO₂", f"{total_co2:.1f} kg", delta_color="inverse", delta="Low is good!")
+                st.metric("Total CO₂", f"{agg.co2:.1f} kg", delta_color="inverse", delta="Low is good!")
             with m3:
-                eco_items = df[df['type'].isin(ECO_FRIENDLY_CATEGORIES)].shape[0]
-                rate = (eco_items/len(df)*100) if len(df) > 0 else 0
-                st.metric("Eco Choices", f"{eco_items}", f"{rate:.0f}% Rate")
+                st.metric("Eco Choices", f"{agg.eco_count}", f"{agg.eco_rate:.0f}% Rate")
+
+            # --- MONTHLY BUDGET & CO₂ GOAL ---
+            month = current_month_progress()
+            st.markdown(f"#### 🎯 This Month · {month.count} items")
+            for status, label in ((month.spend, "💰 Budget"), (month.co2, "🌫️ CO₂ Goal")):
+                used, limit = format_goal_value(status.metric, status.used), format_goal_value(status.metric, status.limit)
+                if status.limit <= 0:
+                    st.caption(f"{label}: {used} so far (no limit set, see Profile)")
+                    continue
+                st.progress(min(status.ratio, 1.0), text=f"{label}: {used} of {limit} ({status.ratio:.0%})")
+                projected = format_goal_value(status.metric, status.projected)
+                if status.projected_overrun > 0:
+                    overrun = format_goal_value(status.metric, status.projected_overrun)
+                    st.caption(f"📈 On pace for {projected} by month-end: {overrun} over.")
+                else:
+                    st.caption(f"📈 On pace for {projected} by month-end.")
 
             # --- NEW: HIDDEN TOLL SECTION (TREES & WATER) ---
-            st.markdown("#### 🌍 The Hidden Toll")
-            
             # Logic: Estimate Water (Liters) and Trees based on category keywords
-            water_wasted = 0
-            trees_cut = 0
-            
-            for _, row in df.iterrows():
-                ptype = row['type']
-                impact = row['co2_impact']
-                
-                # Water Logic: Textiles & Meat use massive amounts of water
-                if any(x in ptype for x in ['Shirt', 'Jeans', 'Cotton', 'Meat', 'Dairy', 'Fashion', 'Dress']):
-                    water_wasted += impact * 150 # High water multiplier
-                else:
-                    water_wasted += impact * 20 # Base water usage for manufacturing
-
-                # Tree Logic: Paper, Furniture, and Packaging affect trees
-                if any(x in ptype for x in ['Paper', 'Book', 'Wood', 'Furniture', 'Table', 'Chair', 'Sofa']):
-                    trees_cut += impact * 0.05 
-                else:
-                    trees_cut += impact * 0.002 # Minimal packaging impact
+            # (textiles & meat use massive amounts of water; paper & furniture cost trees).
+            # Accumulated per purchase in LedgerAggregates.
+            water_wasted = agg.water
+            trees_cut = agg.trees
 
-            t1, t2 = st.columns(2)
-            with t1:
-                st.markdown(
-                    f"""
-                    <div style="background: rgba(255, 255, 255, 0.6); padding: 15px; border-radius: 15px; border: 1px solid #90caf9;">
-                        <h3 style="margin:0; color: #1565c0 !important;">🚰 {water_wasted:,.0f} L</h3>
-                        <p style="margin:0; font-size: 0.9rem; color: #555 !important;">Water Wasted</p>
-                    </div>
-                    """, unsafe_allow_html=True
-                )
-            with t2:
-                 st.markdown(
-                    f"""
-                    <div style="background: rgba(255, 255, 255, 0.6); padding: 15px; border-radius: 15px; border: 1px solid #a1887f;">
-                        <h3 style="margin:0; color: #5d4037 !important;">🪓 {trees_cut:.2f}</h3>
-                        <p style="margin:0; font-size: 0.9rem; color: #555 !important;">Trees Cut Down</p>
-                    </div>
-                    """, unsafe_allow_html=True
-                )
+            st.markdown("#### 🌍 The Hidden Toll\n" + hidden_toll_html(water_wasted, trees_cut), unsafe_allow_html=True)
             
             # --- RECENT ACTIVITY ---
             st.markdown("#### 🕰️ Recent Activity")
-            recent = df.tail(5).iloc[::-1]
-            for _, row in recent.iterrows():
-                icon = "🍃" if row['type'] in ECO_FRIENDLY_CATEGORIES else "🛍️"
-                color = "#2e7d32" if row['type'] in ECO_FRIENDLY_CATEGORIES else "#4a5568"
-                st.markdown(
-                    f"""
-                    <div style="padding: 10px; background: rgba(255,255,255,0.7); border-radius: 10px; margin-bottom: 8px; border-left: 4px solid {color}; color: black;">
-                        <span style="font-size: 1.2rem;">{icon}</span> 
-                        <strong>{row['type']}</strong> ({row['brand']}) 
-                        <span style="float: right; color: #000; font-weight: bold;">₹{row['price']:,.0f} | {row['co2_impact']:.1f}kg CO₂</span>
-                    </div>
-                    """, 
-                    unsafe_allow_html=True
-                )
+            # Any length is still a single block; an unselected pill falls back to the default
+            recent_n = st.pills(
+                "Show", RECENT_ACTIVITY_SIZES, default=RECENT_ACTIVITY_SIZES[0], key="recent_n"
+            ) or RECENT_ACTIVITY_SIZES[0]
+            with SPANS.span('dashboard.recent') as span:
+                recent = storage.recent(recent_n)
+                span.rows = len(recent)
+            st.markdown(recent_activity_html(recent), unsafe_allow_html=True)
         else:
             st.markdown(
                 """
@@ -727,11 +624,137 @@ with tab_dash:
                 """, 
                 unsafe_allow_html=True
             )
+# --- HISTORY TAB ---
+if active_view == VIEW_HISTORY:
+    st.markdown("#### 📜 Purchase History")
+    with st.container():
+        f1, f2, f3, f4 = st.columns([1.4, 1, 1, 1])
+        with f1:
+            hist_range = st.date_input("Dates", value=(), key="history_dates")
+        with f2:
+            hist_eco = st.selectbox("Eco", list(HISTORY_ECO_FILTERS), key="history_eco")
+        with f3:
+            hist_sort = st.selectbox("Sort", list(HISTORY_SORTS), key="history_sort")
+        with f4:
+            hist_size = st.selectbox("Per page", HISTORY_PAGE_SIZES, key="history_size")
+        f5, f6 = st.columns(2)
+        with f5:
+            hist_types = st.multiselect("Categories (empty = all)", PRODUCT_TYPES, key="history_types")
+        with f6:
+            hist_brands = st.multiselect("Brands (empty = all)", ALL_BRANDS, key="history_brands")
+
+    # A range picker yields (), (start,) while picking, then (start, end)
+    hist_start = hist_range[0] if len(hist_range) > 0 else None
+    hist_end = hist_range[1] if len(hist_range) > 1 else hist_start
+    sort_key, descending = HISTORY_SORTS[hist_sort]
+    query = HistoryQuery(
+        start=hist_start, end=hist_end, types=tuple(hist_types), brands=tuple(hist_brands),
+        eco=HISTORY_ECO_FILTERS[hist_eco], sort=sort_key, descending=descending
+    )
+    # Changing a filter starts over from the first page
+    if st.session_state.get('history_query') != (query, hist_size):
+        st.session_state.history_query = (query, hist_size)
+        st.session_state.history_page = 0
+        st.session_state.history_rev = st.session_state.get('history_rev', 0) + 1
+
+    page_no = st.session_state.history_page
+    with SPANS.span('history.page') as span:
+        page = get_storage().history(query, page_no * hist_size, hist_size)
+        span.rows = len(page.rows)
+    n_pages = max(1, -(-page.total // hist_size))
+    if page_no >= n_pages:
+        # Rows were deleted out from under the current page
+        st.session_state.history_page = page_no = n_pages - 1
+        page = get_storage().history(query, page_no * hist_size, hist_size)
+
+    if page.total:
+        table = page.rows.set_index('id').rename(columns={
+            'date': 'Date', 'type': 'Category', 'brand': 'Brand', 'price': 'Price (₹)', 'co2_impact': 'CO₂ (kg)'
+        })
+        event = st.dataframe(
+            table, use_container_width=True, on_select="rerun", selection_mode="single-row",
+            # A new key per page and per change clears the selection, which is a row position
+            key=f"history_table_{st.session_state.history_rev}_{page_no}"
+        )
+        nav_prev, nav_info, nav_next = st.columns([1, 2, 1])
+        with nav_prev:
+            if st.button("← Previous", disabled=page_no == 0, use_container_width=True):
+                st.session_state.history_page -= 1
+                rerun()
+        with nav_info:
+            first = page_no * hist_size + 1
+            st.caption(f"{first:,}–{first + len(page.rows) - 1:,} of {page.total:,} purchases · page {page_no + 1:,} of {n_pages:,}")
+        with nav_next:
+            if st.button("Next →", disabled=page_no + 1 >= n_pages, use_container_width=True):
+                st.session_state.history_page += 1
+                rerun()
+
+        # --- EDIT / DELETE THE SELECTED ROW ---
+        selected = event.selection.rows
+        if selected:
+            row = page.rows.iloc[selected[0]]
+            purchase_id = int(row['id'])
+            current = {
+                'date': row['date'], 'type': row['type'], 'brand': row['brand'],
+                'price': float(row['price']), 'co2_impact': float(row['co2_impact']),
+            }
+            # Free-text categories and brands (e.g. from an import) stay selectable as they are
+            type_options = PRODUCT_TYPES if row['type'] in PRODUCT_TYPES else [row['type']] + PRODUCT_TYPES
+            brand_options = ALL_BRANDS if row['brand'] in ALL_BRANDS else [row['brand']] + ALL_BRANDS
+            st.markdown(f"#### ✏️ Edit: {html.escape(row['type'])} ({html.escape(row['brand'])})")
+            with st.form(f"edit_purchase_{purchase_id}"):
+                e1, e2 = st.columns(2)
+                with e1:
+                    edit_type = st.selectbox("📦 Category", type_options, index=type_options.index(row['type']))
+                    edit_price = st.number_input("💰 Price (₹)", min_value=0.0, value=float(row['price']), step=100.0)
+                with e2:
+                    edit_brand = st.selectbox("🏷️ Brand", brand_options, index=brand_options.index(row['brand']))
+                    logged_at = datetime.strptime(row['date'], '%Y-%m-%d %H:%M')
+                    edit_date = st.date_input("📅 Date", value=logged_at.date())
+                save_col, delete_col = st.columns(2)
+                with save_col:
+                    save_clicked = st.form_submit_button("Save Changes", type="primary", use_container_width=True)
+                with delete_col:
+                    delete_clicked = st.form_submit_button("🗑️ Delete", use_container_width=True)
+
+            if save_clicked:
+                if edit_price > 0:
+                    # CO₂ follows the edited category and price; badge progress follows the edit
+                    edited = {
+                        'date': datetime.combine(edit_date, logged_at.time()).strftime('%Y-%m-%d %H:%M'),
+                        'type': edit_type,
+                        'brand': edit_brand,
+                        'price': float(edit_price),
+                        'co2_impact': float(estimate_co2(edit_type, edit_price)),
+                    }
+                    if save_purchase_edit(purchase_id, edited):
+                        retract_badges(current, replacement=edited)
+                        st.session_state.history_rev += 1
+                        st.toast(f"Updated {edit_type}", icon="✏️")
+                        rerun()
+                else:
+                    st.warning("Please set a price greater than 0.")
+            if delete_clicked and remove_purchase(purchase_id):
+                retract_badges(current)
+                st.session_state.history_rev += 1
+                st.toast(f"Deleted {row['type']}", icon="🗑️")
+                rerun()
+        else:
+            st.caption("Select a row to edit or delete it.")
+    elif query.filtered:
+        st.info("No purchases match these filters.")
+    else:
+        st.info("📜 Log your first purchase in the Dashboard to start your history!")
+
 # --- ANALYTICS TAB (FIXED VISIBILITY) ---
-with tab_analytics:
-    if st.session_state.purchases:
-        df = pd.DataFrame(st.session_state.purchases)
-        df['date_dt'] = pd.to_datetime(df['date'])
+if active_view == VIEW_ANALYTICS:
+    storage = get_storage()
+    if storage.count():
+        # Recomputed only when this user's purchases change, not on every widget interaction
+        with SPANS.span('analytics.build'):
+            analytics = get_analytics_cache().get_or_compute(
+                (current_user_id(), 'analytics'), storage.version(), lambda: build_analytics(storage)
+            )
         
         # Create Sub-Tabs
         sub_trends, sub_compare = st.tabs(["📈 Easy Insights", "⚖️ Comparative Analysis"])
@@ -741,73 +764,35 @@ with tab_analytics:
             st.markdown("### 🔍 Where is my impact coming from?")
             
             # 1. SIMPLE BAR CHART
-            category_group = df.groupby('type')[['co2_impact', 'price']].sum().reset_index()
-            category_group = category_group.sort_values(by='co2_impact', ascending=False).head(5)
-            
-            fig_bar = px.bar(
-                category_group, 
-                x='co2_impact', 
-                y='type', 
-                orientation='h',
-                text='co2_impact',
-                title="🏆 Top 5 Categories Adding to Your Footprint",
-                labels={'co2_impact': 'CO₂ (kg)', 'type': 'Category'},
-                color='co2_impact',
-                color_continuous_scale='Reds'
-            )
-            
-            # FORCE BLACK TEXT EVERYWHERE
-            fig_bar.update_traces(texttemplate='%{text:.1f} kg', textposition='outside', textfont_color='black')
-            fig_bar.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)', 
-                plot_bgcolor='rgba(0,0,0,0)', 
-                font=dict(color='black'),        # Main Font Black
-                xaxis=dict(showticklabels=False, title_font=dict(color='black')), # Hide x numbers, keep title black
-                yaxis=dict(tickfont=dict(color='black'), title_font=dict(color='black')), # Force Y-axis labels black
-                title_font=dict(color='black')
-            )
-            st.plotly_chart(fig_bar, use_container_width=True)
+            with SPANS.span('plotly.categories'):
+                st.plotly_chart(analytics['fig_bar'], use_container_width=True)
 
             # 2. SIMPLE TREND LINE
             st.markdown("### 📉 My Carbon Trend")
-            daily_trend = df.groupby('date')['co2_impact'].sum().reset_index()
-            
-            fig_trend = px.area(
-                daily_trend, 
-                x='date', 
-                y='co2_impact',
-                title="Daily CO₂ Emissions (Lower is Better)",
-                labels={'co2_impact': 'Impact (kg)', 'date': 'Date'},
-                color_discrete_sequence=['#2e7d32']
-            )
-            
-            # FORCE BLACK TEXT EVERYWHERE
-            fig_trend.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)', 
-                plot_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='black'),
-                xaxis=dict(tickfont=dict(color='black'), title_font=dict(color='black')),
-                yaxis=dict(tickfont=dict(color='black'), title_font=dict(color='black'), gridcolor='rgba(0,0,0,0.1)'),
-                title_font=dict(color='black')
-            )
-            st.plotly_chart(fig_trend, use_container_width=True)
+            tc1, tc2 = st.columns([1, 1])
+            with tc1:
+                granularity = TREND_GRANULARITIES[
+                    st.radio("Group by", list(TREND_GRANULARITIES), index=0, horizontal=True, key="trend_granularity")
+                ]
+            with tc2:
+                trend_range = st.date_input("Date range", value=(), key="trend_range")
+            # An empty or half-picked range leaves that side open
+            trend_start = trend_range[0] if len(trend_range) > 0 else None
+            trend_end = trend_range[1] if len(trend_range) > 1 else None
+            with SPANS.span('analytics.trend'):
+                trend = get_analytics_cache().get_or_compute(
+                    (current_user_id(), 'trend', granularity, trend_start, trend_end), storage.version(),
+                    lambda: build_trend_figure(storage, granularity, trend_start, trend_end)
+                )
+            with SPANS.span('plotly.trend', rows=trend['points']):
+                st.plotly_chart(trend['fig'], use_container_width=True)
+            if trend['points'] < trend['total_points']:
+                st.caption(f"Showing {trend['points']:,} of {trend['total_points']:,} points (peaks preserved).")
 
         # --- SUB-TAB 2: COMPARATIVE ANALYSIS ---
         with sub_compare:
             st.markdown("### 🆚 Eco vs. Non-Eco Showdown")
             
-            # Split data
-            eco_df = df[df['type'].isin(ECO_FRIENDLY_CATEGORIES)]
-            non_eco_df = df[~df['type'].isin(ECO_FRIENDLY_CATEGORIES)]
-            
-            # Stats
-            eco_count = len(eco_df)
-            non_eco_count = len(non_eco_df)
-            eco_spend = eco_df['price'].sum()
-            non_eco_spend = non_eco_df['price'].sum()
-            eco_co2 = eco_df['co2_impact'].sum()
-            non_eco_co2 = non_eco_df['co2_impact'].sum()
-
             # Cards
             c1, c2 = st.columns(2)
             with c1:
@@ -815,10 +800,10 @@ with tab_analytics:
                     f"""
                     <div style="background: #e8f5e9; padding: 20px; border-radius: 15px; border: 2px solid #2e7d32; text-align: center;">
                         <h3 style="color: #2e7d32; margin:0;">🌱 Eco Choices</h3>
-                        <h1 style="color: #1b5e20; margin:0;">{eco_count}</h1>
+                        <h1 style="color: #1b5e20; margin:0;">{analytics['eco_count']}</h1>
                         <p style="color: #333 !important;">Items Bought</p>
                         <hr style="border-top: 1px solid #a5d6a7;">
-                        <p style="font-weight: bold; color: #1b5e20;">Total CO₂: {eco_co2:.1f} kg</p>
+                        <p style="font-weight: bold; color: #1b5e20;">Total CO₂: {analytics['eco_co2']:.1f} kg</p>
                     </div>
                     """, unsafe_allow_html=True
                 )
@@ -827,10 +812,10 @@ with tab_analytics:
                     f"""
                     <div style="background: #ffebee; padding: 20px; border-radius: 15px; border: 2px solid #c62828; text-align: center;">
                         <h3 style="color: #c62828; margin:0;">🏭 Regular Choices</h3>
-                        <h1 style="color: #b71c1c; margin:0;">{non_eco_count}</h1>
+                        <h1 style="color: #b71c1c; margin:0;">{analytics['non_eco_count']}</h1>
                         <p style="color: #333 !important;">Items Bought</p>
                         <hr style="border-top: 1px solid #ef9a9a;">
-                        <p style="font-weight: bold; color: #b71c1c;">Total CO₂: {non_eco_co2:.1f} kg</p>
+                        <p style="font-weight: bold; color: #b71c1c;">Total CO₂: {analytics['non_eco_co2']:.1f} kg</p>
                     </div>
                     """, unsafe_allow_html=True
                 )
@@ -839,30 +824,8 @@ with tab_analytics:
             st.write("") 
             st.markdown("### ⚖️ Visual Comparison")
             
-            comp_data = {
-                'Type': ['Money Spent (₹)', 'Carbon Emitted (kg)'],
-                'Eco-Friendly': [eco_spend, eco_co2],
-                'Regular': [non_eco_spend, non_eco_co2]
-            }
-            
-            fig_comp = go.Figure(data=[
-                go.Bar(name='Eco-Friendly', x=comp_data['Type'], y=comp_data['Eco-Friendly'], marker_color='#66bb6a'),
-                go.Bar(name='Regular', x=comp_data['Type'], y=comp_data['Regular'], marker_color='#ef5350')
-            ])
-            
-            # FORCE BLACK TEXT EVERYWHERE
-            fig_comp.update_layout(
-                barmode='group',
-                title="Spending vs. Impact Comparison",
-                paper_bgcolor='rgba(0,0,0,0)', 
-                plot_bgcolor='rgba(255,255,255,0.5)',
-                font=dict(color='black'), # Global black font
-                legend=dict(orientation="h", y=1.02, x=1, font=dict(color='black')), # Legend text black
-                xaxis=dict(tickfont=dict(color='black')), # X-axis text black
-                yaxis=dict(tickfont=dict(color='black')), # Y-axis text black
-                title_font=dict(color='black')
-            )
-            st.plotly_chart(fig_comp, use_container_width=True)
+            with SPANS.span('plotly.comparison'):
+                st.plotly_chart(analytics['fig_comp'], use_container_width=True)
             
             st.info("💡 **Insight:** Notice how 'Regular' items often cost the same amount of money but produce vastly more CO₂.")
 
@@ -870,7 +833,7 @@ with tab_analytics:
         st.info("📊 Log your first purchase in the Dashboard to unlock Analytics!")
         
 # --- PROFILE TAB ---
-with tab_profile:
+if active_view == VIEW_PROFILE:
     p_col1, p_col2 = st.columns([1, 2])
     
     with p_col1:
@@ -878,7 +841,10 @@ with tab_profile:
         with st.form("profile_update_v2"):
             new_name = st.text_input("Display Name", st.session_state.user_profile['name'])
             new_budget = st.number_input("Monthly Budget (₹)", value=st.session_state.user_profile['monthlyBudget'])
-            new_goal = st.number_input("CO₂ Limit Goal (kg)", value=st.session_state.user_profile['co2Goal'])
+            new_goal = st.number_input(
+                "CO₂ Limit Goal (kg)", value=st.session_state.user_profile['co2Goal'],
+                help="Monthly CO₂ limit. Eco Warrior unlocks for a month with 5+ items that stays under it."
+            )
             
             if st.form_submit_button("Update Profile"):
                 st.session_state.user_profile.update({
@@ -886,35 +852,72 @@ with tab_profile:
                     'monthlyBudget': new_budget,
                     'co2Goal': new_goal
                 })
-                save_data({'purchases': st.session_state.purchases, 'user_profile': st.session_state.user_profile})
+                save_profile(st.session_state.user_profile)
                 st.success("Updated!")
-                st.rerun()
+                rerun()
 
         # --- NEW DATA MANAGEMENT SECTION ---
         st.markdown("### 📂 Data Management")
         
-        # 1. Export Button
-        if st.session_state.purchases:
-            df_export = pd.DataFrame(st.session_state.purchases)
-            csv = df_export.to_csv(index=False).encode('utf-8')
-
-            st.download_button(
-                label="📥 Download Data as CSV",
-                data=csv,
-                file_name='shopimpact_data.csv',
-                mime='text/csv',
-                key='download-csv'
-            )
+        # 1. Export (only generated when requested)
+        if get_storage().count():
+            with st.form("export_form"):
+                exp_c1, exp_c2 = st.columns(2)
+                with exp_c1:
+                    exp_start = st.date_input("From", value=None)
+                with exp_c2:
+                    exp_end = st.date_input("To", value=None)
+                exp_types = st.multiselect("Categories (empty = all)", PRODUCT_TYPES)
+                exp_format = st.selectbox(
+                    "Format", available_formats(), format_func=lambda f: EXPORT_FORMATS[f]['label']
+                )
+                if st.form_submit_button("Prepare Export"):
+                    buffer = io.BytesIO()
+                    with SPANS.span(f'export.{exp_format}') as span:
+                        n_rows = write_export(get_storage(), buffer, exp_format, exp_start, exp_end, exp_types or None)
+                        span.rows = n_rows
+                    # Tagged with the storage version, so the file is dropped once purchases change
+                    st.session_state.export_file = (buffer.getvalue(), exp_format, n_rows, get_storage().version())
+
+            if 'export_file' in st.session_state and st.session_state.export_file[3] != get_storage().version():
+                del st.session_state.export_file
+                st.caption("Purchases changed since the last export. Prepare it again to download them.")
+            if 'export_file' in st.session_state:
+                payload, exp_format, n_rows, _ = st.session_state.export_file
+                fmt_info = EXPORT_FORMATS[exp_format]
+                st.download_button(
+                    label=f"📥 Download {n_rows:,} items as {fmt_info['label']}",
+                    data=payload,
+                    file_name=f"shopimpact_data.{fmt_info['ext']}",
+                    mime=fmt_info['mime'],
+                    key='download-csv'
+                )
         else:
             st.warning("Log items to enable export.")
 
-        # 2. Reset Button (Moved here)
+        # 2. Import (bank exports, receipts or a previous ShopImpact export)
+        uploaded = st.file_uploader("📤 Import Purchases (CSV)", type=['csv'], key='import-csv')
+        if uploaded is not None and st.button("Import File", key='import-run'):
+            try:
+                with st.spinner("Importing..."), SPANS.span('import.csv') as span:
+                    report = import_csv(uploaded, get_storage(), st.session_state.user_profile)
+                    span.rows = report.rows
+            except (ValueError, pd.errors.ParserError, UnicodeDecodeError) as e:
+                # Nothing is stored and the profile is untouched when a file fails
+                st.error(f"Could not import {uploaded.name}: {e}")
+            else:
+                save_profile(st.session_state.user_profile)
+                announce_badges(report.new_badges)
+                st.toast(f"Imported {report.rows:,} items ({report.rows_per_sec:,.0f} rows/sec)", icon="📤")
+                rerun()
+
+        # 3. Reset Button (Moved here)
         st.markdown("---")
         if st.button("🗑️ Reset All Data", type="secondary"):
-            st.session_state.purchases = []
             st.session_state.user_profile['badges'] = []
+            st.session_state.user_profile['badge_progress'] = {}
             save_data(get_default_data())
-            st.rerun()
+            rerun()
 
     with p_col2:
         # Display Badges Visually in the second column
@@ -925,19 +928,32 @@ with tab_profile:
         if not my_badges:
              st.info("No badges earned yet. Start shopping to unlock them!")
         else:
-            # Create a grid for badges
-            cols = st.columns(3)
-            for idx, badge_key in enumerate(my_badges):
-                badge = BADGES[badge_key]
-                with cols[idx % 3]:
-                    st.markdown(
-                        f"""
-                        <div style="background: rgba(255,255,255,0.8); padding: 15px; border-radius: 15px; text-align: center; border: 2px solid #e0f2f1; box-shadow: 0 4px 6px rgba(0,0,0,0.05);">
-                            <div style="font-size: 3rem; margin-bottom: 10px;">{badge['icon']}</div>
-                            <div style="font-weight: bold; color: #2e7d32;">{badge['name']}</div>
-                            <div style="font-size: 0.8rem; color: #555;">{badge['desc']}</div>
-                        </div>
-                        <div style="height: 10px;"></div>
-                        """, 
-                        unsafe_allow_html=True
-                    )
+            # The whole grid is one block; CSS grid lays out the three columns
+            st.markdown(badge_grid_html(my_badges), unsafe_allow_html=True)
+
+# --- DEBUG SIDEBAR (?debug=1) ---
+def render_spans(title: str, record: Dict) -> None:
+    st.markdown(f"**{title}** · {record['total_ms']:,.1f} ms")
+    st.dataframe(
+        pd.DataFrame([
+            {'stage': '\u00a0\u00a0' * s['depth'] + s['span'], 'ms': s['ms'], 'rows': s['rows']}
+            for s in record['spans']
+        ], columns=['stage', 'ms', 'rows']),
+        hide_index=True, use_container_width=True
+    )
+
+if DEBUG:
+    with st.sidebar:
+        st.markdown("#### 🛠️ Debug")
+        cache_stats = get_analytics_cache().stats()
+        st.caption(
+            f"Analytics cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['entries']} entries)"
+        )
+        # A run cut short by rerun() (e.g. adding a purchase) is shown once, above the run it triggered
+        if 'previous_spans' in st.session_state:
+            render_spans("Previous run", st.session_state.pop('previous_spans'))
+        render_spans("This run", {'total_ms': SPANS.elapsed() * 1000, 'spans': SPANS.summary()})
+
+if SPANS.enabled:
+    flush_spans()
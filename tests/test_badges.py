@@ -0,0 +1,66 @@
+import pandas as pd
+
+from shopimpact.badges import BadgeEngine
+
+ECO = {'date': '2024-03-05 10:00', 'type': 'Thrifted Clothing', 'brand': 'Other', 'price': 500.0, 'co2_impact': 0.5}
+MEAT = {'date': '2024-03-06 10:00', 'type': 'Meat', 'brand': 'Other', 'price': 400.0, 'co2_impact': 12.0}
+
+
+def test_retract_undoes_evaluate():
+    engine = BadgeEngine()
+    progress, before = {}, {}
+    engine.evaluate(before, ECO, [])
+    engine.evaluate(progress, ECO, [])
+    engine.evaluate(progress, MEAT, [])
+    engine.retract(progress, MEAT)
+    assert progress == before
+
+
+def test_edit_moves_progress_to_new_values():
+    engine = BadgeEngine()
+    progress, expected = {}, {}
+    engine.evaluate(progress, MEAT, [])
+    engine.retract(progress, MEAT)
+    engine.evaluate(progress, ECO, [])
+    engine.evaluate(expected, ECO, [])
+    assert progress == expected
+
+
+def purchase(date, co2):
+    return {'date': date, 'type': 'Meat', 'brand': 'Other', 'price': 100.0, 'co2_impact': co2}
+
+
+def test_eco_warrior_counts_each_month_against_the_goal():
+    engine = BadgeEngine()
+    profile = {'co2Goal': 50}
+    progress, owned = {}, []
+    # A heavy first month does not rule the badge out for good
+    for day in range(1, 6):
+        owned += engine.evaluate(progress, purchase(f'2024-01-0{day} 10:00', 30.0), owned, goals=profile)
+    assert 'eco_warrior' not in owned
+    for day in range(1, 6):
+        owned += engine.evaluate(progress, purchase(f'2024-02-0{day} 10:00', 5.0), owned, goals=profile)
+    assert 'eco_warrior' in owned
+    assert progress['eco_warrior'] == {'2024-01': [150.0, 5], '2024-02': [25.0, 5]}
+
+
+def test_backfill_matches_evaluate():
+    # Unlocks in the second block, on top of the month totals carried over from the first
+    goals = {'co2Goal': 60}
+    rows = [purchase(f'2024-0{1 + i % 3}-0{1 + i % 9} 10:00', float(i % 7) * 4) for i in range(40)]
+    engine = BadgeEngine()
+    progress, owned = {}, []
+    for row in rows:
+        owned += engine.evaluate(progress, row, owned, goals=goals)
+    replayed, unlocked = engine.backfill(pd.DataFrame(rows[:10]), [], goals=goals)
+    replayed, more = engine.backfill(pd.DataFrame(rows[10:]), unlocked, replayed, goals=goals)
+    assert 'eco_warrior' in more
+    assert sorted(unlocked + more) == sorted(owned)
+    assert replayed.keys() == progress.keys()
+    for badge, state in progress.items():
+        if isinstance(state, dict):
+            for month, (co2, count) in state.items():
+                assert replayed[badge][month][1] == count
+                assert abs(replayed[badge][month][0] - co2) < 1e-9
+        else:
+            assert replayed[badge] == state
@@ -0,0 +1,62 @@
+import io
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from shopimpact.exporter import write_export
+from shopimpact.storage import PURCHASE_COLUMNS, JournalStore, SQLiteStore
+from shopimpact.synthetic import synthetic_ledger
+
+BACKENDS = {'json': lambda tmp_path: JournalStore(tmp_path / 'a.json'),
+            'sqlite': lambda tmp_path: SQLiteStore(tmp_path / 'a.db')}
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def store(request, tmp_path):
+    store = BACKENDS[request.param](tmp_path)
+    store.append_frames([synthetic_ledger(500, seed=2)])
+    return store
+
+
+def expected(store, start=None, end=None, types=None):
+    df = store.frame()
+    day = df['date'].str[:10]
+    keep = pd.Series(True, index=df.index)
+    if start:
+        keep &= day >= start.isoformat()
+    if end:
+        keep &= day <= end.isoformat()
+    if types:
+        keep &= df['type'].isin(types)
+    return df[keep].reset_index(drop=True)
+
+
+def test_csv_export_applies_filters_across_chunks(store):
+    types = store.frame()['type'].value_counts().index[:3].tolist()
+    out = io.BytesIO()
+    n = write_export(store, out, 'csv', date(2022, 6, 1), date(2023, 12, 31), types, chunksize=16)
+    got = pd.read_csv(io.BytesIO(out.getvalue()))
+    want = expected(store, date(2022, 6, 1), date(2023, 12, 31), types)
+    assert n == len(want) > 16
+    pd.testing.assert_frame_equal(got, want, check_dtype=False)
+
+
+def test_csv_export_without_matches_has_a_header(store):
+    out = io.BytesIO()
+    assert write_export(store, out, 'csv', start=date(2030, 1, 1)) == 0
+    assert out.getvalue().decode('utf-8').strip() == ','.join(PURCHASE_COLUMNS)
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'feather'])
+def test_arrow_exports(store, fmt):
+    pytest.importorskip('pyarrow')
+    out = io.BytesIO()
+    assert write_export(store, out, fmt, chunksize=100) == 500
+    read = pd.read_parquet if fmt == 'parquet' else pd.read_feather
+    pd.testing.assert_frame_equal(read(io.BytesIO(out.getvalue())), store.frame(), check_dtype=False)
+
+
+def test_unknown_format(store):
+    with pytest.raises(ValueError, match='xlsx'):
+        write_export(store, io.BytesIO(), 'xlsx')
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from shopimpact.catalog import PRODUCT_TYPES, estimate_co2
+from shopimpact.impact import compute_impact, compute_impact_batch
+
+FREE_TEXT = ['Cotton Tote', 'Oak Dining Table', 'Paperback Book', 'Leather Sofa', 'Unknown Gadget', '']
+
+
+def hidden_toll_loop(df):
+    """The dashboard's Hidden Toll loop before it was vectorized."""
+    water_wasted = 0
+    trees_cut = 0
+    for _, row in df.iterrows():
+        ptype = row['type']
+        impact = row['co2_impact']
+        if any(x in ptype for x in ['Shirt', 'Jeans', 'Cotton', 'Meat', 'Dairy', 'Fashion', 'Dress']):
+            water_wasted += impact * 150
+        else:
+            water_wasted += impact * 20
+        if any(x in ptype for x in ['Paper', 'Book', 'Wood', 'Furniture', 'Table', 'Chair', 'Sofa']):
+            trees_cut += impact * 0.05
+        else:
+            trees_cut += impact * 0.002
+    return water_wasted, trees_cut
+
+
+def ledger(n, seed):
+    rng = np.random.default_rng(seed)
+    types = rng.choice(PRODUCT_TYPES + FREE_TEXT, n)
+    prices = rng.uniform(1, 20000, n).round(2)
+    co2 = [estimate_co2(t, p) for t, p in zip(types, prices)]
+    return pd.DataFrame({'type': types, 'price': prices, 'co2_impact': co2})
+
+
+def test_matches_loop():
+    df = ledger(2000, 0)
+    result = compute_impact(df['type'], df['price'], df['co2_impact'])
+    water, trees = hidden_toll_loop(df)
+    assert np.isclose(result.water.sum(), water, rtol=1e-12)
+    assert np.isclose(result.trees.sum(), trees, rtol=1e-12)
+
+
+def test_recomputed_co2_matches_estimate():
+    df = ledger(2000, 1)
+    result = compute_impact(df['type'], df['price'])
+    np.testing.assert_array_equal(result.co2, df['co2_impact'].to_numpy())
+
+
+def test_batch_splits_per_ledger():
+    frames = [ledger(300, 2), ledger(0, 3), ledger(1, 4), ledger(50, 5)]
+    results = compute_impact_batch([(f['type'], f['price'], f['co2_impact']) for f in frames], with_co2=True)
+    assert [len(r.co2) for r in results] == [300, 0, 1, 50]
+    for df, result in zip(frames, results):
+        alone = compute_impact(df['type'], df['price'], df['co2_impact'])
+        for got, expected in zip(result, alone):
+            np.testing.assert_array_equal(got, expected)
+        water, trees = hidden_toll_loop(df)
+        assert np.isclose(result.water.sum(), water, rtol=1e-12)
+        assert np.isclose(result.trees.sum(), trees, rtol=1e-12)
+
+
+def test_empty_ledger():
+    result = compute_impact([], [])
+    assert all(len(column) == 0 for column in result)
+    assert result.water.sum() == 0 and result.trees.sum() == 0
+    assert compute_impact_batch([]) == []
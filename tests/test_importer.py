@@ -0,0 +1,51 @@
+import io
+
+import pandas as pd
+import pytest
+
+from shopimpact.importer import clean_price, import_csv, resolve_columns
+from shopimpact.scorer import score_chunk
+from shopimpact.storage import JournalStore, get_default_data
+
+CSV = (
+    "date,category,amount\n"
+    "2025-01-03,Meat,\"₹1,299.00\"\n"
+    "05/01/2025,Jeans,$12\n"
+    "2025-01-03 14:30,Meat,-3\n"
+    "not a date,Meat,5\n"
+    "2025-01-04,Meat,free\n"
+)
+
+
+def read(csv):
+    return pd.read_csv(io.StringIO(csv), dtype=str, keep_default_na=False)
+
+
+def test_clean_price_strips_currency_from_string_columns():
+    assert clean_price(read(CSV)['amount']).tolist()[:3] == [1299.0, 12.0, 3.0]
+    assert clean_price(pd.Series([1.5, -2.0])).tolist() == [1.5, 2.0]
+
+
+def test_import_skips_unparseable_dates_instead_of_stamping_today(tmp_path):
+    store = JournalStore(tmp_path / 'a.json')
+    profile = get_default_data()['user_profile']
+    report = import_csv(io.StringIO(CSV), store, profile)
+    assert (report.rows, report.skipped) == (3, 2)
+    frame = store.frame()
+    assert frame['date'].tolist() == ['2025-01-03 00:00', '2025-05-01 00:00', '2025-01-03 14:30']
+    assert frame['price'].tolist() == [1299.0, 12.0, 3.0]
+
+
+def test_scorer_reads_currency_strings():
+    raw = read(CSV)
+    scored = score_chunk(raw, resolve_columns(list(raw.columns)))
+    assert scored['co2_impact'].notna().tolist() == [True, True, True, True, False]
+
+
+def test_import_without_price_column_stores_nothing(tmp_path):
+    store = JournalStore(tmp_path / 'a.json')
+    profile = get_default_data()['user_profile']
+    with pytest.raises(ValueError, match='price'):
+        import_csv(io.StringIO("date,category\n2025-01-03,Meat\n"), store, profile)
+    assert store.count() == 0
+    assert profile == get_default_data()['user_profile']
@@ -0,0 +1,45 @@
+import pytest
+
+from shopimpact.catalog import PRODUCT_TYPES
+from shopimpact.search import SkuIndex
+
+CSV = (
+    "Product,Category,SKU\n"
+    "Refurbished ThinkPad X1,refurbished laptop,TP-1\n"
+    "Oat Drink 1L, oat milk ,OM-1\n"
+    "Leather Sofa,SOFA,LS-1\n"
+)
+
+
+def write(tmp_path, text, name='catalog.csv'):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_categories_resolve_to_product_types(tmp_path):
+    assert {'Refurbished Laptop', 'Oat Milk', 'Sofa'} <= set(PRODUCT_TYPES)
+    index = SkuIndex.from_file(write(tmp_path, CSV))
+    assert len(index) == len(PRODUCT_TYPES) + 3
+    assert set(index.categories) <= set(PRODUCT_TYPES)
+    match = index.search('refurb think')[0]
+    assert (match.name, match.category, match.sku) == ('Refurbished ThinkPad X1', 'Refurbished Laptop', 'TP-1')
+    assert index.search('oat drink')[0].category == 'Oat Milk'
+
+
+def test_unknown_categories_are_rejected(tmp_path):
+    text = CSV + "Moon Rock,Space Souvenir,MR-1\nMars Rock,Space Souvenir,MR-2\nWidget,,W-1\n"
+    with pytest.raises(ValueError, match=r"3 rows .*'Space Souvenir', ''"):
+        SkuIndex.from_file(write(tmp_path, text))
+
+
+def test_jsonl_catalog(tmp_path):
+    text = '{"name": "Oat Drink 1L", "type": "OAT MILK"}\n'
+    index = SkuIndex.from_file(write(tmp_path, text, 'catalog.jsonl'))
+    assert index.search('oat drink')[0].category == 'Oat Milk'
+
+
+def test_search_falls_back_to_trigrams_for_typos():
+    index = SkuIndex.from_product_types()
+    assert index.search('refurbished lapptop')[0].name == 'Refurbished Laptop'
+    assert index.search('') == []
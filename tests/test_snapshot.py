@@ -0,0 +1,53 @@
+import json
+
+from shopimpact.history import HistoryQuery
+from shopimpact.ledger import Ledger
+from shopimpact.snapshot import read_snapshot, write_snapshot
+from shopimpact.storage import JournalStore, get_default_data
+
+PURCHASE = {'date': '2024-03-05 10:00', 'type': 'Meat', 'brand': 'Zara', 'price': 100.0, 'co2_impact': 1.5}
+
+
+def reopen(path):
+    store = JournalStore(path)
+    return store.count(), store.load_profile()
+
+
+def test_empty_ledger_round_trips(tmp_path):
+    path = tmp_path / 'a.columns'
+    write_snapshot(path, Ledger(), {'journal_seq': 3})
+    ledger, meta = read_snapshot(path)
+    assert len(ledger) == 0
+    assert meta == {'journal_seq': 3}
+
+
+def test_legacy_json_without_purchases(tmp_path):
+    path = tmp_path / 'shopimpact_data_v3.json'
+    data = get_default_data()
+    data['user_profile']['name'] = 'Asha'
+    path.write_text(json.dumps(data), encoding='utf-8')
+    # The first open migrates to the columnar snapshot, the second reads it
+    assert reopen(path) == (0, data['user_profile'])
+    assert reopen(path) == (0, data['user_profile'])
+
+
+def test_reset_store_reopens(tmp_path):
+    path = tmp_path / 'a.json'
+    store = JournalStore(path)
+    store.append_purchase(PURCHASE)
+    store.save(get_default_data())
+    assert reopen(path)[0] == 0
+    store.append_purchase(PURCHASE)
+    store.flush()
+    assert reopen(path)[0] == 1
+
+
+def test_delete_everything_then_compact(tmp_path):
+    path = tmp_path / 'a.json'
+    store = JournalStore(path)
+    store.append_purchase(PURCHASE)
+    store.append_purchase(PURCHASE)
+    for purchase_id in store.history(HistoryQuery()).rows['id'].tolist():
+        store.delete_purchase(purchase_id)
+    store.compact()
+    assert reopen(path)[0] == 0
@@ -0,0 +1,136 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from shopimpact.aggregates import LedgerAggregates
+from shopimpact.catalog import estimate_co2, is_eco
+from shopimpact.history import HistoryQuery
+from shopimpact.storage import JournalStore, SQLiteStore
+from shopimpact.synthetic import synthetic_ledger
+
+PURCHASE = {'date': '2024-03-05 10:00', 'type': 'Meat', 'brand': 'Zara', 'price': 100.0, 'co2_impact': 1.5}
+
+BACKENDS = {'json': lambda tmp_path: JournalStore(tmp_path / 'a.json'),
+            'sqlite': lambda tmp_path: SQLiteStore(tmp_path / 'a.db')}
+
+QUERIES = [
+    HistoryQuery(),
+    HistoryQuery(sort='price', descending=False),
+    HistoryQuery(sort='co2_impact'),
+    HistoryQuery(start=date(2022, 6, 1), end=date(2023, 6, 30), sort='price'),
+    HistoryQuery(eco=True),
+    HistoryQuery(eco=False, sort='co2_impact', descending=False),
+    HistoryQuery(types=('Bottled Water', 'Thrifted Clothing', 'Vintage Lamp'), sort='price'),
+    HistoryQuery(brands=('Cubus', 'H&M'), start=date(2023, 1, 1)),
+    HistoryQuery(types=('Office Supplies',), brands=('Cubus',), eco=False),
+]
+
+
+@pytest.mark.parametrize('mode', ['sync', 'async'])
+def test_compaction_keeps_the_triggering_record(tmp_path, mode):
+    path = tmp_path / 'a.json'
+    store = JournalStore(path, compact_every=5, mode=mode, flush_batch=1)
+    for i in range(7):
+        store.append_purchase({**PURCHASE, 'price': float(i + 1)})
+    store.flush()
+    assert store.count() == 7
+    reopened = JournalStore(path)
+    assert reopened.count() == 7
+    assert reopened.aggregates().spend == sum(range(1, 8))
+
+
+def expected_page(model, query):
+    df = pd.DataFrame.from_dict(model, orient='index').rename_axis('id').reset_index()
+    day = df['date'].str[:10]
+    keep = np.ones(len(df), dtype=bool)
+    if query.start:
+        keep &= day >= query.start.isoformat()
+    if query.end:
+        keep &= day <= query.end.isoformat()
+    if query.types:
+        keep &= df['type'].isin(query.types)
+    if query.brands:
+        keep &= df['brand'].isin(query.brands)
+    if query.eco is not None:
+        keep &= df['type'].map(is_eco) == query.eco
+    df = df[keep].sort_values([query.sort, 'id'], ascending=not query.descending)
+    return df['id'].tolist()
+
+
+def paged_ids(store, query, size=7):
+    ids, offset = [], 0
+    while True:
+        page = store.history(query, offset, size)
+        ids += page.rows['id'].tolist()
+        offset += size
+        if offset >= page.total:
+            return ids, page.total
+
+
+def check_store(store, model):
+    for query in QUERIES:
+        expected = expected_page(model, query)
+        assert paged_ids(store, query) == (expected, len(expected)), query
+    first = store.history(HistoryQuery(), 0, 5).rows.set_index('id')
+    for purchase_id, row in first.iterrows():
+        assert row.to_dict() == model[purchase_id]
+
+    frame = store.frame()
+    assert len(frame) == store.count() == len(model)
+    agg, recomputed = store.aggregates(), LedgerAggregates.from_frame(frame)
+    assert agg.count == recomputed.count and agg.eco_count == recomputed.eco_count
+    for field in ('spend', 'co2', 'water', 'trees'):
+        assert np.isclose(getattr(agg, field), getattr(recomputed, field), rtol=1e-9), field
+
+    stamps = pd.to_datetime(frame['date'])
+    buckets = {
+        'day': frame['date'].str[:10],
+        'week': (stamps - pd.to_timedelta(stamps.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d'),
+        'month': frame['date'].str[:7],
+    }
+    for granularity, keys in buckets.items():
+        expected = (frame.groupby(keys.rename('bucket'))
+                    .agg(co2_impact=('co2_impact', 'sum'), price=('price', 'sum'), count=('price', 'size'))
+                    .reset_index())
+        got = store.rollup(granularity)
+        got = got[got['count'] > 0].reset_index(drop=True)
+        assert got['bucket'].tolist() == expected['bucket'].tolist(), granularity
+        assert got['count'].tolist() == expected['count'].tolist(), granularity
+        assert np.allclose(got[['co2_impact', 'price']], expected[['co2_impact', 'price']]), granularity
+    march = frame[buckets['month'] == '2023-03']
+    totals = store.month_totals(date(2023, 3, 15))
+    assert totals.count == len(march) and np.isclose(totals.price, march['price'].sum())
+
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_history_and_totals_follow_writes(tmp_path, backend):
+    store = BACKENDS[backend](tmp_path)
+    history = synthetic_ledger(300, seed=1)
+    store.append_frames([history.iloc[:200]])
+    for purchase in history.iloc[200:].to_dict('records'):
+        store.append_purchase(purchase)
+    ids = store.history(HistoryQuery(sort='date', descending=False), 0, 300).rows['id'].tolist()
+    model = dict(zip(ids, history.to_dict('records')))
+    check_store(store, model)
+
+    # Edits move purchases across days, months, categories (one of them free text) and eco status
+    for i, purchase_id in enumerate(ids[::25]):
+        edited = {**model[purchase_id], 'type': 'Vintage Lamp' if i % 2 else 'Thrifted Clothing',
+                  'date': f'2023-03-{10 + i:02d} 12:00', 'price': 1000.0 + i}
+        edited['co2_impact'] = estimate_co2(edited['type'], edited['price'])
+        store.update_purchase(purchase_id, edited)
+        model[purchase_id] = edited
+    # Deletes include the only purchase of some day buckets
+    for purchase_id in ids[3::20]:
+        store.delete_purchase(purchase_id)
+        del model[purchase_id]
+    with pytest.raises(KeyError):
+        store.delete_purchase(ids[3])
+    with pytest.raises(KeyError):
+        store.update_purchase(ids[3], model[ids[0]])
+    check_store(store, model)
+
+    store.flush()
+    check_store(BACKENDS[backend](tmp_path), model)